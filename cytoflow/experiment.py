@@ -24,14 +24,23 @@ cytoflow.experiment
 Defines `Experiment`, `cytoflow`'s main data structure.
 
 `Experiment` -- manages the data and metadata for a flow experiment.
+
+`GroupIndex` -- the events in an `Experiment`, grouped by one or more 
+conditions.
 """
 
+import os, tempfile, pickle, shutil, uuid
+from warnings import warn
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+import numpy as np
 import pandas as pd
 from natsort import natsorted
 
 from pandas.api.types import CategoricalDtype, is_categorical_dtype
 from traits.api import (HasStrictTraits, Dict, List, Instance, Str, Any,
-                       Property, Tuple)
+                       Property, Tuple, Int, Enum)
 
 import cytoflow.utility as util
 
@@ -105,12 +114,33 @@ class Experiment(HasStrictTraits):
     
     channels : List(String)
         The channels that this experiment tracks (read-only).
+        
+    channel_dtype : {"float64", "float32"} (default = "float64")
+        The ``dtype`` that channels are stored as.  Most FCS files only
+        record 32 bits of precision (or less), so storing channels as 
+        ``float32`` halves the memory an `Experiment` needs.  Operations 
+        that need more precision (such as model fitting and summary 
+        statistics) convert to ``float64`` themselves.  Set this before
+        adding any channels.
+        
+    scaled_cache_size : Int (default = 2 ** 30)
+        The most memory (in bytes) to use for the scaled columns that
+        `scaled` memoizes.
     
     conditions : Dict(String : pandas.Series)
         The experimental conditions and analysis groups (gate membership, etc) 
         that this experiment tracks.  The key is the name of the condition, and 
         the value is a `pandas.Series` with that condition's possible 
         values. 
+        
+    .. note::
+    
+        `channels` and `conditions` are cached, and the cache is only 
+        invalidated by `add_condition`, `add_channel`, `add_events`,
+        assigning a column with ``experiment[name] = ...``, or assigning
+        a new `pandas.DataFrame` to `data`.  If you change the rows or 
+        columns of `data` in place (for example, with ``inplace = True``), 
+        assign the result to `data` instead.
 
     Notes
     -----
@@ -175,31 +205,336 @@ class Experiment(HasStrictTraits):
     
     history = List(Any, copy = "shallow")
     
+    channel_dtype = Enum("float64", "float32")
+    
+    scaled_cache_size = Int(2 ** 30)
+    
     channels = Property(List)
     conditions = Property(Dict)
+    
+    # bumped every time the columns or events change.  derived values
+    # (like `conditions` and `channels`) are cached in _cache, which
+    # is cleared when the version changes.
+    _version = Int(0, transient = True)
+    _cache = Dict(Str, Any, transient = True)
+    
+    # memoized group indices, keyed by the tuple of conditions.  unlike
+    # _cache, these are only invalidated when the rows change or one
+    # of the conditions is replaced -- and they're carried across clone()
+    _group_indices = Dict(Tuple, Any, transient = True)
+    
+    # memoized scaled columns (see `scaled`).  invalidated like 
+    # _group_indices, except by column instead of by condition.
+    _scaled = Any(transient = True)
+            
+    # if this experiment is a subset of another one (from `subset` or 
+    # `query`), `data` isn't built until someone asks for it.  until then, 
+    # _source is the parent's data, _rows are the (positional) indices of 
+    # the events we selected, and _gathered holds the columns that have 
+    # been read with __getitem__.
+    _source = Instance(pd.DataFrame, transient = True)
+    _rows = Any(transient = True)
+    _gathered = Dict(Str, Any, transient = True)
             
     def __getitem__(self, key):
         """Override __getitem__ so we can reference columns like ex.column"""
+        if self._source is not None:
+            # only gather the columns we were asked for
+            if isinstance(key, str) and key in self._source:
+                return self._gather(key)
+            
+            if isinstance(key, list) and \
+                all(isinstance(k, str) and k in self._source for k in key):
+                return pd.DataFrame({k : self._gather(k) for k in key},
+                                    columns = key)
+        
         return self.data.__getitem__(key)
      
     def __setitem__(self, key, value):
-        """Override __setitem__ so we can assign columns like ex.column = ..."""
+        """
+        Override __setitem__ so we can assign columns like ex.column = ...
+        
+        Replacing an existing column never writes into the old column's
+        buffer; instead, `data` is rebuilt around the new column, sharing
+        every other column with the old `data`.  So, replacing a column in
+        a shallow `clone` doesn't change the `Experiment` it was cloned from.
+        """
+            
+        # keep channels' dtypes consistent
+        if key in self.metadata and self.metadata[key]['type'] == "channel":
+            if isinstance(value, pd.Series):
+                value = value.astype(self.channel_dtype, copy = False)
+            else:
+                value = np.asarray(value, dtype = self.channel_dtype)
+                
+        group_indices = {k : v for k, v in self._group_indices.items()
+                         if key not in k}
+        scaled = self._scaled_columns()
+        scaled.discard(key)
+            
         if key in self.data:
-            self.data.drop(key, axis = 'columns', inplace = True)
-        return self.data.__setitem__(key, value)
+            # copy-on-write: a new frame with the same columns, except `key`
+            columns = self.data.columns
+            new_data = {c : self.data[c] for c in columns if c != key}
+            if not isinstance(value, pd.Series):
+                value = pd.Series(value, index = self.data.index)
+            elif not value.index.equals(self.data.index):
+                value = value.reindex(self.data.index)
+            new_data[key] = value
+            self.data = pd.DataFrame(new_data, 
+                                     columns = columns, 
+                                     copy = False)
+        else:
+            self.data[key] = value
+            
+        self._invalidate()
+        self._group_indices = group_indices
+        self._scaled = scaled
     
     def __len__(self):
         """Return the length of the underlying `pandas.DataFrame`"""
+        if self._source is not None:
+            return len(self._rows)
         return len(self.data)
+    
+    def __getstate__(self):
+        # build a subset's data before pickling it
+        self.data
+        return super().__getstate__()
+    
+    def _data_default(self):
+        """Build `data` the first time it's read, if we're a subset"""
+        if self._source is None:
+            return pd.DataFrame()
+        
+        columns = self._source.columns
+        data = pd.DataFrame({c : self._gather(c) for c in columns},
+                            columns = columns)
+        
+        self._source = None
+        self._rows = None
+        self._gathered = {}
+        
+        return data
+    
+    def _gather(self, column):
+        """Get the selected rows of one column of our parent's data"""
+        if column not in self._gathered:
+            values = self._source[column].take(self._rows)
+            values.index = pd.RangeIndex(len(self._rows))
+            self._gathered[column] = values
+            
+        return self._gathered[column]
+    
+    def _chunk(self, column, rows):
+        """Get the events in ``rows`` (a slice) from ``column``"""
+        if self._source is not None and column not in self._gathered:
+            values = self._source[column].take(self._rows[rows])
+            values.index = pd.RangeIndex(rows.start, rows.stop)
+            return values
+        
+        return self[column].iloc[rows]
+    
+    def _columns(self):
+        """The column names, without building `data` if we're a subset"""
+        if self._source is not None:
+            return self._source.columns
+        return self.data.columns
+    
+    def _select(self, rows):
+        """
+        Return a new `Experiment` with only the events at (positional) indices
+        ``rows``.  Its `data` isn't built until it's needed; until then, 
+        columns are copied from this experiment only when they're read.
+        """
+        
+        ret = self.clone_traits(traits = [t for t in self.copyable_trait_names() 
+                                          if t != 'data'])
+        
+        if self._source is not None:
+            ret._source = self._source
+            ret._rows = self._rows[rows]
+        else:
+            # a shallow copy, so columns added to this experiment later
+            # don't show up in the subset
+            ret._source = self.data.copy(deep = False)
+            ret._rows = rows
+            
+        # the subset's scaled columns can be taken from ours
+        ret._scaled = _ScaledColumns(self.scaled_cache_size,
+                                     parent = self._scaled_columns().copy(),
+                                     rows = rows)
+            
+        return ret
 
     def _get_channels(self):
         """Getter for the `channels` property"""
-        return sorted([x for x in self.data if self.metadata[x]['type'] == "channel"])
+        if 'channels' not in self._cache:
+            self._cache['channels'] = \
+                sorted([x for x in self._columns() if self.metadata[x]['type'] == "channel"])
+        return list(self._cache['channels'])
     
     def _get_conditions(self):
         """Getter for the `conditions` property"""
-        return {x : pd.Series(self.data[x].unique().copy()).sort_values() for x in self.data
-                if self.metadata[x]['type'] == "condition"}
+        if 'conditions' not in self._cache:
+            self._cache['conditions'] = \
+                {x : pd.Series(self[x].unique().copy()).sort_values() for x in self._columns()
+                 if self.metadata[x]['type'] == "condition"}
+        return dict(self._cache['conditions'])
+    
+    def _get_condition_values(self, condition):
+        """The set of values of ``condition``, for fast membership tests"""
+        if 'condition_values' not in self._cache:
+            self._cache['condition_values'] = {}
+            
+        values = self._cache['condition_values']
+        if condition not in values:
+            values[condition] = set(self.conditions[condition])
+            
+        return values[condition]
+    
+    def _invalidate(self):
+        """Discard cached values derived from `data` and `metadata`"""
+        self._version += 1
+        self._cache = {}
+        
+    def _data_changed(self):
+        self._invalidate()
+        self._group_indices = {}
+        self._scaled = None
+        
+    def _scaled_columns(self):
+        if self._scaled is None:
+            self._scaled = _ScaledColumns(self.scaled_cache_size)
+        self._scaled.resize(self.scaled_cache_size)
+        return self._scaled
+        
+    def group_index(self, by):
+        """
+        Group the events in this experiment by the values of one or more
+        conditions.  
+        
+        The result is memoized, so grouping by the same conditions again is
+        (nearly) free.  The memoized groups are kept until the experiment's 
+        events change, or until one of the conditions in ``by`` is replaced, 
+        and they are shared with `Experiment` s made with `clone`.
+        
+        Parameters
+        ----------
+        by : List(Str)
+            The conditions to group by.  If empty, return a single group
+            (with the key ``True``) that contains all the events.
+            
+        Returns
+        -------
+        GroupIndex
+            The events in this `Experiment`, grouped by ``by``.  Iterating 
+            over it gives ``(group, data)`` pairs, just like iterating over
+            a `pandas.core.groupby.DataFrameGroupBy`.
+            
+        Raises
+        ------
+        `.CytoflowError`
+            If any of ``by`` isn't a condition in this `Experiment`.
+        """
+        
+        by = tuple(by)
+        
+        for b in by:
+            if b not in self.conditions:
+                raise util.CytoflowError("{} is not a condition".format(b))
+        
+        if by not in self._group_indices:
+            if not by:
+                # one group, with all the events
+                indices = {True : np.arange(len(self))}
+            elif len(by) == 1:
+                indices = self[by[0]].groupby(self[by[0]]).indices
+            else:
+                indices = self[list(by)].groupby(list(by)).indices
+                
+            self._group_indices[by] = indices
+        
+        return GroupIndex(by, self._group_indices[by], self)
+    
+    def scaled(self, column, scale):
+        """
+        Transform a column with a scale, as a ``float64`` `pandas.Series`.
+        
+        The result is memoized, keyed by the column, the scale's class and 
+        its `transform_params`, so scaling the same column the same way again 
+        (for example, re-plotting after a cosmetic change, or applying an 
+        operation right after estimating it) is (nearly) free.  The 
+        memoized columns are kept until the column is replaced or the
+        experiment's events change, and they are shared with `Experiment` s
+        made with `clone` (and with subsets made with `subset` and `query`.)
+        The least-recently-used ones are discarded when they take up more 
+        than `scaled_cache_size` bytes.
+        
+        Parameters
+        ----------
+        column : Str
+            The column to scale.
+            
+        scale : `IScale`
+            The scale to transform it with.  Scales that don't have a
+            ``transform_params`` method aren't memoized.
+            
+        Returns
+        -------
+        pandas.Series
+            The scaled column.  It may be shared with other callers (or be 
+            the column itself), so don't modify it in place.
+        """
+        
+        if column not in self._columns():
+            raise util.CytoflowError("Column {} not in the experiment"
+                                     .format(column))
+            
+        try:
+            key = (column, type(scale), tuple(scale.transform_params()))
+            hash(key)
+        except (AttributeError, TypeError):
+            key = None
+            
+        cache = self._scaled_columns()
+        values = cache.get(key) if key is not None else None
+        
+        if values is None:
+            values = scale(self[column].astype("float64", copy = False))
+            if key is not None:
+                cache.put(key, values)
+                
+        return values
+    
+    def can_memoize_scaled(self, columns):
+        """
+        Would `scaled` memoize ``columns``?  Not if their scaled copies would
+        take up more than `scaled_cache_size` bytes, or if any of them are
+        memory-mapped (see `memory_map`) -- the events may not fit in RAM, 
+        so code that can should scale each chunk from `iter_chunks` instead.
+        
+        Parameters
+        ----------
+        columns : Str or List(Str)
+            The columns to scale.
+            
+        Returns
+        -------
+        Bool
+            ``True`` if it's reasonable to scale ``columns`` with `scaled`.
+        """
+        
+        if isinstance(columns, str):
+            columns = [columns]
+            
+        if len(self) * np.dtype("float64").itemsize * len(columns) > self.scaled_cache_size:
+            return False
+        
+        # don't gather a lazy subset's columns just to look at them
+        data = self._source if self._source is not None else self.data
+        return not any(_memmap_of(data[column].values) is not None 
+                       for column in columns)
         
     def subset(self, conditions, values):
         """
@@ -223,36 +558,31 @@ class Experiment(HasStrictTraits):
             ``conditions`` and ``values``.
             
             
-        .. note:: This is a wrapper around `pandas.DataFrame.groupby` and
-                  `pandas.core.groupby.GroupBy.get_group`.  That means
-                  you can pass other things in `conditions` -- see 
-                  the `pandas.DataFrame.groupby` documentation
-                  for details.
+        .. note:: The new `Experiment` doesn't copy any events until
+                  they're needed.  Reading a column with ``experiment[column]``
+                  copies only that column; reading `data` copies them all.
             
         """
-        conditions = list(conditions)
         
         if isinstance(conditions, str):
-            c = conditions
-            v = values
+            conditions = [conditions]
+            values = [values]
+        else:
+            conditions = list(conditions)
+            if not isinstance(values, (list, tuple)):
+                values = [values]
+            
+        for c, v in zip(conditions, values):
             if c not in self.conditions:
                 raise util.CytoflowError("{} is not a condition".format(c))
-            if v not in list(self.conditions[c]):
+            if v not in self._get_condition_values(c):
                 raise util.CytoflowError("{} is not a value of condition {}".format(v, c))
-        else:
-            for c, v in zip(conditions, values):
-                if c not in self.conditions:
-                    raise util.CytoflowError("{} is not a condition".format(c))
-                if v not in list(self.conditions[c]):
-                    raise util.CytoflowError("{} is not a value of condition {}".format(v, c))
-
-        g = self.data.groupby(conditions)
 
-        ret = self.clone(deep = False)
-        ret.data = g.get_group(values)
-        ret.data.reset_index(drop = True, inplace = True)
+        mask = np.ones(len(self), dtype = bool)
+        for c, v in zip(conditions, values):
+            mask &= (self[c] == v).values
         
-        return ret    
+        return self._select(np.flatnonzero(mask))
     
     def query(self, expr, **kwargs):
         """
@@ -264,41 +594,68 @@ class Experiment(HasStrictTraits):
         column name ``a column`` becomes ``a_column``, and can be queried with
         an ``a_column == True`` or such.
         
+        Simple expressions -- comparisons to literals, ``in``, ``and``, 
+        ``or`` and ``not`` -- are compiled with `compile_subset` and 
+        evaluated directly; anything else is passed to `pandas.eval`.
+        Either way, the selected events are cached, so querying the same
+        experiment with the same expression again is nearly free.
+        
         Parameters
         ----------
         expr : string
-            The expression to pass to `pandas.DataFrame.query`.  Must be
+            The expression to pass to `pandas.eval`.  Must be
             a valid Python expression, something you could pass to `eval`.
             
         **kwargs : dict
-            Other named parameters to pass to `pandas.DataFrame.query`.
+            Other named parameters to pass to `pandas.eval`.
             
         Returns
         -------
         Experiment
-            A new `Experiment`, a clone of this one with the data 
-            returned by `pandas.DataFrame.query`
+            A new `Experiment`, a clone of this one with only the events
+            where ``expr`` is ``True``.  Like the result of `subset`, it 
+            doesn't copy any events until they're read.
         """
         
-        resolvers = {}
-        for name, col in self.data.iteritems():
-            new_name = util.sanitize_identifier(name)
-            if new_name in resolvers:
-                raise util.CytoflowError("Tried to sanitize column name {0} to "
-                                         "{1} but it already existed in the "
-                                         " DataFrame."
-                                         .format(name, new_name))
-            else:
-                resolvers[new_name] = col
-                
-        ret = self.clone(deep = False)
-        ret.data = self.data.query(expr, resolvers = ({}, resolvers), **kwargs)
-        ret.data.reset_index(drop = True, inplace = True)
+        if 'query_rows' not in self._cache:
+            self._cache['query_rows'] = {}
+        query_rows = self._cache['query_rows']
         
-        if len(ret.data) == 0:
+        # only cache the results of compiled expressions with no other arguments
+        cache = not kwargs
+        
+        if cache and expr in query_rows:
+            return self._select(query_rows[expr])
+        
+        resolvers = _ColumnResolver(self)
+        
+        mask = None
+        compiled = util.compile_subset(expr) if cache else None
+        if compiled:
+            try:
+                mask = compiled.evaluate(resolvers.__getitem__, len(self))
+            except (util.UnsupportedSubset, KeyError):
+                mask = None
+        
+        if mask is None:
+            # pandas.eval may use local variables, so don't cache the result
+            cache = False
+            kwargs['level'] = kwargs.pop('level', 0) + 1
+            mask = pd.eval(expr, resolvers = (resolvers,), **kwargs)
+            mask = np.broadcast_to(np.asarray(mask), (len(self),))
+            
+        if mask.dtype != bool:
+            raise util.CytoflowError("Expression {} didn't evaluate to True or False"
+                                     .format(expr))
+            
+        rows = np.flatnonzero(mask)
+        if len(rows) == 0:
             raise util.CytoflowError("No events matched {}".format(expr))
         
-        return ret
+        if cache:
+            query_rows[expr] = rows
+        
+        return self._select(rows)
     
     def clone(self, deep = True):
         """
@@ -307,19 +664,354 @@ class Experiment(HasStrictTraits):
         or not `data` is a deep copy depends on the value of
         the ``deep`` parameter.
         
-        .. warning:: The intent is that ``deep`` is set to ``False`` by 
-                     operations that are only adding columns to the 
-                     underlying `pandas.DataFrame`.  This will
-                     improve memory performance.  However, the resulting
-                     `Experiment`  **CANNOT BE MODIFIED IN-PLACE**,
-                     because doing so will affect the other `Experiment` s
-                     that are clones of the one being modified.
+        A shallow clone (``deep = False``) shares its columns with this
+        `Experiment`, so it costs (almost) no memory.  Columns are
+        copy-on-write: adding or replacing a column with 
+        ``experiment[column] = ...``, `add_channel` or `add_condition`,
+        or assigning a new `data` frame, only changes the clone.  Operations
+        should make shallow clones whenever they only add or replace columns.
+        
+        .. warning:: Writing into a column's values in-place (for example,
+                     ``experiment.data.loc[rows, column] = ...``) still 
+                     changes every `Experiment` that shares that column. 
+                     Replace the whole column instead.
         """
         
         new_exp = self.clone_traits()
         new_exp.data = self.data.copy(deep = deep)
+        
+        # same events, so the same groups and the same scaled columns
+        new_exp._group_indices = dict(self._group_indices)
+        new_exp._scaled = self._scaled_columns().copy()
 
         return new_exp
+    
+    def memory_map(self, directory = None):
+        """
+        Move this `Experiment`'s events out of RAM and into memory-mapped 
+        files in ``directory``.  
+        
+        Each numeric, boolean or categorical column is written to its own 
+        ``.npy`` file, then mapped back into `data` -- so `data` is still a 
+        `pandas.DataFrame`, and everything else (``experiment[column]``, 
+        `subset`, `query`, `add_condition`, `clone`, the operations and 
+        views) works the same way.  The operating system pages events in 
+        from the files as they are used, so you can analyze experiments 
+        that are larger than RAM. Object columns (such as ``str`` 
+        conditions) stay in memory.
+        
+        .. note::
+            `memory_map` operates **in place.**
+            
+        The files are mapped copy-on-write, so they are never modified: 
+        columns added or replaced afterwards (for example, gate membership)
+        are kept in memory.  Call `memory_map` again to move them to disk,
+        too; columns that are already mapped from ``directory`` aren't 
+        written again.  Shallow clones share the mapped columns; deep clones
+        copy them into memory.
+        
+        `cytoflow` doesn't delete the files; when you're done with the 
+        `Experiment`, remove ``directory`` yourself.
+        
+        Parameters
+        ----------
+        directory : Str (optional)
+            The directory to store the columns in.  It is created if it
+            doesn't exist.  If ``None``, make a new temporary directory.
+            
+        Returns
+        -------
+        Str
+            The directory the columns are stored in.
+        """
+        
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix = "cytoflow-")
+        else:
+            os.makedirs(directory, exist_ok = True)
+            
+        columns = {}
+        for name in self.data.columns:
+            column = self.data[name]
+            categorical = is_categorical_dtype(column.dtype)
+            values = column.cat.codes.values if categorical else column.values
+            
+            if values.dtype.kind not in "biuf" or \
+                _mapped_from(values, directory):
+                columns[name] = column
+                continue
+            
+            fd, filename = tempfile.mkstemp(prefix = "column-",
+                                              suffix = ".npy", 
+                                              dir = directory)
+            os.close(fd)
+            np.save(filename, values)
+            values = np.load(filename, mmap_mode = "c")
+            
+            if categorical:
+                values = pd.Categorical.from_codes(values, dtype = column.dtype)
+                
+            columns[name] = pd.Series(values, 
+                                      index = self.data.index, 
+                                      copy = False)
+            
+        # same events, so the same groups
+        group_indices = self._group_indices
+        self.data = pd.DataFrame(columns, 
+                                 columns = self.data.columns, 
+                                 copy = False)
+        self._group_indices = group_indices
+        
+        return directory
+            
+    def save(self, path):
+        """
+        Save this `Experiment` -- events, `metadata`, `statistics` and 
+        `history` -- so it can be re-opened quickly with `load`.
+        
+        ``path`` is a directory.  Each numeric, boolean or categorical 
+        column is stored as a binary ``.npy`` file, which `load` can
+        memory-map instead of reading.  Everything else is pickled.  If
+        ``path`` is an `Experiment` that was saved before, it is replaced.
+        
+        .. note:: 
+            Some operations store functions in `metadata` (for example, 
+            `BeadCalibrationOp`'s calibration function.)  Entries that 
+            can't be pickled are skipped, with a warning.
+        
+        Parameters
+        ----------
+        path : Str
+            The directory to save the `Experiment` to.  It must not exist,
+            be empty, or hold a saved `Experiment`.
+            
+        Raises
+        ------
+        CytoflowError
+            If ``path`` is a file, or a directory that holds something
+            other than a saved `Experiment`.
+        """
+        
+        path = os.path.abspath(path)
+        
+        # never remove anything but a saved experiment
+        if os.path.exists(path):
+            if not os.path.isdir(path):
+                raise util.CytoflowError("Can't save an experiment to {}: "
+                                         "it's a file, not a directory"
+                                         .format(path))
+            if os.listdir(path) and \
+                not os.path.isfile(os.path.join(path, "experiment.pickle")):
+                raise util.CytoflowError("Can't save an experiment to {}: "
+                                         "it isn't empty, and doesn't hold a "
+                                         "saved experiment"
+                                         .format(path))
+        
+        parent = os.path.dirname(path)
+        os.makedirs(parent, exist_ok = True)
+        
+        # write to a new directory, then swap it in -- path may be
+        # where our columns are memory-mapped from.  (not mkdtemp: its
+        # directories are private to the user, and path shouldn't be.)
+        directory = os.path.join(parent, ".cytoflow-" + uuid.uuid4().hex)
+        os.mkdir(directory)
+        
+        try:
+            columns = []
+            for i, name in enumerate(self.data.columns):
+                column = self.data[name]
+                spec = {'name' : name}
+                
+                if is_categorical_dtype(column.dtype):
+                    spec['categories'] = column.cat.categories
+                    spec['ordered'] = column.cat.ordered
+                    values = column.cat.codes.values
+                else:
+                    values = column.values
+                    
+                if values.dtype.kind in "biuf":
+                    spec['file'] = "column-{}.npy".format(i)
+                    np.save(os.path.join(directory, spec['file']), values)
+                else:
+                    spec['values'] = values
+                    
+                columns.append(spec)
+                
+            metadata = {}
+            for name, meta in self.metadata.items():
+                if isinstance(meta, dict):
+                    metadata[name] = {k : v for k, v in meta.items()
+                                      if _can_pickle(v, "metadata[{!r}][{!r}]"
+                                                        .format(name, k))}
+                elif _can_pickle(meta, "metadata[{!r}]".format(name)):
+                    metadata[name] = meta
+                                 
+            state = {'version' : 1,
+                     'channel_dtype' : self.channel_dtype,
+                     'columns' : columns,
+                     'index' : self.data.index,
+                     'metadata' : metadata,
+                     'statistics' : self.statistics,
+                     'history' : [op for op in self.history 
+                                  if _can_pickle(op, "history operation {}"
+                                                     .format(op))]}
+            
+            with open(os.path.join(directory, "experiment.pickle"), 'wb') as f:
+                pickle.dump(state, f, protocol = pickle.HIGHEST_PROTOCOL)
+                
+            # move the old experiment aside instead of removing it first, 
+            # so that if the swap fails, it can be put back
+            old = None
+            if os.path.exists(path):
+                old = os.path.join(parent, ".cytoflow-old-" + uuid.uuid4().hex)
+                os.rename(path, old)
+                
+            try:
+                os.replace(directory, path)
+            except BaseException:
+                if old is not None:
+                    os.rename(old, path)
+                raise
+            
+            # on Windows, files that are still memory-mapped can't be
+            # removed -- leave them, rather than failing a finished save
+            if old is not None:
+                shutil.rmtree(old, ignore_errors = True)
+            
+        finally:
+            if os.path.exists(directory):
+                shutil.rmtree(directory)
+                
+    @classmethod
+    def load(cls, path, mmap = True):
+        """
+        Load an `Experiment` that was saved with `save`.
+        
+        .. warning::
+            `load` unpickles ``experiment.pickle`` in ``path``, and unpickling
+            can run arbitrary code.  Only load experiments from directories
+            you trust.
+        
+        Parameters
+        ----------
+        path : Str
+            The directory the `Experiment` was saved to.
+            
+        mmap : Bool (default = True)
+            If ``True``, memory-map the columns instead of reading them, so
+            loading is (nearly) instantaneous and events are only read from 
+            disk as they're used.  The files are mapped copy-on-write, so
+            they're never modified.  See `memory_map`.
+            
+        Returns
+        -------
+        Experiment
+            The `Experiment` that was saved.
+            
+        Raises
+        ------
+        CytoflowError
+            If ``path`` isn't a saved `Experiment`.
+        """
+        
+        try:
+            with open(os.path.join(path, "experiment.pickle"), 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError) as e:
+            raise util.CytoflowError("Couldn't load an experiment from {}: {}"
+                                     .format(path, str(e))) from e
+            
+        if state.get('version') != 1:
+            raise util.CytoflowError("Unknown experiment format in {}"
+                                     .format(path))
+        
+        columns = {}
+        for spec in state['columns']:
+            if 'file' in spec:
+                values = np.load(os.path.join(path, spec['file']),
+                                 mmap_mode = "c" if mmap else None)
+            else:
+                values = spec['values']
+                
+            if 'categories' in spec:
+                values = pd.Categorical.from_codes(values, 
+                                                   categories = spec['categories'],
+                                                   ordered = spec['ordered'])
+                
+            columns[spec['name']] = pd.Series(values, 
+                                              index = state['index'], 
+                                              copy = False)
+            
+        ret = cls(channel_dtype = state['channel_dtype'])
+        ret.metadata = state['metadata']
+        ret.statistics = state['statistics']
+        ret.history = state['history']
+        ret.data = pd.DataFrame(columns, 
+                                index = state['index'],
+                                columns = [spec['name'] for spec in state['columns']],
+                                copy = False)
+        
+        return ret
+                
+    def iter_chunks(self, columns = None, chunk_size = 2 ** 20):
+        """
+        Iterate over the events in this `Experiment` in chunks of (at most)
+        ``chunk_size`` events.  
+        
+        Each chunk is a `pandas.DataFrame` whose columns are views of the 
+        `Experiment`'s columns, so iterating doesn't copy the data -- 
+        combined with `memory_map`, single-pass operations (like gates) run 
+        over experiments that are larger than RAM with bounded memory.
+        A subset returned by `subset` or `query` only gathers the events in
+        each chunk as it's needed.
+        
+        Parameters
+        ----------
+        columns : Str or List(Str) (optional)
+            The columns to include in each chunk.  If ``None``, include all
+            of them.
+            
+        chunk_size : Int (default = 1048576)
+            The maximum number of events in each chunk.
+            
+        Yields
+        ------
+        (slice, pandas.DataFrame)
+            The (positional) rows in this chunk, and the chunk itself.  
+            Use the slice to fill in an array that has one entry per
+            event, for example::
+            
+                gate = np.empty(len(experiment), dtype = bool)
+                for rows, chunk in experiment.iter_chunks("Y2-A"):
+                    gate[rows] = chunk["Y2-A"] > 1000
+                    
+        Raises
+        ------
+        CytoflowError
+            If a column isn't in the `Experiment`, or ``chunk_size`` isn't
+            positive.
+        """
+        
+        if columns is None:
+            columns = list(self._columns())
+        elif isinstance(columns, str):
+            columns = [columns]
+            
+        for column in columns:
+            if column not in self._columns():
+                raise util.CytoflowError("Column {} not in the experiment"
+                                         .format(column))
+                
+        if chunk_size <= 0:
+            raise util.CytoflowError("chunk_size must be positive")
+            
+        length = len(self)
+        for start in range(0, length, chunk_size):
+            rows = slice(start, min(start + chunk_size, length))
+            chunk = pd.DataFrame({c : self._chunk(c, rows) for c in columns},
+                                 columns = columns,
+                                 copy = False)
+            yield rows, chunk
             
     def add_condition(self, name, dtype, data = None):
         """
@@ -410,6 +1102,7 @@ class Experiment(HasStrictTraits):
             self.metadata[name]['values_type'] = 'categorical'
             
         self.metadata[name]['values'] = natsorted(self.data[name].unique())
+        self._invalidate()
     
             
     def add_channel(self, name, data = None):
@@ -430,15 +1123,15 @@ class Experiment(HasStrictTraits):
         data : pandas.Series
             The `pandas.Series` to add to `data`.  Must be the same
             length as `data`, and it must be convertable to a 
-            dtype of ``float64``.  If ``None``, will add an empty column to 
-            the `Experiment` ... but the `Experiment` must be 
-            empty to do so!
+            `channel_dtype` (by default, ``float64``).  If ``None``, will add 
+            an empty column to the `Experiment` ... but the `Experiment` 
+            must be empty to do so!
              
         Raises
         ------
         :exc:`.CytoflowError`
             If the `pandas.Series` passed in ``data`` isn't the same length
-            as `data`, or isn't convertable to a dtype ``float64``.          
+            as `data`, or isn't convertable to `channel_dtype`.          
             
         Examples
         --------
@@ -463,15 +1156,17 @@ class Experiment(HasStrictTraits):
         
         try:
             if data is not None:
-                self.data[name] = data.astype("float64", copy = True)
+                self.data[name] = data.astype(self.channel_dtype, copy = True)
             else:
-                self.data[name] = pd.Series(dtype = "float64")
+                self.data[name] = pd.Series(dtype = self.channel_dtype)
                 
         except (ValueError, TypeError) as exc:
-                raise util.CytoflowError("Had trouble converting data to type \"float64\"") from exc
+                raise util.CytoflowError("Had trouble converting data to type \"{}\""
+                                         .format(self.channel_dtype)) from exc
 
         self.metadata[name] = {}
         self.metadata[name]['type'] = "channel"
+        self._invalidate()
         
     def add_events(self, data, conditions):
         """
@@ -527,59 +1222,348 @@ class Experiment(HasStrictTraits):
         
         """
 
-        # make sure the new tube's channels match the rest of the 
-        # channels in the Experiment
-    
-        if len(self) > 0 and set(data.columns) != set(self.channels):
-            raise util.CytoflowError("New events don't have the same channels")
-            
-        # check that the conditions for this tube exist in the experiment
-        # already
-
-        if( any(True for k in conditions if k not in self.conditions) or \
-            any(True for k in self.conditions if k not in conditions) ):
-            raise util.CytoflowError("Metadata for this tube should be {}"
-                                     .format(list(self.conditions.keys())))
+        self.add_events_many([(data, conditions)])
+        
+    def add_events_many(self, tubes):
+        """
+        Add many tubes' worth of new events to this `Experiment` at once.
+        Like `add_events`, `add_events_many` operates **in place**.
+        
+        Calling `add_events` once per tube copies the (growing) `data` every
+        time, so loading a large plate is quadratic in the number of events.
+        `add_events_many` validates every tube first, then builds each
+        column of the new `data` exactly once: channels are copied into
+        preallocated arrays, and categorical conditions are built directly
+        from their integer codes.
+        
+        Parameters
+        ----------
+        tubes : List((pandas.DataFrame, Dict(Str, Any)))
+            A list of ``(data, conditions)`` pairs, one per tube or well.  
+            Each pair has the same requirements as the ``data`` and 
+            ``conditions`` parameters of `add_events`.  Events are added
+            in the order of ``tubes``.
+ 
+        Raises
+        ------
+        :exc:`.CytoflowError`
+            If any tube fails the checks described in `add_events`.  No
+            events are added if any tube is invalid.
             
-        # add the conditions to tube's internal data frame.  specify the conditions
-        # dtype using self.conditions.  check for errors as we do so.
+        Examples
+        --------
+        >>> import cytoflow as flow
+        >>> from fcsparser import fcsparser
+        >>> ex = flow.Experiment()
+        >>> ex.add_condition("Time", "float")
+        >>> ex.add_condition("Strain", "category")
+        >>> _, tube1 = fcparser.parse('CFP_Well_A4.fcs')
+        >>> _, tube2 = fcparser.parse('RFP_Well_A3.fcs')
+        >>> ex.add_events_many([(tube1, {"Time" : 1, "Strain" : "BL21"}),
+        ...                     (tube2, {"Time" : 1, "Strain" : "Top10G"})])
         
-        # take this chance to up-convert the float32s to float64.
-        # this happened automatically in DataFrame.append(), below, but 
-        # only in certain cases.... :-/
+        """
         
-        # TODO - the FCS standard says you can specify the precision.  
-        # check with int/float/double files!
+        tubes = list(tubes)
+        if not tubes:
+            return
         
-        new_data = data.astype("float64", copy=True)
+        conditions = self.conditions
         
-        for meta_name, meta_value in conditions.items():
-            meta_type = self.conditions[meta_name].dtype
+        # make sure the new tubes' channels match the rest of the 
+        # channels in the Experiment (or, if the Experiment is empty, 
+        # each other.)
+        if len(self) > 0:
+            channels = set(self.channels)
+        else:
+            channels = set(tubes[0][0].columns)
             
-            if is_categorical_dtype(meta_type):
-                meta_type = CategoricalDtype([meta_value])
-
-            new_data[meta_name] = \
-                pd.Series(data = [meta_value] * len(new_data),
-                          index = new_data.index,
-                          dtype = meta_type)
+        for data, tube_conditions in tubes:
+            if set(data.columns) != channels:
+                raise util.CytoflowError("New events don't have the same channels")
             
-            # if we're categorical, merge the categories
-            if is_categorical_dtype(meta_type) and meta_name in self.data:
-                cats = set(self.data[meta_name].cat.categories) | set(new_data[meta_name].cat.categories)
-                cats = sorted(cats) 
-                self.data[meta_name] = self.data[meta_name].cat.set_categories(cats)
-                new_data[meta_name] = new_data[meta_name].cat.set_categories(cats)
+            # check that the conditions for this tube exist in the experiment
+            # already
+            if( any(True for k in tube_conditions if k not in conditions) or \
+                any(True for k in conditions if k not in tube_conditions) ):
+                raise util.CytoflowError("Metadata for this tube should be {}"
+                                         .format(list(conditions.keys())))
                 
-
+        # figure out where each tube's events go in the new data
+        old_len = len(self)
+        bounds = [old_len]
+        for data, _ in tubes:
+            bounds.append(bounds[-1] + len(data))
+        new_len = bounds[-1]
         
-        self.data = self.data.append(new_data, ignore_index = True, sort = True)
-        del new_data
+        new_columns = {}
+        
+        # channels are converted to channel_dtype (by default, float64)
+        for channel in channels:
+            values = np.empty(new_len, dtype = self.channel_dtype)
+            if channel in self.data:
+                values[:old_len] = self.data[channel].values
+            for (data, _), start, end in zip(tubes, bounds[:-1], bounds[1:]):
+                values[start:end] = data[channel].values
+            new_columns[channel] = values
+        
+        # conditions are constant for each tube.  specify the conditions'
+        # dtypes using the existing columns, and check for errors as we
+        # do so.
+        for name in conditions:
+            old_values = self.data[name] if name in self.data else None
+            
+            if old_values is not None and is_categorical_dtype(old_values.dtype):
+                # merge the categories, then build the column from the
+                # category codes
+                cats = set(old_values.cat.categories) | \
+                       set(c[name] for _, c in tubes)
+                cats = sorted(cats)
+                cat_codes = {c : i for i, c in enumerate(cats)}
+                
+                # signed, so that missing values (code -1) survive
+                codes = np.empty(new_len, dtype = np.min_scalar_type(-len(cats)))
+                codes[:old_len] = old_values.cat.set_categories(cats).cat.codes.values
+                for (_, c), start, end in zip(tubes, bounds[:-1], bounds[1:]):
+                    codes[start:end] = cat_codes[c[name]]
+                    
+                new_columns[name] = pd.Categorical.from_codes(codes, 
+                                                              categories = cats)
+            else:
+                dtype = old_values.dtype if old_values is not None else None
+                
+                try:
+                    tube_values = [pd.Series([c[name]], dtype = dtype)
+                                   for _, c in tubes]
+                except (ValueError, TypeError) as exc:
+                    raise util.CytoflowError("Had trouble converting condition {} "
+                                             "to type {}".format(name, dtype)) from exc
+                    
+                if dtype is None:
+                    dtype = tube_values[0].dtype
+                    
+                values = np.empty(new_len, dtype = dtype)
+                if old_values is not None:
+                    values[:old_len] = old_values.values
+                for v, start, end in zip(tube_values, bounds[:-1], bounds[1:]):
+                    values[start:end] = v.values[0]
+                    
+                new_columns[name] = values
+                
+        # keep the column order that DataFrame.append(sort = True) gave us
+        self.data = pd.DataFrame(new_columns, 
+                                 columns = sorted(new_columns.keys()),
+                                 copy = False)
         
         # update the metadata 'values'
-        for condition in self.conditions:
+        for condition in conditions:
             self.metadata[condition]['values'] = natsorted(self.data[condition].unique())
 
+def _can_pickle(value, what):
+    """Can ``value`` be pickled?  If not, warn that ``what`` is skipped."""
+    try:
+        pickle.dumps(value)
+    except Exception:
+        warn("Can't save {}, skipping it".format(what), util.CytoflowWarning)
+        return False
+    
+    return True
+
+
+def _memmap_of(values):
+    """The `numpy.memmap` that the array ``values`` is a view of, or ``None``"""
+    while values is not None and not isinstance(values, np.memmap):
+        values = getattr(values, "base", None)
+        
+    return values
+
+
+def _mapped_from(values, directory):
+    """Is the array ``values`` memory-mapped from a file in ``directory``?"""
+    values = _memmap_of(values)
+    if values is None or values.filename is None:
+        return False
+    
+    return os.path.dirname(os.path.realpath(values.filename)) == \
+           os.path.realpath(directory)
+
+
+class _ColumnResolver(MutableMapping):
+    """
+    Maps sanitized column names to an `Experiment`'s columns, for 
+    `pandas.eval`.  Columns are only read when the expression uses them.
+    `pandas.eval` sometimes replaces values while it's evaluating an
+    expression; those are kept here, not in the `Experiment`.
+    """
+    
+    def __init__(self, experiment):
+        self._experiment = experiment
+        self._names = {}
+        self._values = {}
+        
+        for name in experiment._columns():
+            new_name = util.sanitize_identifier(name)
+            if new_name in self._names:
+                raise util.CytoflowError("Tried to sanitize column name {0} to "
+                                         "{1} but it already existed in the "
+                                         " DataFrame."
+                                         .format(name, new_name))
+            else:
+                self._names[new_name] = name
+                
+    def __getitem__(self, key):
+        if key in self._values:
+            return self._values[key]
+        return self._experiment[self._names[key]]
+    
+    def __setitem__(self, key, value):
+        self._values[key] = value
+        
+    def __delitem__(self, key):
+        del self._values[key]
+    
+    def __iter__(self):
+        return iter(set(self._names) | set(self._values))
+    
+    def __len__(self):
+        return len(set(self._names) | set(self._values))
+
+
+class _ScaledColumns(object):
+    """
+    The scaled columns memoized by `Experiment.scaled`: a least-recently-used
+    cache whose entries take up at most ``max_bytes``.  If ``parent`` is set,
+    it's the cache of the `Experiment` this one is a subset of, and entries
+    that aren't here are taken from it (the events at positions ``rows``.)
+    """
+    
+    def __init__(self, max_bytes, parent = None, rows = None):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._parent = parent
+        self._rows = rows
+        
+    def get(self, key):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        
+        if self._parent is not None and key in self._parent._entries:
+            values = self._parent._entries[key].take(self._rows)
+            values.index = pd.RangeIndex(len(values))
+            self.put(key, values)
+            return values
+        
+        return None
+    
+    def put(self, key, values):
+        nbytes = values.memory_usage(index = False)
+        if nbytes > self.max_bytes:
+            return
+        
+        if key in self._entries:
+            self.nbytes -= self._entries[key].memory_usage(index = False)
+        
+        self._entries[key] = values
+        self.nbytes += nbytes
+        self._evict()
+        
+    def resize(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._evict()
+            
+    def _evict(self):
+        while self.nbytes > self.max_bytes:
+            _, old = self._entries.popitem(last = False)
+            self.nbytes -= old.memory_usage(index = False)
+            
+    def discard(self, column):
+        for key in [k for k in self._entries if k[0] == column]:
+            self.nbytes -= self._entries.pop(key).memory_usage(index = False)
+            
+        if self._parent is not None:
+            self._parent.discard(column)
+            
+    def copy(self):
+        ret = _ScaledColumns(self.max_bytes, 
+                             parent = self._parent.copy() if self._parent is not None else None, 
+                             rows = self._rows)
+        ret._entries = OrderedDict(self._entries)
+        ret.nbytes = self.nbytes
+        return ret
+    
+
+class GroupIndex(object):
+    """
+    The events in an `Experiment`, grouped by the values of one or more
+    conditions.  Don't create this directly; call `Experiment.group_index`
+    instead.
+    
+    `GroupIndex` supports the parts of the `pandas.core.groupby.DataFrameGroupBy`
+    API that `cytoflow` uses: iterating over ``(group, data)`` pairs, `groups`,
+    `indices`, `get_group`, and selecting columns with ``[]``.  Groups are in
+    the same order, and have the same keys, as `pandas.DataFrame.groupby`. 
+    
+    Attributes
+    ----------
+    by : Tuple(Str)
+        The conditions that the events are grouped by.
+        
+    indices : Dict(Any : numpy.ndarray)
+        The row positions in each group.  The keys are the groups; the values
+        are arrays of integer (positional) row indices.
+    """
+    
+    def __init__(self, by, indices, experiment, columns = None):
+        self.by = by
+        self.indices = indices
+        self._experiment = experiment
+        self._columns = columns
+        
+    @property
+    def _data(self):
+        if self._columns is None:
+            return self._experiment.data
+        else:
+            return self._experiment[self._columns]
+        
+    def __len__(self):
+        return len(self.indices)
+    
+    def __iter__(self):
+        data = self._data
+        for group, idx in self.indices.items():
+            yield group, data.take(idx)
+            
+    def __getitem__(self, key):
+        """Select a column (or columns) to return from each group"""
+        return GroupIndex(self.by, self.indices, self._experiment, key)
+            
+    @property
+    def groups(self):
+        """A dict mapping each group to the index labels of its rows"""
+        index = self._data.index
+        return {group : index[idx] for group, idx in self.indices.items()}
+        
+    @property
+    def codes(self):
+        """The (integer) group number of each event, or -1 if it's in no group"""
+        codes = np.full(len(self._experiment), -1, dtype = np.int64)
+        for i, idx in enumerate(self.indices.values()):
+            codes[idx] = i
+        return codes
+    
+    def get_group(self, group):
+        """Return the rows in ``group``"""
+        return self._data.take(self.indices[group])
+    
+    def size(self):
+        """Return a `pandas.Series` with the number of events in each group"""
+        return pd.Series({group : len(idx) for group, idx in self.indices.items()},
+                         dtype = np.int64)
+
+
 if __name__ == "__main__":
     from fcsparser import fcsparser
     ex = Experiment()
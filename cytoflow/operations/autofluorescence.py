@@ -40,7 +40,7 @@ import cytoflow.views
 import cytoflow.utility as util
 
 from .i_operation import IOperation
-from .import_op import Tube, ImportOp, check_tube
+from .control_cache import import_control
 
 @provides(IOperation)
 class AutofluorescenceOp(HasStrictTraits):
@@ -172,17 +172,6 @@ class AutofluorescenceOp(HasStrictTraits):
         self._af_stdev.clear()
         self._af_histogram.clear()
         
-        # make a little Experiment
-        check_tube(self.blank_file, experiment)  
-        exp_conditions = {k: experiment.data[k].dtype.name for k in self.blank_file_conditions.keys()}
-
-        blank_exp = ImportOp(tubes = [Tube(file = self.blank_file,
-                                           conditions = self.blank_file_conditions)],
-                             conditions = exp_conditions, 
-                             channels = {experiment.metadata[c]["fcs_name"] : c for c in experiment.channels},
-                             name_metadata = experiment.metadata['name_metadata']).apply()
-                                     
-        # apply previous operations
         for op in experiment.history:
             if hasattr(op, 'by'):
                 for by in op.by:
@@ -192,8 +181,11 @@ class AutofluorescenceOp(HasStrictTraits):
                              .format(by),
                              util.CytoflowOpWarning)
 
-                    
-            blank_exp = op.apply(blank_exp)
+        # make a little Experiment, and apply previous operations (the 
+        # result is cached, so re-estimating doesn't import it again)
+        blank_exp = import_control(self.blank_file, 
+                                   self.blank_file_conditions, 
+                                   experiment)
             
         # subset it
         if subset:
@@ -273,7 +265,7 @@ class AutofluorescenceOp(HasStrictTraits):
             raise util.CytoflowOpError('channels', "Estimated channels differ from the channels "
                                "parameter.  Did you forget to (re)run estimate()?")
         
-        new_experiment = experiment.clone(deep = True)
+        new_experiment = experiment.clone(deep = False)
                 
         for channel in self.channels:
             new_experiment[channel] = \
@@ -203,14 +203,14 @@ class ByView(OpView):
                 self._returned = False
                 
                 if by:
-                    self._iter = experiment.data.groupby(by).__iter__()
+                    self._iter = iter(experiment.group_index(by).indices)
                 
             def __iter__(self):
                 return self
             
             def __next__(self):
                 if self._iter:
-                    return next(self._iter)[0]
+                    return next(self._iter)
                 else:
                     if self._returned:
                         raise StopIteration
@@ -299,9 +299,9 @@ class ByView(OpView):
                                              "Don't set view.plot_name if you don't also set operation.by"
                                              .format(plot_name))
                                
-            groupby = experiment.data.groupby(by)
+            groupby = experiment.group_index(by)
 
-            if plot_name not in groupby.groups.keys():
+            if plot_name not in groupby.indices:
                 raise util.CytoflowViewError('plot_name',
                                              "Plot {} must be one of the values "
                                              "returned by enum_plots(). "
@@ -309,7 +309,7 @@ class ByView(OpView):
                                              "(DEBUG: groupby keys: {}"
                                              .format(plot_name, 
                                                      [x for x in self.enum_plots(experiment)],
-                                                     groupby.groups.keys()))
+                                                     groupby.indices.keys()))
                 
             experiment = experiment.clone()
             experiment.data = groupby.get_group(plot_name)
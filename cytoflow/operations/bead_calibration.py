@@ -44,7 +44,7 @@ import cytoflow.views
 import cytoflow.utility as util
 
 from .i_operation import IOperation
-from .import_op import check_tube, Tube, ImportOp
+from .control_cache import import_control
 
 @provides(IOperation)
 class BeadCalibrationOp(HasStrictTraits):
@@ -255,11 +255,9 @@ class BeadCalibrationOp(HasStrictTraits):
         self._peaks.clear()
         self._mefs.clear()
                         
-        # make a little Experiment
-        check_tube(self.beads_file, experiment)
-        beads_exp = ImportOp(tubes = [Tube(file = self.beads_file)],
-                             channels = {experiment.metadata[c]["fcs_name"] : c for c in experiment.channels},
-                             name_metadata = experiment.metadata['name_metadata']).apply()
+        # make a little Experiment (the result is cached, so re-estimating
+        # doesn't import it again)
+        beads_exp = import_control(self.beads_file, {}, experiment, history = [])
         
         channels = list(self.units.keys())
 
@@ -456,13 +454,13 @@ class BeadCalibrationOp(HasStrictTraits):
         # you have the equivalent of -5 molecules of fluoresceine?  so,
         # we filter out negative values here.
 
-        new_experiment = experiment.clone(deep = True)
+        new_experiment = experiment.clone(deep = False)
         
+        keep = np.ones(len(new_experiment), dtype = bool)
         for channel in channels:
-            new_experiment.data = \
-                new_experiment.data[new_experiment.data[channel] > 0]
+            keep &= (new_experiment[channel] > 0).values
                                 
-        new_experiment.data.reset_index(drop = True, inplace = True)
+        new_experiment.data = new_experiment.data[keep].reset_index(drop = True)
         
         for channel in channels:
             calibration_fn = self._calibration_functions[channel]
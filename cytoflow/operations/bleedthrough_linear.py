@@ -37,7 +37,6 @@ from traits.api import (HasStrictTraits, Str, File, Dict, Instance,
                         Constant, Tuple, Float, Any, provides)
     
 import numpy as np
-import pandas as pd
 import matplotlib.pyplot as plt
 import scipy.optimize
 
@@ -45,7 +44,7 @@ import cytoflow.views
 import cytoflow.utility as util
 
 from .i_operation import IOperation
-from .import_op import Tube, ImportOp, check_tube
+from .control_cache import import_control
 
 @provides(IOperation)
 class BleedthroughLinearOp(HasStrictTraits):
@@ -193,18 +192,8 @@ class BleedthroughLinearOp(HasStrictTraits):
         spillover = {}
         for channel in channels:
             
-            # make a little Experiment
-            check_tube(self.controls[channel], experiment)
             tube_conditions = self.control_conditions[channel] if channel in self.control_conditions else {}
-            exp_conditions = {k: experiment.data[k].dtype.name for k in tube_conditions.keys()}
-
-            tube_exp = ImportOp(tubes = [Tube(file = self.controls[channel],
-                                              conditions = tube_conditions)],
-                                conditions = exp_conditions,
-                                channels = {experiment.metadata[c]["fcs_name"] : c for c in experiment.channels},
-                                name_metadata = experiment.metadata['name_metadata']).apply()
             
-            # apply previous operations
             for op in experiment.history:
                 if hasattr(op, 'by'):
                     for by in op.by:
@@ -213,7 +202,12 @@ class BleedthroughLinearOp(HasStrictTraits):
                                                        "Prior to applying this operation, "
                                                        "you must not apply any operation with 'by' "
                                                        "set to an experimental condition.")
-                tube_exp = op.apply(tube_exp)
+                        
+            # make a little Experiment, and apply previous operations (the 
+            # result is cached, so re-estimating doesn't import it again)
+            tube_exp = import_control(self.controls[channel], 
+                                      tube_conditions, 
+                                      experiment)
                 
             # subset it
             if subset:
@@ -319,7 +313,7 @@ class BleedthroughLinearOp(HasStrictTraits):
                                            "Must have both (from, to) and "
                                            "(to, from) keys in self.spillover")
         
-        new_experiment = experiment.clone(deep = True)
+        new_experiment = experiment.clone(deep = False)
         
         # the completely arbitrary ordering of the channels
         channels = list(set([x for (x, _) in list(self.spillover.keys())]))
@@ -336,10 +330,7 @@ class BleedthroughLinearOp(HasStrictTraits):
          
         # and assign to the new experiment
         for i, c in enumerate(channels):
-            new_experiment[c] = pd.Series(new_channels[:, i])
-            
-        # make sure the new experiment has the same column order as the old one
-        new_experiment.data = new_experiment.data[list(experiment.data.columns)]
+            new_experiment[c] = new_channels[:, i]
          
         for channel in channels:
             # add the spillover values to the channel's metadata
@@ -223,10 +223,10 @@ class ChannelStatisticOp(HasStrictTraits):
             if len(unique) == 1:
                 warn("Only one category for {}".format(b), util.CytoflowOpWarning)
 
-        groupby = experiment.data.groupby(self.by)
+        groupby = experiment.group_index(self.by)
 
-        for group, data_subset in groupby:
-            if len(data_subset) == 0:
+        for group, group_idx in groupby.indices.items():
+            if len(group_idx) == 0:
                 warn("Group {} had no data"
                      .format(group), 
                      util.CytoflowOpWarning)
@@ -243,15 +243,19 @@ class ChannelStatisticOp(HasStrictTraits):
                          name = "{} : {}".format(stat_name[0], stat_name[1]),
                          dtype = np.dtype(object)).sort_index()
         
-        for group, data_subset in groupby:
+        for group, data_subset in groupby[self.channel]:
             if len(data_subset) == 0:
                 continue
             
+            # compute statistics in double precision, even if the channel
+            # is stored as float32
+            data_subset = data_subset.astype("float64", copy = False)
+            
             if not isinstance(group, tuple):
                 group = (group,)
             
             try:
-                v = self.function(data_subset[self.channel])
+                v = self.function(data_subset)
                 
                 stat.at[group] = v
 
@@ -43,7 +43,7 @@ import cytoflow.views
 import cytoflow.utility as util
 
 from .i_operation import IOperation
-from .import_op import Tube, ImportOp, check_tube
+from .control_cache import import_control
 
 @provides(IOperation)
 class ColorTranslationOp(HasStrictTraits):
@@ -219,19 +219,8 @@ class ColorTranslationOp(HasStrictTraits):
             tube_conditions = self.control_conditions[(from_channel, to_channel)] \
                                     if (from_channel, to_channel) in self.control_conditions \
                                     else {}
-            conditions = {k: experiment.data[k].dtype.name for k in tube_conditions.keys()}
             
             if tube_file not in tubes: 
-                # make a little Experiment
-                check_tube(tube_file, experiment)
-
-                tube_exp = ImportOp(tubes = [Tube(file = tube_file,
-                                                  conditions = tube_conditions)],
-                                    conditions = conditions,
-                                    channels = {experiment.metadata[c]["fcs_name"] : c for c in experiment.channels},
-                                    name_metadata = experiment.metadata['name_metadata']).apply()
-                
-                # apply previous operations
                 for op in experiment.history:
                     if hasattr(op, 'by'):
                         for by in op.by:
@@ -240,7 +229,10 @@ class ColorTranslationOp(HasStrictTraits):
                                                            "Prior to applying this operation, "
                                                            "you must not apply any operation with 'by' "
                                                            "set to an experimental condition.")
-                    tube_exp = op.apply(tube_exp) 
+                            
+                # make a little Experiment, and apply previous operations (the 
+                # result is cached, so re-estimating doesn't import it again)
+                tube_exp = import_control(tube_file, tube_conditions, experiment)
 
                 # subset the events
                 if subset:
@@ -360,13 +352,13 @@ class ColorTranslationOp(HasStrictTraits):
                                            "{} --> {}.  Did you call estimate()?"
                                            .format(key, val))
                        
-        new_experiment = experiment.clone(deep = True)
+        new_experiment = experiment.clone(deep = False)
         
+        keep = np.ones(len(new_experiment), dtype = bool)
         for channel in from_channels:
-            new_experiment.data = \
-                new_experiment.data[new_experiment.data[channel] > 0]
+            keep &= (new_experiment[channel] > 0).values
                 
-        new_experiment.data.reset_index(drop = True, inplace = True)
+        new_experiment.data = new_experiment.data[keep].reset_index(drop = True)
         
         for from_channel, to_channel in translation.items():
             trans_fn = self._trans_fn[(from_channel, to_channel)]
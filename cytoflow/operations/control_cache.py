@@ -0,0 +1,203 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+cytoflow.operations.control_cache
+---------------------------------
+
+A process-wide cache of imported control tubes.  The calibration operations
+(`AutofluorescenceOp`, `BleedthroughLinearOp`, `BeadCalibrationOp` and
+`ColorTranslationOp`) each import their control files and re-apply the
+experiment's history to them; the TASBE workflow runs all four in a row,
+and re-estimates them every time a parameter changes.  With the cache, each
+control file is imported once, and each operation in the history is applied
+to it once.
+
+`ControlCache` -- a size-bounded LRU cache of imported controls.
+
+`control_cache` -- the process-wide `ControlCache`.
+
+`import_control` -- import a control tube, using `control_cache`.
+"""
+
+import os, threading, weakref
+from collections import OrderedDict
+
+from traits.api import HasTraits
+
+from .import_op import Tube, ImportOp, check_tube
+
+class ControlCache(object):
+    """
+    A size-bounded, least-recently-used cache of imported control tubes,
+    with (some prefix of) an experiment's history applied to them.
+
+    Entries are keyed by the control file's (real) path, size and
+    modification time; the tube's conditions; the channels and channel
+    names of the experiment; and the operations in the history that have
+    been applied.  Operations are compared by identity, and by how many
+    times their traits have changed -- an operation's estimates aren't
+    part of its pickled state, so re-estimating it has to change its key.
+    Each prefix of the history is cached separately, so changing (or
+    re-estimating) one operation only re-applies that operation and the
+    ones after it.
+
+    Attributes
+    ----------
+    maxsize : Int
+        The maximum number of entries (imported or partially-processed
+        control tubes) to keep.
+    """
+
+    def __init__(self, maxsize = 32):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, filename, conditions, experiment, history = None):
+        """
+        Import the control tube ``filename`` with the same channels as
+        ``experiment``, then apply ``history`` to it.
+
+        Parameters
+        ----------
+        filename : Str
+            The control's FCS file.
+
+        conditions : Dict(Str : Any)
+            The tube's conditions.  Their types are taken from
+            ``experiment``.
+
+        experiment : `Experiment`
+            The experiment the control is for.
+
+        history : List(`IOperation`) (default = None)
+            The operations to apply to the imported tube, in order.  If
+            ``None``, use ``experiment.history``.
+
+        Returns
+        -------
+        `Experiment`
+            A (shallow) clone of the processed control tube.
+
+        Raises
+        ------
+        `CytoflowError`
+            If ``filename`` can't be imported, or doesn't match
+            ``experiment`` (see `check_tube`.)
+        """
+
+        if history is None:
+            history = experiment.history
+
+        check_tube(filename, experiment)
+
+        stat = os.stat(filename)
+        exp_conditions = {k : experiment.data[k].dtype.name for k in conditions}
+        channels = {experiment.metadata[c]["fcs_name"] : c for c in experiment.channels}
+        name_metadata = experiment.metadata['name_metadata']
+
+        tube_key = (os.path.realpath(filename), stat.st_size, stat.st_mtime_ns,
+                    tuple(sorted((k, repr(v), exp_conditions[k]) for k, v in conditions.items())),
+                    tuple(sorted(channels.items())),
+                    name_metadata)
+
+        op_keys = [_op_key(op) for op in history]
+
+        # find the longest prefix of the history that we've already applied
+        with self._lock:
+            for n in range(len(history), -1, -1):
+                key = (tube_key, tuple(op_keys[:n]))
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    tube_exp = self._entries[key][0]
+                    break
+            else:
+                n, tube_exp = None, None
+
+        if tube_exp is None:
+            n = 0
+            tube_exp = ImportOp(tubes = [Tube(file = filename,
+                                              conditions = conditions)],
+                                conditions = exp_conditions,
+                                channels = channels,
+                                name_metadata = name_metadata).apply()
+            self._put((tube_key, ()), tube_exp, [])
+
+        for i in range(n, len(history)):
+            tube_exp = history[i].apply(tube_exp)
+            self._put((tube_key, tuple(op_keys[:i + 1])), tube_exp, history[:i + 1])
+
+        return tube_exp.clone(deep = False)
+
+    def _put(self, key, tube_exp, history):
+        # keep a reference to the history, so the ids of the operations
+        # aren't re-used
+        with self._lock:
+            self._entries[key] = (tube_exp, list(history))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last = False)
+
+    def clear(self):
+        """Remove all the entries from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+
+# operation --> how many times its traits have changed since we first saw it
+_generations = weakref.WeakKeyDictionary()
+_generations_lock = threading.Lock()
+
+def _op_key(op):
+    """
+    The key for an operation: its identity, and (if it has traits) how many
+    times they've changed.  Estimating an operation sets its (transient)
+    estimated traits, so a re-estimated operation gets a new key.
+    """
+    if not isinstance(op, HasTraits):
+        return ('id', id(op))
+    
+    with _generations_lock:
+        if op not in _generations:
+            _generations[op] = 0
+            op.on_trait_change(_next_generation)
+            
+        return ('id', id(op), _generations[op])
+    
+    
+def _next_generation(op, name, old, new):
+    with _generations_lock:
+        if op in _generations:
+            _generations[op] += 1
+
+
+# the process-wide cache
+control_cache = ControlCache()
+
+def import_control(filename, conditions, experiment, history = None):
+    """
+    Import a control tube and apply an experiment's history to it, using
+    (and filling) the process-wide `control_cache`.  Takes the same
+    parameters as `ControlCache.get`.
+    """
+    return control_cache.get(filename, conditions, experiment, history = history)
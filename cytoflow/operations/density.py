@@ -259,12 +259,7 @@ class DensityGateOp(HasStrictTraits):
                                            "Subset string '{0}' returned no events"
                                            .format(subset))
                 
-        if self.by:
-            groupby = experiment.data.groupby(self.by)
-        else:
-            # use a lambda expression to return a group that contains
-            # all the events
-            groupby = experiment.data.groupby(lambda _: True)
+        groupby = experiment.group_index(self.by)
             
         # get the scale. estimate the scale params for the ENTIRE data set,
         # not subsets we get from groupby().  And we need to save it so that
@@ -391,12 +386,7 @@ class DensityGateOp(HasStrictTraits):
                                            "must be one of {}"
                                            .format(b, experiment.conditions))
         
-        if self.by:
-            groupby = experiment.data.groupby(self.by)
-        else:
-            # use a lambda expression to return a group that
-            # contains all the events
-            groupby = experiment.data.groupby(lambda _: True)
+        groupby = experiment.group_index(self.by)
             
         event_assignments = pd.Series([False] * len(experiment), dtype = "bool")
         
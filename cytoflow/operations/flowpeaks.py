@@ -311,12 +311,7 @@ class FlowPeaksOp(HasStrictTraits):
                                            "Subset string '{0}' returned no events"
                                            .format(subset))
                 
-        if self.by:
-            groupby = experiment.data.groupby(self.by)
-        else:
-            # use a lambda expression to return a group that contains
-            # all the events
-            groupby = experiment.data.groupby(lambda _: True)
+        groupby = experiment.group_index(self.by)
             
         # get the scale. estimate the scale params for the ENTIRE data set,
         # not subsets we get from groupby().  And we need to save it so that
@@ -329,13 +324,16 @@ class FlowPeaksOp(HasStrictTraits):
             else:
                 self._scale[c] = util.scale_factory(util.get_default_scale(), experiment, channel = c)
                                     
-        for data_group, data_subset in groupby:
-            if len(data_subset) == 0:
+        # the experiment memoizes the scaled channels, so apply() re-uses them
+        scaled = pd.DataFrame({c : experiment.scaled(c, self._scale[c]) for c in self.channels},
+                              columns = self.channels)
+        
+        for data_group, group_rows in groupby.indices.items():
+            if len(group_rows) == 0:
                 raise util.CytoflowOpError('by',
                                            "Group {} had no data".format(data_group))
-            x = data_subset.loc[:, self.channels[:]]
-            for c in self.channels:
-                x[c] = self._scale[c](x[c])
+            # fit in double precision, even if the channels are stored as float32
+            x = scaled.take(group_rows)
             
             # drop data that isn't in the scale range
             for c in self.channels:
@@ -663,12 +661,7 @@ class FlowPeaksOp(HasStrictTraits):
                                            "must be one of {}"
                                            .format(b, experiment.conditions))
                  
-        if self.by:
-            groupby = experiment.data.groupby(self.by)
-        else:
-            # use a lambda expression to return a group that contains
-            # all the events
-            groupby = experiment.data.groupby(lambda _: True)
+        groupby = experiment.group_index(self.by)
                  
         event_assignments = pd.Series(["{}_None".format(self.name)] * len(experiment), dtype = "object")
          
@@ -679,8 +672,11 @@ class FlowPeaksOp(HasStrictTraits):
 #                                          names = list(self.by) + ["Cluster"] + ["Channel"])
 #         centers_stat = pd.Series(index = idx, dtype = np.dtype(object)).sort_index()
                      
-        for group, data_subset in groupby:
-            if len(data_subset) == 0:
+        scaled = pd.DataFrame({c : experiment.scaled(c, self._scale[c]) for c in self.channels},
+                              columns = self.channels)
+        
+        for group, group_rows in groupby.indices.items():
+            if len(group_rows) == 0:
                 raise util.CytoflowOpError('by',
                                            "Group {} had no data"
                                            .format(group))
@@ -691,10 +687,7 @@ class FlowPeaksOp(HasStrictTraits):
                                            "model.  Do you need to re-run estimate()?"
                                            .format(group))
                 
-            x = data_subset.loc[:, self.channels[:]]
-            
-            for c in self.channels:
-                x[c] = self._scale[c](x[c])
+            x = scaled.take(group_rows)
                  
             # which values are missing?
  
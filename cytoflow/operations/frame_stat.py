@@ -164,10 +164,10 @@ class FrameStatisticOp(HasStrictTraits):
             if len(unique) == 1:
                 warn("Only one category for {}".format(b), util.CytoflowOpWarning)
                 
-        groupby = experiment.data.groupby(self.by)
+        groupby = experiment.group_index(self.by)
                         
-        for group, data_subset in groupby:
-            if len(data_subset) == 0:
+        for group, group_idx in groupby.indices.items():
+            if len(group_idx) == 0:
                 warn("Group {} had no data"
                      .format(group), 
                      util.CytoflowOpWarning)
@@ -184,10 +184,18 @@ class FrameStatisticOp(HasStrictTraits):
                          name = "{} : {}".format(stat_name[0], stat_name[1]),
                          dtype = np.dtype(object)).sort_index()
         
+        # compute statistics in double precision, even if the channels
+        # are stored as float32
+        upcast = {c : "float64" for c in experiment.channels} \
+                 if experiment.channel_dtype != "float64" else None
+        
         for group, data_subset in groupby:
             if len(data_subset) == 0:
                 continue
             
+            if upcast:
+                data_subset = data_subset.astype(upcast)
+            
             try:
                 v = self.function(data_subset)
                 
@@ -286,12 +286,7 @@ class GaussianMixtureOp(HasStrictTraits):
                                              "Subset string '{0}' returned no events"
                                              .format(subset))
                 
-        if self.by:
-            groupby = experiment.data.groupby(self.by)
-        else:
-            # use a lambda expression to return a group that contains
-            # all the events
-            groupby = experiment.data.groupby(lambda _: True)
+        groupby = experiment.group_index(self.by)
             
         # get the scale. estimate the scale params for the ENTIRE data set,
         # not subsets we get from groupby().  And we need to save it so that
@@ -304,14 +299,17 @@ class GaussianMixtureOp(HasStrictTraits):
         
         gmms = {}
             
-        for group, data_subset in groupby:
-            if len(data_subset) == 0:
+        # the experiment memoizes the scaled channels, so apply() re-uses them
+        scaled = pd.DataFrame({c : experiment.scaled(c, self._scale[c]) for c in self.channels},
+                              columns = self.channels)
+        
+        for group, group_rows in groupby.indices.items():
+            if len(group_rows) == 0:
                 raise util.CytoflowOpError(None,
                                            "Group {} had no data"
                                            .format(group))
-            x = data_subset.loc[:, self.channels[:]]
-            for c in self.channels:
-                x[c] = self._scale[c](x[c])
+            # fit in double precision, even if the channels are stored as float32
+            x = scaled.take(group_rows)
             
             # drop data that isn't in the scale range
             for c in self.channels:
@@ -465,12 +463,7 @@ class GaussianMixtureOp(HasStrictTraits):
             event_posteriors = {i : pd.Series([0.0] * len(experiment), dtype = "double")
                                 for i in range(self.num_components)}
 
-        if self.by:
-            groupby = experiment.data.groupby(self.by)
-        else:
-            # use a lambda expression to return a group that
-            # contains all the events
-            groupby = experiment.data.groupby(lambda _: True)   
+        groupby = experiment.group_index(self.by)
 
         # make the statistics       
         components = [x + 1 for x in range(self.num_components)]
@@ -499,16 +492,17 @@ class GaussianMixtureOp(HasStrictTraits):
                               index = corr_idx, 
                               dtype = np.dtype(object)).sort_index()  
                  
-        for group, data_subset in groupby:
+        scaled = pd.DataFrame({c : experiment.scaled(c, self._scale[c]) for c in self.channels},
+                              columns = self.channels)
+        
+        for group, group_rows in groupby.indices.items():
             if group not in self._gmms:
                 # there weren't any events in this group, so we didn't get
                 # a gmm.
                 continue
              
             gmm = self._gmms[group]
-            x = data_subset.loc[:, self.channels[:]]
-            for c in self.channels:
-                x[c] = self._scale[c](x[c])
+            x = scaled.take(group_rows)
                 
             # which values are missing?
 
@@ -77,6 +77,13 @@ class IOperation(Interface):
         """
         Apply an operation to an experiment.
         
+        Operations that only need a single pass over the events (such as
+        the threshold, range, quad and polygon gates, and `RatioOp`) 
+        stream over them with `Experiment.iter_chunks`, so their memory
+        use is bounded by the chunk size and the columns they add -- 
+        even if the `Experiment` is larger than RAM (see 
+        `Experiment.memory_map`.)
+        
         Parameters
         ----------
         experiment : `Experiment`
@@ -38,12 +38,14 @@ There are a few utility functions as well:
   - `autodetect_name_metadata` -- see if ``$PnN`` or ``$PnS`` has the channel names
 '''
 
-import warnings, math
+import warnings, math, os, copy, zlib, weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, resource_tracker
 from traits.api import (HasTraits, HasStrictTraits, provides, Str, List, Any,
-                        Dict, File, Constant, Enum, Int)
+                        Dict, File, Constant, Enum, Int, Bool)
 
-from fcsparser import fcsparser
 import numpy as np
+import pandas as pd
 from pathlib import Path
 
 import cytoflow.utility as util
@@ -136,7 +138,28 @@ class ImportOp(HasStrictTraits):
         If not None, import only a random subset of events of size `events`. 
         Presumably the analysis will go faster but less precisely; good for
         interactive data exploration.  Then, unset `events` and re-run
-        the analysis non-interactively.
+        the analysis non-interactively.  The events are chosen before the
+        file is read, and only those events are read, so this is fast
+        even for very large files.  Each tube's events stay in the order
+        they were recorded.
+        
+    random_state : Int (default = None)
+        If `events` is set, seed the random number generator that chooses
+        the events with this, so importing the same files again chooses the
+        same events.  Each tube's events depend only on the seed and the
+        tube's file, not on the other tubes.  If ``None``, use `numpy`'s 
+        global random number generator (see `numpy.random.seed`.)
+        
+    incremental : Bool (default = False)
+        If ``True``, only parse the tubes that are new (or whose files have 
+        changed) the next time `apply` is called -- for example, after adding
+        a few tubes to `tubes`.  The other tubes' events are copied from the 
+        `Experiment` that the last call to `apply` returned, so no extra 
+        copy of the events is kept -- but if that `Experiment` has been 
+        freed, or its events changed, every tube is parsed again.  The new 
+        `Experiment` is the same as if every tube had been parsed again.  
+        If `events` is set, the tubes are only re-used if `random_state` is
+        set, too.
         
     name_metadata : {None, "$PnN", "$PnS"} (default = None)
         Which FCS metadata is the channel name?  If ``None``, attempt to  
@@ -151,6 +174,35 @@ class ImportOp(HasStrictTraits):
         would like to use.  This will be used for *all FCS files imported by
         this operation.*
             
+    channel_dtype : {"float64", "float32"} (default = "float64")
+        The ``dtype`` to store the channels in.  Most FCS files only record
+        32 bits of precision (or less), so ``float32`` halves the memory that
+        large experiments use without losing any information.  See 
+        `Experiment.channel_dtype`.
+        
+    workers : Int (default = None)
+        How many processes to parse FCS files in.  If ``None``, use one
+        per CPU core (unless the files are small enough that starting the 
+        processes would take longer than parsing them); if ``1``, parse the 
+        files one at a time, in this process.  Either way, the resulting 
+        `Experiment` is exactly the same.
+        
+    cache_dir : Str (default = None)
+        If set, cache the decoded events in this directory (see 
+        `util.TubeCache`), so importing the same files again -- for example,
+        after renaming a channel or adding a condition -- doesn't have to
+        read and decode them again.
+        
+    cache_size : Int (default = 4 GB)
+        The maximum size of the cache in `cache_dir`, in bytes.  When the
+        cache grows larger than this, the files that were used longest ago
+        are removed from it.
+        
+    scratch_dir : Str (default = None)
+        If set, store the imported events in memory-mapped files in this
+        directory instead of in RAM, so you can analyze experiments that 
+        are larger than memory.  See `Experiment.memory_map`.
+            
     ignore_v : List(Str)
         `cytoflow` is designed to operate on an `Experiment` containing
         tubes that were all collected under the same instrument settings.
@@ -197,6 +249,31 @@ class ImportOp(HasStrictTraits):
 
     # are we subsetting?
     events = Int(None)
+    
+    # seed the sub-sampling (None --> numpy's global random state)
+    random_state = Int(None)
+    
+    # how do we store the channels?
+    channel_dtype = Enum("float64", "float32")
+    
+    # how many processes parse the FCS files?  (None --> one per core)
+    workers = Int(None)
+    
+    # keep the tubes' events for the next call to apply()?
+    incremental = Bool(False)
+    
+    # the tubes in the last result: block key --> (tube metadata, first row,
+    # last row).  the events stay in the last result, which we only keep a
+    # weak reference to (and the channel names in it.)
+    _blocks = Dict(transient = True)
+    _result = Any(transient = True)
+    
+    # where do we cache the decoded events?  (None --> don't)
+    cache_dir = Str(None)
+    cache_size = Int(2 ** 32)
+    
+    # where do we keep the events?  (None --> in memory)
+    scratch_dir = Str(None)
         
     # DON'T DO THIS
     ignore_v = List(Str)
@@ -275,7 +352,7 @@ class ImportOp(HasStrictTraits):
                                                "tube {0} and tube {1}"
                                                .format(i.file, j.file))
         
-        experiment = Experiment()
+        experiment = Experiment(channel_dtype = self.channel_dtype)
         
         experiment.metadata["ignore_v"] = self.ignore_v
             
@@ -288,10 +365,9 @@ class ImportOp(HasStrictTraits):
             # we'll figure that out below
             with warnings.catch_warnings():
                 warnings.simplefilter("ignore")
-                tube0_meta = fcsparser.parse(self.tubes[0].file,
-                                             data_set = self.data_set,
-                                             meta_data_only = True,
-                                             reformat_meta = True)
+                tube0_meta = util.parse_fcs_metadata(self.tubes[0].file,
+                                                     data_set = self.data_set,
+                                                     reformat_meta = True)
         except Exception as e:
             raise util.CytoflowOpError('tubes',
                                        "FCS reader threw an error reading metadata "
@@ -339,71 +415,131 @@ class ImportOp(HasStrictTraits):
                 
                                 
         experiment.metadata['fcs_metadata'] = {}
-        for tube in self.tubes:
-            if metadata_only:
-                try:
-                    tube_meta, tube_data = parse_tube(tube.file,
-                                                      experiment,
-                                                      data_set = self.data_set,
-                                                      metadata_only = True)
-                except Exception as e:
-                    raise util.CytoflowOpError('tubes',
-                                               "FCS reader threw an error reading metadata "
-                                               "for tube {}: {}"
-                                               .format(self.tubes[0].file, str(e))) from e
-            else:
+        tubes_data = []
+        
+        if self.workers is not None:
+            workers = self.workers
+        elif _total_size(self.tubes) >= _PARALLEL_MIN_BYTES:
+            workers = os.cpu_count() or 1
+        else:
+            # starting the processes would take longer than parsing
+            workers = 1
+            
+        # which tubes' events can we re-use from the last call to apply()?
+        if self.incremental and not metadata_only and \
+            (self.events is None or self.random_state is not None):
+            keys = [_block_key(tube.file, self.data_set, channels, 
+                               experiment.metadata["name_metadata"],
+                               self.events, self.random_state, self.channel_dtype)
+                    for tube in self.tubes]
+        else:
+            keys = [None] * len(self.tubes)
+            
+        # the last result's events, if it's still around and unchanged
+        last_data = self._result[0]() if self._result is not None else None
+        reusable = self._blocks if last_data is not None else {}
+            
+        blocks = {}
+        to_parse = [tube for tube, key in zip(self.tubes, keys) 
+                    if key is None or key not in reusable]
+            
+        # choose the events to sub-sample before we parse anything, in tube
+        # order, so we draw the same random numbers whether or not the 
+        # tubes are parsed in parallel
+        if self.events is not None and not metadata_only:
+            rows = []
+            for tube in to_parse:
+                if self.random_state is None:
+                    random_state = np.random
+                else:
+                    random_state = np.random.RandomState([self.random_state, 
+                                                          zlib.crc32(tube.file.encode())])
+                rows.append(_sample_rows(tube.file, self.data_set, self.events, random_state))
+        else:
+            rows = [None] * len(to_parse)
+            
+        cache = util.TubeCache(self.cache_dir, self.cache_size) \
+                if self.cache_dir else None
+            
+        # each tube's events are masked, decoded and converted to 
+        # channel_dtype as the tube is read, instead of in whole-experiment
+        # passes after they're concatenated
+        options = dict(channels = channels,
+                       cache = cache,
+                       decode = True,
+                       dtype = self.channel_dtype)
+            
+        if metadata_only or workers <= 1 or len(to_parse) < 2:
+            parsed = _parse_tubes(to_parse, experiment, self.data_set, 
+                                  metadata_only, rows, options)
+        else:
+            parsed = _parse_tubes_parallel(to_parse, experiment, self.data_set, 
+                                           rows, options, workers)
+        
+        row = 0
+        try:
+            for tube, key in zip(self.tubes, keys):
                 try:
-                    tube_meta, tube_data = parse_tube(tube.file, 
-                                                      experiment, 
-                                                      data_set = self.data_set)
+                    if key is not None and key in reusable:
+                        check_tube(tube.file, experiment, data_set = self.data_set)
+                        tube_meta, start, stop = reusable[key]
+                        tube_meta = copy.deepcopy(tube_meta)
+                        names = self._result[1]
+                        tube_data = pd.DataFrame({c : last_data[names[c]].values[start:stop] 
+                                                  for c in channels},
+                                                 columns = channels,
+                                                 copy = False)
+                    else:
+                        tube_meta, tube_data = next(parsed)
                 except Exception as e:
                     raise util.CytoflowOpError('tubes',
-                                               "FCS reader threw an error reading data "
+                                               "FCS reader threw an error reading {} "
                                                "for tube {}: {}"
-                                               .format(self.tubes[0].file, str(e))) from e
-                
-    
-                if self.events is not None:
-                    if self.events <= len(tube_data):
-                        tube_data = tube_data.loc[np.random.choice(tube_data.index,
-                                                                   self.events,
-                                                                   replace = False)]
-                    else:
-                        warnings.warn("Only {0} events in tube {1}"
-                                      .format(len(tube_data), tube.file),
-                                      util.CytoflowWarning)
-    
-                experiment.add_events(tube_data[channels], tube.conditions)
+                                               .format("metadata" if metadata_only else "data",
+                                                       tube.file, str(e))) from e
+                    
+                if not metadata_only:
+                    if key is not None:
+                        blocks[key] = (copy.deepcopy(tube_meta), row, row + len(tube_data))
+                    row += len(tube_data)
+                    tubes_data.append((tube_data, tube.conditions))
                         
-            # extract the row and column from wells collected on a 
-            # BD HTS
-            if 'WELL ID' in tube_meta:               
-                pos = tube_meta['WELL ID']
-                tube_meta['CF_Row'] = pos[0]
-                tube_meta['CF_Col'] = int(pos[1:3])
+                # extract the row and column from wells collected on a 
+                # BD HTS
+                if 'WELL ID' in tube_meta:               
+                    pos = tube_meta['WELL ID']
+                    tube_meta['CF_Row'] = pos[0]
+                    tube_meta['CF_Col'] = int(pos[1:3])
                 
-            for i, channel in enumerate(channels):
-                # remove the PnV tube metadata
+                for i, channel in enumerate(channels):
+                    # remove the PnV tube metadata
 
-                if '$P{}V'.format(i+1) in tube_meta:
-                    del tube_meta['$P{}V'.format(i+1)]
+                    if '$P{}V'.format(i+1) in tube_meta:
+                        del tube_meta['$P{}V'.format(i+1)]
                     
-                # work around a bug where the PnR is sometimes not the detector range
-                # but the data range.
-                pnr = '$P{}R'.format(i+1)
-                if pnr in tube_meta and float(tube_meta[pnr]) > experiment.metadata[channel]['range']:
-                    experiment.metadata[channel]['range'] = float(tube_meta[pnr])
+                    # work around a bug where the PnR is sometimes not the detector range
+                    # but the data range.
+                    pnr = '$P{}R'.format(i+1)
+                    if pnr in tube_meta and float(tube_meta[pnr]) > experiment.metadata[channel]['range']:
+                        experiment.metadata[channel]['range'] = float(tube_meta[pnr])
             
                 
-            tube_meta['CF_File'] = Path(tube.file).stem
+                tube_meta['CF_File'] = Path(tube.file).stem
                              
-            experiment.metadata['fcs_metadata'][tube.file] = tube_meta
+                experiment.metadata['fcs_metadata'][tube.file] = tube_meta
             
-        # take care of strange encodings
+        finally:
+            parsed.close()
+            
+        # one concatenation for all the tubes, instead of one per tube
+        experiment.add_events_many(tubes_data)
+        del tubes_data, last_data
+            
+        # the events were decoded as each tube was read (see `parse_tube`);
+        # warn about strange encodings here, once per experiment.
         for channel in channels:
-            # this catches an odd corner case where some instruments store
-            # instrument-specific info in the "extra" bits.  we have to
-            # clear them out.
+            # some instruments store instrument-specific info in the "extra" 
+            # bits, which the reader masks out.
             if tube0_meta['$DATATYPE'] == 'I':
                 data_bits  = int(meta_channels.loc[channel]['$PnB'])
                 data_range = float(meta_channels.loc[channel]['$PnR'])
@@ -413,15 +549,8 @@ class ImportOp(HasStrictTraits):
                     warnings.warn('The data range $PnR doesn\'t match the data bits $PnB for channel {}, masking out {} bits'
                                   .format(channel, data_bits - range_bits),
                                   util.CytoflowWarning)
-                    mask = 1
-                    for _ in range(1, range_bits):
-                        mask = mask << 1 | 1
-
-                    experiment.data[channel] = experiment.data[channel].values.astype('int') & mask
                 
-            # re-scale the data to linear if if's recorded as log-scaled with
-            # integer channels
-            data_range = float(meta_channels.loc[channel]['$PnR'])
+            # data recorded as log-scaled integers is re-scaled to linear
             f1 = float(meta_channels.loc[channel]['$PnE'][0])
             f2 = float(meta_channels.loc[channel]['$PnE'][1])
             
@@ -435,8 +564,6 @@ class ImportOp(HasStrictTraits):
                 warnings.warn('Converting channel {} from logarithmic to linear'
                               .format(channel),
                               util.CytoflowWarning)
-                experiment.data[channel] = 10 ** (f1 * experiment.data[channel] / data_range) * f2
-
 
         # rename channels if necessary                     
         for channel in channels:
@@ -444,10 +571,23 @@ class ImportOp(HasStrictTraits):
                 new_name = self.channels[channel]
                 if channel == new_name:
                     continue
-                experiment.data.rename(columns = {channel : new_name}, inplace = True)
+                experiment.data = experiment.data.rename(columns = {channel : new_name},
+                                                         copy = False)
                 experiment.metadata[new_name] = experiment.metadata[channel]
                 experiment.metadata[new_name]["fcs_name"] = channel
                 del experiment.metadata[channel]
+                
+        if self.scratch_dir and not metadata_only:
+            experiment.memory_map(self.scratch_dir)
+            
+        # only remember the tubes we have now.  replacing a column replaces
+        # the experiment's DataFrame, so the weak reference also tells us
+        # if the events have changed.
+        if not metadata_only:
+            self._blocks = blocks
+            self._result = (weakref.ref(experiment.data),
+                            {experiment.metadata[c]["fcs_name"] : c 
+                             for c in experiment.channels}) if blocks else None
 
         return experiment
 
@@ -484,11 +624,10 @@ def check_tube(filename, experiment, data_set = 0):
     ignore_v = experiment.metadata['ignore_v']
     
     try:
-        tube_meta = fcsparser.parse( filename, 
-                                     channel_naming = experiment.metadata["name_metadata"],
-                                     data_set = data_set,
-                                     meta_data_only = True,
-                                     reformat_meta = True)
+        tube_meta = util.parse_fcs_metadata(filename, 
+                                            channel_naming = experiment.metadata["name_metadata"],
+                                            data_set = data_set,
+                                            reformat_meta = True)
     except Exception as e:
         raise util.CytoflowError("FCS reader threw an error reading metadata "
                                  "for tube {0}"
@@ -543,10 +682,9 @@ def autodetect_name_metadata(filename, data_set = 0):
     try:
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
-            metadata = fcsparser.parse(filename,
-                                       data_set = data_set,
-                                       meta_data_only = True,
-                                       reformat_meta = True)
+            metadata = util.parse_fcs_metadata(filename,
+                                               data_set = data_set,
+                                               reformat_meta = True)
     except Exception as e:
         warnings.warn("Trouble getting metadata from {}: {}".format(filename, str(e)),
                       util.CytoflowWarning)
@@ -583,10 +721,163 @@ def autodetect_name_metadata(filename, data_set = 0):
     return name_metadata
     
 
+# if workers isn't set, only parse in parallel if there's at least this much data
+_PARALLEL_MIN_BYTES = 32 * 2 ** 20
+
+def _total_size(tubes):
+    """The total size of the tubes' files, or 0 if one can't be read"""
+    try:
+        return sum(os.path.getsize(tube.file) for tube in tubes)
+    except OSError:
+        return 0
+    
+
+def _block_key(filename, data_set, channels, name_metadata, events, random_state,
+               dtype):
+    """
+    The key for a tube's events in `ImportOp._blocks`, or ``None`` if the
+    file can't be read.
+    """
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    
+    return (os.path.realpath(filename), stat.st_size, stat.st_mtime_ns, data_set,
+            tuple(channels), name_metadata, events, random_state, dtype)
+    
+
+def _sample_rows(filename, data_set, events, random_state):
+    """
+    Choose ``events`` events from a tube at random, returning their (sorted)
+    positions -- or ``None`` to read them all, if there aren't that many.
+    """
+    try:
+        _, _, text = util.read_fcs_text(filename, data_set = data_set)
+        num_events = int(text["$TOT"])
+    except Exception:
+        # let the parser report the problem
+        return None
+    
+    if events > num_events:
+        warnings.warn("Only {0} events in tube {1}"
+                      .format(num_events, filename),
+                      util.CytoflowWarning)
+        return None
+    
+    return np.sort(random_state.choice(num_events, events, replace = False))
+    
+
+def _parse_tubes(tubes, experiment, data_set, metadata_only, rows, options):
+    """
+    Parse ``tubes`` one at a time, yielding (metadata, data) in order.
+    ``options`` are more keyword arguments for `parse_tube`.
+    """
+    for tube, tube_rows in zip(tubes, rows):
+        yield parse_tube(tube.file, 
+                         experiment, 
+                         data_set = data_set, 
+                         metadata_only = metadata_only,
+                         rows = tube_rows,
+                         **options)
+        
+        
+def _parse_tubes_parallel(tubes, experiment, data_set, rows, options, workers):
+    """
+    Parse ``tubes`` in a pool of ``workers`` processes, yielding 
+    (metadata, data) in the same order as `_parse_tubes`.  The events
+    come back through shared memory instead of being pickled.
+    """
+    
+    with ProcessPoolExecutor(max_workers = min(workers, len(tubes))) as executor:
+        futures = [executor.submit(_parse_tube_shared, tube.file, experiment, 
+                                   data_set, tube_rows, options)
+                   for tube, tube_rows in zip(tubes, rows)]
+        
+        pending = list(futures)
+        try:
+            while pending:
+                yield _from_shared(*pending.pop(0).result())
+        finally:
+            # if we stopped early, clean up the tubes we haven't read
+            for future in pending:
+                if not future.cancel() and future.exception() is None:
+                    _unlink_shared(future.result()[1])
+                        
+
+def _parse_tube_shared(filename, experiment, data_set, rows, options):
+    """
+    Parse a tube in a worker process, and copy its events into a block of 
+    shared memory.  Returns the tube metadata, the name of the shared memory
+    block, and what `_from_shared` needs to rebuild the events.
+    """
+    
+    tube_meta, tube_data = parse_tube(filename, 
+                                      experiment, 
+                                      data_set = data_set,
+                                      rows = rows,
+                                      **options)
+    
+    columns = []
+    offset = 0
+    for name in tube_data.columns:
+        values = tube_data[name].values
+        columns.append((name, values.dtype.str, offset))
+        offset += values.nbytes
+        
+    shm = shared_memory.SharedMemory(create = True, size = max(offset, 1))
+    
+    try:
+        for (name, _, start) in columns:
+            values = tube_data[name].values
+            buf = np.ndarray(values.shape, dtype = values.dtype, 
+                             buffer = shm.buf, offset = start)
+            buf[:] = values
+            del buf
+            
+        # the parent process unlinks the block, not us
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return tube_meta, shm.name, columns, len(tube_data), tube_data.index
+    finally:
+        shm.close()
+        
+        
+def _from_shared(tube_meta, shm_name, columns, length, index):
+    """Rebuild a tube's events from the shared memory block ``shm_name``"""
+    
+    shm = shared_memory.SharedMemory(name = shm_name)
+    
+    try:
+        data = {name : np.ndarray(length, dtype = dtype, 
+                                  buffer = shm.buf, offset = start).copy()
+                for (name, dtype, start) in columns}
+    finally:
+        shm.close()
+        shm.unlink()
+        
+    tube_data = pd.DataFrame(data, 
+                             index = index, 
+                             columns = [c[0] for c in columns], 
+                             copy = False)
+        
+    return tube_meta, tube_data
+
+
+def _unlink_shared(shm_name):
+    shm = shared_memory.SharedMemory(name = shm_name)
+    shm.close()
+    shm.unlink()
+    
+
 # module-level, so we can reuse it in other modules
-def parse_tube(filename, experiment = None, data_set = 0, metadata_only = False):   
+def parse_tube(filename, experiment = None, data_set = 0, metadata_only = False,
+               channels = None, rows = None, cache = None, decode = False,
+               dtype = "float64"):   
     """
-    Parses an FCS file.  A thin wrapper over ``fcsparser.parse``.
+    Parses an FCS file.  The metadata is read with ``fcsparser.parse``,
+    through `util.fcs_metadata_cache`, so parsing the same file's metadata 
+    again is (nearly) free.  The events are read with `util.read_fcs_data`,
+    which only decodes the channels in ``channels``.
     
     Parameters
     ----------
@@ -604,6 +895,25 @@ def parse_tube(filename, experiment = None, data_set = 0, metadata_only = False)
         If ``True``, only parse the metadata.  Because this is at the beginning
         of the FCS file, this happens much faster than parsing the entire file.
         
+    channels : list of strings (optional, default: None)
+        Which channels to read.  If ``None``, read them all.
+        
+    rows : array of int (optional, default: None)
+        The positions of the events to read.  If ``None``, read them all.
+        See `util.read_fcs_data`.
+        
+    cache : `util.TubeCache` (optional, default: None)
+        If set, read the events through this cache.
+        
+    decode : bool (optional, default: False)
+        If ``True``, convert integer channels that were recorded on a log 
+        scale (ie, their $PnE is set) to linear values.  See 
+        `util.read_fcs_data`.
+        
+    dtype : string (optional, default: "float64")
+        The data type of the events that are returned.  `ImportOp` passes 
+        its `ImportOp.channel_dtype`.
+        
     Returns
     -------
     tube_metadata : dict
@@ -615,8 +925,8 @@ def parse_tube(filename, experiment = None, data_set = 0, metadata_only = False)
         
     """
     
-    if experiment:
-        check_tube(filename, experiment)
+    if experiment is not None:
+        check_tube(filename, experiment, data_set = data_set)
         name_metadata = experiment.metadata["name_metadata"]
     else:
         name_metadata = '$PnS'
@@ -627,19 +937,26 @@ def parse_tube(filename, experiment = None, data_set = 0, metadata_only = False)
             tube_data = None
             with warnings.catch_warnings():
                 warnings.simplefilter("ignore")
-                tube_meta = fcsparser.parse(
+                tube_meta = util.parse_fcs_metadata(
                                 filename, 
-                                meta_data_only = True,
                                 data_set = data_set,
                                 channel_naming = name_metadata)
         else:
             with warnings.catch_warnings():
                 warnings.simplefilter("ignore")
-                tube_meta, tube_data = fcsparser.parse(
-                                        filename, 
-                                        meta_data_only = metadata_only,
-                                        data_set = data_set,
-                                        channel_naming = name_metadata)
+                tube_meta = util.parse_fcs_metadata(
+                                filename,
+                                data_set = data_set,
+                                channel_naming = name_metadata)
+                read_data = cache.read if cache is not None else util.read_fcs_data
+                tube_data = read_data(
+                                filename,
+                                data_set = data_set,
+                                channels = channels,
+                                rows = rows,
+                                channel_naming = name_metadata,
+                                decode_log = decode,
+                                dtype = dtype)
     except Exception as e:
         raise util.CytoflowError("FCS reader threw an error reading data for tube {}"
                                  .format(filename)) from e
@@ -224,12 +224,7 @@ class KMeansOp(HasStrictTraits):
                                            "Subset string '{0}' returned no events"
                                            .format(subset))
                 
-        if self.by:
-            groupby = experiment.data.groupby(self.by)
-        else:
-            # use a lambda expression to return a group that contains
-            # all the events
-            groupby = experiment.data.groupby(lambda _: True)
+        groupby = experiment.group_index(self.by)
             
         # get the scale. estimate the scale params for the ENTIRE data set,
         # not subsets we get from groupby().  And we need to save it so that
@@ -243,14 +238,17 @@ class KMeansOp(HasStrictTraits):
                     
                     
         kmeans = {}
-        for group, data_subset in groupby:
-            if len(data_subset) == 0:
+        # the experiment memoizes the scaled channels, so apply() re-uses them
+        scaled = pd.DataFrame({c : experiment.scaled(c, self._scale[c]) for c in self.channels},
+                              columns = self.channels)
+        
+        for group, group_rows in groupby.indices.items():
+            if len(group_rows) == 0:
                 raise util.CytoflowOpError('by',
                                            "Group {} had no data"
                                            .format(group))
-            x = data_subset.loc[:, self.channels[:]]
-            for c in self.channels:
-                x[c] = self._scale[c](x[c])
+            # fit in double precision, even if the channels are stored as float32
+            x = scaled.take(group_rows)
             
             # drop data that isn't in the scale range
             for c in self.channels:
@@ -333,12 +331,7 @@ class KMeansOp(HasStrictTraits):
                                            .format(b, experiment.conditions))
         
                  
-        if self.by:
-            groupby = experiment.data.groupby(self.by)
-        else:
-            # use a lambda expression to return a group that contains
-            # all the events
-            groupby = experiment.data.groupby(lambda _: True)
+        groupby = experiment.group_index(self.by)
                  
         event_assignments = pd.Series(["{}_None".format(self.name)] * len(experiment), dtype = "object")
          
@@ -349,8 +342,11 @@ class KMeansOp(HasStrictTraits):
                                          names = list(self.by) + ["Cluster"] + ["Channel"])
         centers_stat = pd.Series(index = idx, dtype = np.dtype(object)).sort_index()
                      
-        for group, data_subset in groupby:
-            if len(data_subset) == 0:
+        scaled = pd.DataFrame({c : experiment.scaled(c, self._scale[c]) for c in self.channels},
+                              columns = self.channels)
+        
+        for group, group_rows in groupby.indices.items():
+            if len(group_rows) == 0:
                 raise util.CytoflowOpError('by',
                                            "Group {} had no data"
                                            .format(group))
@@ -361,9 +357,7 @@ class KMeansOp(HasStrictTraits):
                                            "Do you need to re-run estimate()?"
                                            .format(group))    
             
-            x = data_subset.loc[:, self.channels[:]]
-            for c in self.channels:
-                x[c] = self._scale[c](x[c])
+            x = scaled.take(group_rows)
                  
             # which values are missing?
  
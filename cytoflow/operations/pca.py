@@ -236,12 +236,7 @@ class PCAOp(HasStrictTraits):
                                            "Subset string '{0}' returned no events"
                                            .format(subset))
                 
-        if self.by:
-            groupby = experiment.data.groupby(self.by)
-        else:
-            # use a lambda expression to return a group that contains
-            # all the events
-            groupby = experiment.data.groupby(lambda _: True)
+        groupby = experiment.group_index(self.by)
             
         # get the scale. estimate the scale params for the ENTIRE data set,
         # not subsets we get from groupby().  And we need to save it so that
@@ -253,14 +248,17 @@ class PCAOp(HasStrictTraits):
                 self._scale[c] = util.scale_factory(util.get_default_scale(), experiment, channel = c)
                     
         pca = {}
-        for group, data_subset in groupby:
-            if len(data_subset) == 0:
+        # the experiment memoizes the scaled channels, so apply() re-uses them
+        scaled = pd.DataFrame({c : experiment.scaled(c, self._scale[c]) for c in self.channels},
+                              columns = self.channels)
+        
+        for group, group_rows in groupby.indices.items():
+            if len(group_rows) == 0:
                 raise util.CytoflowOpError('by',
                                            "Group {} had no data"
                                            .format(group))
-            x = data_subset.loc[:, self.channels[:]]
-            for c in self.channels:
-                x[c] = self._scale[c](x[c])
+            # fit in double precision, even if the channels are stored as float32
+            x = scaled.take(group_rows)
             
             # drop data that isn't in the scale range
             for c in self.channels:
@@ -331,15 +329,10 @@ class PCAOp(HasStrictTraits):
                                            "must be one of {}"
                                            .format(b, experiment.conditions))
                                  
-        if self.by:
-            groupby = experiment.data.groupby(self.by)
-        else:
-            # use a lambda expression to return a group that contains
-            # all the events
-            groupby = experiment.data.groupby(lambda _: True)
+        groupby = experiment.group_index(self.by)
             
-        # need deep = True because of the data.dropna below
-        new_experiment = experiment.clone(deep = True)       
+        # the new channels aren't shared, so we can fill them in place
+        new_experiment = experiment.clone(deep = False)
         new_channels = []   
         for i in range(self.num_components):
             cname = "{}_{}".format(self.name, i + 1)
@@ -351,14 +344,15 @@ class PCAOp(HasStrictTraits):
             new_experiment.add_channel(cname, pd.Series(index = experiment.data.index))
             new_channels.append(cname)            
                    
-        for group, data_subset in groupby:
-            if len(data_subset) == 0:
+        scaled = pd.DataFrame({c : experiment.scaled(c, self._scale[c]) for c in self.channels},
+                              columns = self.channels)
+        
+        for group, group_rows in groupby.indices.items():
+            if len(group_rows) == 0:
                 raise util.CytoflowOpError('by',
                                            "Group {} had no data"
                                            .format(group))
-            x = data_subset.loc[:, self.channels[:]]
-            for c in self.channels:
-                x[c] = self._scale[c](x[c])
+            x = scaled.take(group_rows)
                  
             # which values are missing?
    
@@ -377,8 +371,7 @@ class PCAOp(HasStrictTraits):
             for ci, c in enumerate(new_channels):
                 new_experiment.data.loc[group_idx, c] = x_tf[:, ci]
 
-        new_experiment.data.dropna(inplace = True)
-        new_experiment.data.reset_index(drop = True, inplace = True)
+        new_experiment.data = new_experiment.data.dropna().reset_index(drop = True)
 
         new_experiment.history.append(self.clone_traits(transient = lambda _: True))
         return new_experiment
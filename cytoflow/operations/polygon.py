@@ -258,17 +258,31 @@ class PolygonOp(HasStrictTraits):
         
         vertices = [(xscale(x), yscale(y)) for (x, y) in self.vertices]
         vertices.append(vertices[0])
-        data = experiment.data[[self.xchannel, self.ychannel]].copy()
-        data[self.xchannel] = xscale(data[self.xchannel])
-        data[self.ychannel] = yscale(data[self.ychannel])
+        vertices = np.array(vertices)
         
         # use an extremely fast parallel algorithm to test polygon membership.
         # this function is better defined for edge cases than matplotlib's
         # path.contains_points.  and it's faster.
         # see https://stackoverflow.com/questions/36399381/whats-the-fastest-way-of-checking-if-a-point-is-inside-a-polygon-in-python
         # for a deep dive
-        xy_data = data[[self.xchannel, self.ychannel]].values
-        in_polygon = util.polygon_contains(xy_data, np.array(vertices))
+        channels = [self.xchannel, self.ychannel]
+        if experiment.can_memoize_scaled(channels):
+            # the experiment memoizes the scaled channels, so re-applying 
+            # the gate (say, after moving a vertex) doesn't scale them again
+            x_data = experiment.scaled(self.xchannel, xscale).values
+            y_data = experiment.scaled(self.ychannel, yscale).values
+            slices = [slice(start, start + 2 ** 20) 
+                      for start in range(0, len(experiment), 2 ** 20)]
+            chunks = ((rows, x_data[rows], y_data[rows]) for rows in slices)
+        else:
+            # the events may not fit in memory; scale them a chunk at a time
+            chunks = ((rows, xscale(chunk[self.xchannel]), yscale(chunk[self.ychannel]))
+                      for rows, chunk in experiment.iter_chunks(channels))
+        
+        in_polygon = np.empty(len(experiment), dtype = bool)
+        for rows, x_data, y_data in chunks:
+            xy_data = np.column_stack((x_data, y_data))
+            in_polygon[rows] = util.polygon_contains(xy_data, vertices)
         
         new_experiment = experiment.clone(deep = False)        
         new_experiment.add_condition(self.name, "bool", in_polygon)
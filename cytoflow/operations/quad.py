@@ -227,31 +227,26 @@ class QuadOp(HasStrictTraits):
         if self.ythreshold is None:
             raise util.CytoflowOpError('ythreshold', 'ythreshold must be set!')
 
-        gate = pd.Series([None] * len(experiment))
-        
-        # perhaps there's some more pythonic way to do this?
-        
         # these gate names match FACSDiva.  They are ARBITRARY.
-
-        # lower-left
-        ll = np.logical_and(experiment[self.xchannel] < self.xthreshold,
-                            experiment[self.ychannel] < self.ythreshold)
-        gate.loc[ll] = self.name + '_3'
-        
-        # upper-left
-        ul = np.logical_and(experiment[self.xchannel] < self.xthreshold,
-                            experiment[self.ychannel] > self.ythreshold)
-        gate.loc[ul] = self.name + '_1'
-
-        # upper-right
-        ur = np.logical_and(experiment[self.xchannel] > self.xthreshold,
-                            experiment[self.ychannel] > self.ythreshold)
-        gate.loc[ur] = self.name + '_2'
-        
-        # lower-right
-        lr = np.logical_and(experiment[self.xchannel] > self.xthreshold,
-                            experiment[self.ychannel] < self.ythreshold)
-        gate.loc[lr] = self.name + '_4'
+        # codes index into the categories; events that are exactly on 
+        # a threshold are -1 (missing).
+        categories = [self.name + '_1',  # upper-left
+                      self.name + '_2',  # upper-right
+                      self.name + '_3',  # lower-left
+                      self.name + '_4']  # lower-right
+        
+        codes = np.full(len(experiment), -1, dtype = np.int8)
+        for rows, chunk in experiment.iter_chunks([self.xchannel, self.ychannel]):
+            x = chunk[self.xchannel].values
+            y = chunk[self.ychannel].values
+            chunk_codes = codes[rows]
+            chunk_codes[(x < self.xthreshold) & (y > self.ythreshold)] = 0
+            chunk_codes[(x > self.xthreshold) & (y > self.ythreshold)] = 1
+            chunk_codes[(x < self.xthreshold) & (y < self.ythreshold)] = 2
+            chunk_codes[(x > self.xthreshold) & (y < self.ythreshold)] = 3
+            
+        gate = pd.Categorical.from_codes(codes, categories = categories)
+        gate = gate.remove_unused_categories()
 
         new_experiment = experiment.clone(deep = False)
         new_experiment.add_condition(self.name, "category", gate)
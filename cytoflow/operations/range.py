@@ -32,6 +32,7 @@ interactively set the thresholds.
 from traits.api import (HasStrictTraits, Float, Str, Instance, Bool, 
                         provides, observe, Any, Constant, Dict)
 
+import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.lines import Line2D    
 from matplotlib.widgets import SpanSelector
@@ -200,7 +201,9 @@ class RangeOp(HasStrictTraits):
                                        "range low must be < {0}"
                                        .format(experiment[self.channel].max()))
         
-        gate = experiment[self.channel].between(self.low, self.high)
+        gate = np.empty(len(experiment), dtype = bool)
+        for rows, chunk in experiment.iter_chunks(self.channel):
+            gate[rows] = chunk[self.channel].between(self.low, self.high)
         new_experiment = experiment.clone(deep = False)
         new_experiment.add_condition(self.name, "bool", gate)
         new_experiment.history.append(self.clone_traits(transient = lambda _: True))
@@ -119,10 +119,21 @@ class RatioOp(HasStrictTraits):
                                        .format(self.name))
 
         new_experiment = experiment.clone(deep = False)
-        new_experiment.add_channel(self.name, 
-                                   experiment[self.numerator] / experiment[self.denominator])
-        new_experiment.data.replace([np.inf, -np.inf], np.nan, inplace = True)
-        new_experiment.data.dropna(inplace = True)
+        
+        ratio = np.empty(len(experiment), dtype = experiment.channel_dtype)
+        for rows, chunk in experiment.iter_chunks([self.numerator, self.denominator]):
+            with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                ratio[rows] = chunk[self.numerator] / chunk[self.denominator]
+                
+        new_experiment.add_channel(self.name, ratio)
+        
+        # drop events with infinite or missing values
+        keep = np.empty(len(new_experiment), dtype = bool)
+        for rows, chunk in new_experiment.iter_chunks():
+            keep[rows] = chunk.replace([np.inf, -np.inf], np.nan).notna().all(axis = 1)
+            
+        if not keep.all():
+            new_experiment.data = new_experiment.data[keep]
         new_experiment.history.append(self.clone_traits(transient = lambda t: True))
         new_experiment.metadata[self.name]['numerator'] = self.numerator
         new_experiment.metadata[self.name]['denominator'] = self.denominator
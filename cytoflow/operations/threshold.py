@@ -33,7 +33,7 @@ from traits.api import (HasStrictTraits, Float, Str, Instance,
                         Bool, observe, provides, Any, Dict,
                         Constant)
     
-import pandas as pd
+import numpy as np
 
 import matplotlib.pyplot as plt
 from matplotlib.lines import Line2D
@@ -178,7 +178,9 @@ class ThresholdOp(HasStrictTraits):
             raise util.CytoflowOpError('threshold',
                                        "must set 'threshold'")
 
-        gate = pd.Series(experiment[self.channel] > self.threshold)
+        gate = np.empty(len(experiment), dtype = bool)
+        for rows, chunk in experiment.iter_chunks(self.channel):
+            gate[rows] = chunk[self.channel] > self.threshold
 
         new_experiment = experiment.clone(deep = False)
         new_experiment.add_condition(self.name, "bool", gate)
@@ -21,24 +21,28 @@
 cytoflow.scripts.channel_voltages
 ---------------------------------
 
-Returns the channel voltages ($PnV) for the given FCS file.
+Returns the channel voltages ($PnV) for the given FCS file.  Only reads the
+file's TEXT segment, not its events.  (To check the voltages of many files
+at once, use `cytoflow.scripts.scan_fcs`.)
 """
 
 import argparse
 
-import cytoflow as flow
+import cytoflow.utility as util
+from cytoflow.operations.import_op import autodetect_name_metadata
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("fcs_file", help = "FCS file to analyze")
     args = parser.parse_args()
 
-    op = flow.ImportOp(tubes = [flow.Tube(file = args.fcs_file, conditions = {})])
-    ex = op.apply()
-    for c in ex.channels:
-        m = ex.metadata[c]
-        if "voltage" in m:
-            print("{0}\t{1}".format(c, m["voltage"]))
+    _, _, text = util.read_fcs_text(args.fcs_file)
+    names = util.fcs_channel_names(text, autodetect_name_metadata(args.fcs_file))
+    voltages = {c : text.get("$P{}V".format(i + 1), "").strip() 
+                for i, c in enumerate(names)}
+    for c in sorted(voltages):
+        if voltages[c]:
+            print("{0}\t{1}".format(c, voltages[c]))
     
 if __name__ == '__main__':
     main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+cytoflow.scripts.scan_fcs
+-------------------------
+
+Scan every FCS file under a directory and print a table of their metadata
+-- one row per channel, with the channel's names, voltage and range and
+the file's event count, well, date, etc.  Only the HEADER and TEXT
+segments are read, so scanning is fast even if the files are very large;
+use it to check a run's voltages before importing it.
+"""
+
+import argparse, csv, json, os, sys
+from concurrent.futures import ProcessPoolExecutor
+
+import cytoflow.utility as util
+
+# the FCS files' keywords to report
+_FILE_KEYWORDS = ['$TOT', 'WELL ID', '$DATE', '$BTIM', '$ETIM', '$CYT', '$SRC']
+
+# the channels' keywords to report
+_CHANNEL_KEYWORDS = ['$P{}N', '$P{}S', '$P{}V', '$P{}R']
+
+# which files are FCS files?
+_EXTENSIONS = ('.fcs', '.lmd')
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", help = "Directory to scan for FCS files")
+    parser.add_argument('-f', '--format', choices = ['csv', 'json'], default = 'csv', help = "Output format (default: csv)")
+    parser.add_argument('-o', '--output', help = "File to write the table to (default: standard output)")
+    parser.add_argument('-k', '--keyword', action = 'append', default = [], help = "Another FCS keyword to report (may be repeated)")
+    parser.add_argument('-j', '--jobs', type = int, default = None, help = "How many files to scan at once (default: one per CPU)")
+    args = parser.parse_args()
+
+    rows = scan_fcs(args.directory, keywords = args.keyword, jobs = args.jobs)
+
+    if args.output:
+        with open(args.output, 'w', newline = '') as f:
+            write_table(rows, f, args.format)
+    else:
+        write_table(rows, sys.stdout, args.format)
+
+
+def scan_fcs(directory, keywords = (), jobs = None):
+    """
+    Scan the FCS files under ``directory`` (and its subdirectories), and
+    return a list of dicts, one per channel per data set, in file order.
+    Files that can't be read are reported on standard error and skipped.
+    """
+
+    files = sorted(os.path.join(root, name)
+                   for root, _, names in os.walk(directory)
+                   for name in names
+                   if name.lower().endswith(_EXTENSIONS))
+
+    keywords = [k.upper() for k in keywords]
+
+    if jobs == 1 or len(files) < 2:
+        results = [_scan_file(f, keywords) for f in files]
+    else:
+        with ProcessPoolExecutor(max_workers = jobs) as executor:
+            results = list(executor.map(_scan_file,
+                                        files,
+                                        [keywords] * len(files),
+                                        chunksize = 16))
+
+    rows = []
+    for filename, file_rows, error in results:
+        if error:
+            print("Couldn't read {}: {}".format(filename, error), file = sys.stderr)
+        rows.extend(file_rows)
+
+    return rows
+
+
+def write_table(rows, f, fmt = 'csv'):
+    """Write ``rows`` (from `scan_fcs`) to the file ``f`` as CSV or JSON"""
+
+    if fmt == 'json':
+        json.dump(rows, f, indent = 1)
+        f.write('\n')
+        return
+
+    # every row has the same columns
+    fieldnames = list(rows[0].keys()) if rows else ['file']
+    writer = csv.DictWriter(f, fieldnames = fieldnames)
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def _scan_file(filename, keywords):
+    """Read the TEXT segment(s) of ``filename``, and make its rows"""
+
+    try:
+        data_sets = util.fcs_data_sets(filename)
+    except Exception as e:
+        return filename, [], str(e)
+
+    rows = []
+    for i, (_, _, text) in enumerate(data_sets):
+        try:
+            num_channels = int(text['$PAR'])
+        except (KeyError, ValueError):
+            return filename, rows, "No $PAR in data set {}".format(i)
+
+        for n in range(1, num_channels + 1):
+            row = {'file' : filename, 'data_set' : i, 'channel' : n}
+            for k in _CHANNEL_KEYWORDS:
+                row[k.replace('{}', 'n')] = text.get(k.format(n), '').strip()
+            for k in _FILE_KEYWORDS + keywords:
+                row[k] = text.get(k, '').strip()
+            rows.append(row)
+
+    return filename, rows, None
+
+
+if __name__ == '__main__':
+    main()
@@ -26,9 +26,9 @@ FCS file. This script splits them, optionally renaming the resulting
 files using the provided FCS metadata.
 """
 
-import argparse, warnings, pathlib, re
+import argparse, pathlib, re
+from concurrent.futures import ThreadPoolExecutor
 from copy import copy
-from fcsparser import fcsparser
 import cytoflow as flow
 import cytoflow.utility as util
 
@@ -38,47 +38,124 @@ def main():
     parser.add_argument('-n', '--name_metadata', help = "FCS metadata to use as the name")
     parser.add_argument('-p', '--path', help = "Path to export files to (default: '.'", default = '.')
     parser.add_argument('-d', '--dry', action = 'store_true', help = "Dry run: say what the program would do but don't do it")
+    parser.add_argument('-j', '--jobs', type = int, default = 1, help = "How many data sets to write at once (default: 1)")
+    parser.add_argument('-r', '--reencode', action = 'store_true', help = "Re-encode the events as 32-bit floats instead of copying each data set as-is")
     args = parser.parse_args()
     
-    # first, figure out how many data segments there are.
-    for i in range(0, 99):
-        with warnings.catch_warnings(record = True) as w:
-            meta = fcsparser.parse(args.fcs_file, data_set = i, meta_data_only = True)
-            if w and "does not contain the number of data sets" in  w[-1].message.__str__():
-                return
-
-        if args.name_metadata in meta:
-            filename = meta[args.name_metadata] + '.fcs'
+    split_fcs(args.fcs_file, 
+              path = args.path, 
+              name_metadata = args.name_metadata, 
+              dry = args.dry, 
+              jobs = args.jobs, 
+              reencode = args.reencode,
+              verbose = True)
+    
+    
+def split_fcs(fcs_file, path = '.', name_metadata = None, dry = False, 
+              jobs = 1, reencode = False, verbose = False):
+    """
+    Split the data sets in ``fcs_file`` into separate files in ``path``.
+    By default, each data set's HEADER, TEXT, DATA and ANALYSIS segments 
+    are copied as-is (only ``$NEXTDATA`` is cleared), so splitting is 
+    limited only by how fast the disk is.  Returns the new files' paths.
+    """
+    
+    # walk the $NEXTDATA chain once
+    data_sets = util.fcs_data_sets(fcs_file)
+    
+    paths = []
+    for i, (_, _, text) in enumerate(data_sets):
+        key = name_metadata.upper() if name_metadata else None
+        if key in text:
+            filename = text[key].strip() + '.fcs'
         else:
-            filename = pathlib.Path(args.fcs_file).stem + '_{}'.format(i) + '.fcs'
+            filename = pathlib.Path(fcs_file).stem + '_{}'.format(i) + '.fcs'
             
-        path = pathlib.Path(args.path) / pathlib.Path(filename)
+        paths.append(pathlib.Path(path) / pathlib.Path(filename))
         
-        print(path)
+        if verbose:
+            print(paths[-1])
         
-        if not args.dry:
-            op = flow.ImportOp(tubes = [flow.Tube(file = args.fcs_file, conditions = {})],
-                               data_set = i)
-            ex = op.apply()
+    if dry:
+        return paths
+    
+    write = _reencode_data_set if reencode else _copy_data_set
+    with ThreadPoolExecutor(max_workers = max(jobs, 1)) as executor:
+        futures = [executor.submit(write, fcs_file, i, data_sets[i], str(p))
+                   for i, p in enumerate(paths)]
+        for future in futures:
+            future.result()
             
-            _, metadata = list(ex.metadata['fcs_metadata'].items())[0]
-            metadata = copy(metadata)
+    return paths
 
-            exclude_keywords = ['$BEGINSTEXT', '$ENDSTEXT', '$BEGINANALYSIS', 
-                                '$ENDANALYSIS', '$BEGINDATA', '$ENDDATA',
-                                '$BYTEORD', '$DATATYPE', '$MODE', '$NEXTDATA', 
-                                '$TOT', '$PAR']
-            metadata = {str(k) : str(v) for k, v in metadata.items()
-                                        if re.search('^\$P\d+[BENRDSG]$', k) is None
-                                        and k not in exclude_keywords}
-        
-            util.write_fcs(str(path),
-                           ex.channels,
-                           {c: ex.metadata[c]['range'] for c in ex.channels},
-                           ex.data.values,
-                           compat_chn_names = False,
-                           compat_negative = False,
-                           **metadata)
+
+# copy this many bytes at a time
+_COPY_BYTES = 16 * 2 ** 20
+    
+def _copy_data_set(fcs_file, _, data_set, out_path):
+    """Copy one data set's segments from ``fcs_file`` into its own file"""
+    
+    offset, header, text = data_set
+    
+    # all the offsets are relative to the start of the data set, so if
+    # we copy everything from there to the end of its last segment, we 
+    # don't have to change any of them.
+    end = max(header["text end"], 
+              header["data end"], 
+              header["analysis end"],
+              int(text.get("$ENDSTEXT", "0").strip() or 0),
+              int(text.get("$ENDANALYSIS", "0").strip() or 0)) + 1
+              
+    with open(fcs_file, 'rb') as src, open(out_path, 'wb') as dst:
+        src.seek(offset)
+        remaining = end
+        while remaining > 0:
+            buf = src.read(min(remaining, _COPY_BYTES))
+            if not buf:
+                raise util.CytoflowError("{} ended before data set at offset {} did"
+                                         .format(fcs_file, offset))
+            dst.write(buf)
+            remaining -= len(buf)
+            
+    # this is the last (only) data set now.  overwrite $NEXTDATA's value 
+    # with zeros of the same width, so the TEXT segment doesn't move.
+    if int(text.get("$NEXTDATA", "0").strip() or 0) != 0:
+        with open(out_path, 'r+b') as f:
+            f.seek(header["text start"])
+            raw = f.read(header["text end"] - header["text start"] + 1)
+            delim = re.escape(raw[0:1])
+            match = re.search(delim + rb'\$NEXTDATA' + delim + rb'(\s*\d+\s*)' + delim, 
+                              raw, re.IGNORECASE)
+            if match:
+                f.seek(header["text start"] + match.start(1))
+                f.write(b'0' * (match.end(1) - match.start(1)))
+                
+                
+def _reencode_data_set(fcs_file, i, _, out_path):
+    """Import one data set, and write its events with `util.write_fcs`"""
+    
+    op = flow.ImportOp(tubes = [flow.Tube(file = fcs_file, conditions = {})],
+                       data_set = i)
+    ex = op.apply()
+    
+    _, metadata = list(ex.metadata['fcs_metadata'].items())[0]
+    metadata = copy(metadata)
+
+    exclude_keywords = ['$BEGINSTEXT', '$ENDSTEXT', '$BEGINANALYSIS', 
+                        '$ENDANALYSIS', '$BEGINDATA', '$ENDDATA',
+                        '$BYTEORD', '$DATATYPE', '$MODE', '$NEXTDATA', 
+                        '$TOT', '$PAR']
+    metadata = {str(k) : str(v) for k, v in metadata.items()
+                                if re.search(r'^\$P\d+[BENRDSG]$', k) is None
+                                and k not in exclude_keywords}
+
+    util.write_fcs(out_path,
+                   ex.channels,
+                   {c: ex.metadata[c]['range'] for c in ex.channels},
+                   ex.data.values,
+                   compat_chn_names = False,
+                   compat_negative = False,
+                   **metadata)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
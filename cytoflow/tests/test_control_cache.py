@@ -0,0 +1,124 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import unittest
+import os
+from unittest import mock
+
+import pandas as pd
+
+import cytoflow as flow
+from cytoflow.operations import control_cache
+
+class TestControlCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.path.dirname(os.path.abspath(__file__))
+        self.ex = flow.ImportOp(conditions = {'Dox' : 'int'},
+                                tubes = [flow.Tube(file = self.cwd + '/data/tasbe/rby.fcs',
+                                                   conditions = {'Dox' : 10})]).apply()
+        self.blank = self.cwd + '/data/tasbe/blank.fcs'
+        self.cache = control_cache.ControlCache()
+        
+    def testCache(self):
+        af_op = flow.AutofluorescenceOp(channels = ["Pacific Blue-A", "FITC-A"],
+                                        blank_file = self.blank)
+        af_op.estimate(self.ex)
+        ex2 = af_op.apply(self.ex)
+        
+        with mock.patch.object(control_cache.ImportOp, 'apply', 
+                               autospec = True,
+                               side_effect = control_cache.ImportOp.apply) as import_apply:
+            tube1 = self.cache.get(self.blank, {'Dox' : 1}, ex2)
+            self.assertEqual(import_apply.call_count, 1)
+            self.assertEqual(len(self.cache), 2)
+            
+            # the same control, the same history
+            tube2 = self.cache.get(self.blank, {'Dox' : 1}, ex2)
+            self.assertEqual(import_apply.call_count, 1)
+            pd.testing.assert_frame_equal(tube1.data, tube2.data)
+            
+            # a prefix of the history
+            self.cache.get(self.blank, {'Dox' : 1}, self.ex)
+            self.assertEqual(import_apply.call_count, 1)
+            
+            # the same operation, with the same estimates, matches
+            ex3 = af_op.apply(self.ex)
+            self.cache.get(self.blank, {'Dox' : 1}, ex3)
+            self.assertEqual(import_apply.call_count, 1)
+            
+            # different conditions are a different entry
+            self.cache.get(self.blank, {'Dox' : 2}, ex2)
+            self.assertEqual(import_apply.call_count, 2)
+            
+        # changing the clone we get doesn't change the cache
+        tube1['FITC-A'] = 0.0
+        tube3 = self.cache.get(self.blank, {'Dox' : 1}, ex2)
+        pd.testing.assert_frame_equal(tube3.data, tube2.data)
+        
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+        
+    def testReestimate(self):
+        af_op = flow.AutofluorescenceOp(channels = ["Pacific Blue-A", "FITC-A"],
+                                        blank_file = self.blank)
+        af_op.estimate(self.ex)
+        ex2 = af_op.apply(self.ex)
+        tube1 = self.cache.get(self.blank, {'Dox' : 1}, ex2)
+        
+        # re-estimate the operation upstream, on different data.  its 
+        # parameters (and pickled state) are the same, but its estimates 
+        # aren't -- so the cached control can't be re-used
+        af_op.estimate(self.ex, subset = "FITC_A > 10")
+        ex3 = af_op.apply(self.ex)
+        
+        with mock.patch.object(control_cache.ImportOp, 'apply', 
+                               autospec = True,
+                               side_effect = control_cache.ImportOp.apply) as import_apply:
+            tube2 = self.cache.get(self.blank, {'Dox' : 1}, ex3)
+            
+            # the imported tube is still cached; only the op is re-applied
+            import_apply.assert_not_called()
+            
+        expected = af_op.apply(flow.ImportOp(conditions = {'Dox' : 'int'},
+                                             tubes = [flow.Tube(file = self.blank, 
+                                                                conditions = {'Dox' : 1})]).apply())
+        pd.testing.assert_series_equal(tube2['FITC-A'], expected['FITC-A'])
+        self.assertFalse(tube1['FITC-A'].equals(tube2['FITC-A']))
+        
+    def testSameEstimates(self):
+        controls = {"FITC-A" : self.cwd + '/data/tasbe/eyfp.fcs',
+                    "PE-Tx-Red-YG-A" : self.cwd + '/data/tasbe/mkate.fcs',
+                    "Pacific Blue-A" : self.cwd + '/data/tasbe/ebfp.fcs'}
+        
+        control_cache.control_cache.clear()
+        
+        op1 = flow.BleedthroughLinearOp(controls = controls)
+        op1.estimate(self.ex)
+        
+        # estimating again uses the cached controls, and gets the same answer
+        op2 = flow.BleedthroughLinearOp(controls = controls)
+        with mock.patch.object(control_cache.ImportOp, 'apply') as import_apply:
+            op2.estimate(self.ex)
+            import_apply.assert_not_called()
+            
+        self.assertEqual(op1.spillover, op2.spillover)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -22,8 +22,11 @@ Created on Dec 1, 2015
 
 @author: brian
 '''
-import unittest
+import unittest, tempfile, os
+from unittest import mock
+import cytoflow as flow
 from cytoflow import utility as util
+import numpy as np
 import pandas as pd
 from .test_base import ImportedDataTest
 
@@ -53,6 +56,25 @@ class TestExperiment(ImportedDataTest):
         with self.assertRaises(util.CytoflowError):
             self.ex.add_condition('B1_A', 'bool', pd.Series([True] * len(self.ex)))
     
+    def testConditionsCache(self):
+        self.assertIs(self.ex._cache.get('conditions'), None)
+        self.assertEqual(len(self.ex.conditions), 3)
+        self.assertIn('conditions', self.ex._cache)
+        
+        self.ex.add_condition('in_gate', 'bool', pd.Series([True] * len(self.ex)))
+        self.assertEqual(len(self.ex.conditions), 4)
+        self.assertEqual(list(self.ex.conditions['in_gate']), [True])
+        
+        self.ex.data = self.ex.data[self.ex['Dox'] == 10.0]
+        self.assertEqual(list(self.ex.conditions['Dox']), [10.0])
+        
+    def testChannelsCache(self):
+        self.assertEqual(len(self.ex.channels), 16)
+        self.ex['FSC_over_2'] = self.ex.data["FSC-A"] / 2.0
+        self.ex.metadata['FSC_over_2'] = {'type' : 'channel'}
+        self.ex.add_channel("FSC_over_3", self.ex.data["FSC-A"] / 3.0)
+        self.assertEqual(len(self.ex.channels), 18)
+        
     def testSubset(self):
         ex2 = self.ex.subset(['Dox', 'Well'], (100.0, 'C'))
         self.assertEqual(len(ex2['Dox'].unique()), 1)
@@ -65,6 +87,64 @@ class TestExperiment(ImportedDataTest):
         self.assertEqual(len(ex2['Well'].unique()), 1)
         self.assertEqual(len(ex2), 100)
         
+    def testQueryCompiled(self):
+        exprs = ['Dox == 100.0 and Well == "C"',
+                 '(Dox == 10.0) and (Well == "A" or Well == "B")',
+                 'Dox in [0.0, 100.0] and not Well == "C"',
+                 'Well != "A"',
+                 'Well in ["B", "Z"]',
+                 '(B1_A >= 100 and B1_A <= 1000)',
+                 '100 < B1_A <= 1000',
+                 'bucket == 0 and Dox > -1']
+        
+        for expr in exprs:
+            self.assertIsNotNone(util.compile_subset(expr))
+            ex2 = self.ex.query(expr)
+            ex3 = self.ex.query(expr, engine = "python")  # doesn't compile
+            pd.testing.assert_frame_equal(ex2.data, ex3.data)
+            
+        # cached
+        self.assertIn('Well != "A"', self.ex._cache['query_rows'])
+        
+        # falls back to pandas
+        self.assertIsNone(util.compile_subset('B1_A / 2 > 100'))
+        self.assertEqual(len(self.ex.query('B1_A / 2 > 100')),
+                         len(self.ex.query('B1_A > 200')))
+        
+        with self.assertRaises(util.CytoflowError):
+            self.ex.query('Well == "Z"')
+            
+    def testQueryEmptyNotCached(self):
+        for _ in range(2):
+            with self.assertRaises(util.CytoflowError):
+                self.ex.query('Dox == 5.0')
+                
+        self.assertNotIn('Dox == 5.0', self.ex._cache.get('query_rows', {}))
+        
+    def testSubsetIsLazy(self):
+        ex2 = self.ex.subset(['Dox', 'Well'], (100.0, 'C'))
+        self.assertIsNotNone(ex2._source)
+        
+        b1a = ex2['B1-A']
+        self.assertEqual(list(ex2._gathered.keys()), ['B1-A'])
+        self.assertEqual(len(b1a), 100)
+        self.assertEqual(list(b1a.index), list(range(100)))
+        
+        ex3 = ex2.query('bucket == 0')
+        self.assertIs(ex3._source, ex2._source)
+        self.assertEqual(len(ex3), 100)
+        
+        # reading data builds the whole thing
+        self.assertEqual(ex3.data.shape, (100, 19))
+        self.assertIsNone(ex3._source)
+        pd.testing.assert_series_equal(ex3['B1-A'], b1a)
+        
+    def testSubsetDoesntSeeNewColumns(self):
+        ex2 = self.ex.query('Dox == 100.0')
+        self.ex.add_condition('in_gate', 'bool', pd.Series([True] * len(self.ex)))
+        self.assertNotIn('in_gate', ex2.data)
+        self.assertEqual(len(ex2.conditions), 3)
+        
     def testAddEvents(self):
         ex2 = self.ex.subset(['Dox', 'Well'], (100.0, 'C'))
         old_len = len(self.ex)
@@ -77,7 +157,65 @@ class TestExperiment(ImportedDataTest):
         self.assertEqual(len(self.ex['Well'].unique()), 4)
         self.assertEqual(len(self.ex), len(ex2) + old_len)
         
+    def testAddEventsMany(self):
+        ex2 = self.ex.subset(['Dox', 'Well'], (100.0, 'C'))
+        old_len = len(self.ex)
+        
+        self.ex.add_events_many([(ex2.data[ex2.channels], {'Dox' : 1000.0, 
+                                                           'Well' : 'D',
+                                                           'bucket' : 1}),
+                                 (ex2.data[ex2.channels], {'Dox' : 1000.0, 
+                                                           'Well' : 'E',
+                                                           'bucket' : 2})])
+        
+        self.assertEqual(len(self.ex['Dox'].unique()), 4)
+        self.assertEqual(len(self.ex['Well'].unique()), 5)
+        self.assertEqual(len(self.ex), 2 * len(ex2) + old_len)
+        self.assertEqual(self.ex.metadata['Well']['values'], ['A', 'B', 'C', 'D', 'E'])
+        self.assertEqual(self.ex['Well'].iloc[-1], 'E')
+        self.assertEqual(self.ex['B1-A'].iloc[-1], ex2['B1-A'].iloc[-1])
+        
+    def testAddEventsManyBadConditions(self):
+        ex2 = self.ex.subset(['Dox', 'Well'], (100.0, 'C'))
+        old_len = len(self.ex)
+        
+        with self.assertRaises(util.CytoflowError):
+            self.ex.add_events_many([(ex2.data[ex2.channels], {'Dox' : 1000.0, 
+                                                               'Well' : 'D',
+                                                               'bucket' : 1}),
+                                     (ex2.data[ex2.channels], {'Dox' : 1000.0})])
+            
+        self.assertEqual(len(self.ex), old_len)
+        
     
+    def testGroupIndex(self):
+        gi = self.ex.group_index(['Dox', 'Well'])
+        gb = self.ex.data.groupby(['Dox', 'Well'])
+        
+        self.assertEqual(list(gi.indices.keys()), list(gb.groups.keys()))
+        for (group, data), (pd_group, pd_data) in zip(gi, gb):
+            self.assertEqual(group, pd_group)
+            pd.testing.assert_frame_equal(data, pd_data)
+            
+        self.assertIs(self.ex.group_index(['Dox', 'Well']).indices, gi.indices)
+        
+        gi = self.ex.group_index([])
+        self.assertEqual(list(gi.indices.keys()), [True])
+        self.assertEqual(len(gi.get_group(True)), len(self.ex))
+        
+    def testGroupIndexClone(self):
+        gi = self.ex.group_index(['Dox'])
+        
+        ex2 = self.ex.clone(deep = False)
+        ex2.add_condition('in_gate', 'bool', pd.Series([True] * len(ex2)))
+        self.assertIs(ex2.group_index(['Dox']).indices, gi.indices)
+        
+        ex2['Dox'] = ex2['Dox'] * 2
+        self.assertIsNot(ex2.group_index(['Dox']).indices, gi.indices)
+        
+        ex3 = self.ex.query('Dox == 10.0')
+        self.assertEqual(list(ex3.group_index(['Dox']).indices.keys()), [10.0])
+        
     def testCloneIsShallow(self):
         ex2 = self.ex.clone(deep = False)
         self.assertNotEqual(self.ex['B1-A'].at[100], 100.0)
@@ -96,6 +234,229 @@ class TestExperiment(ImportedDataTest):
          
         self.assertEqual(ex2['B1-A'].at[100], 100.0)
         self.assertNotEqual(self.ex['B1-A'].at[100], 100.0)
+        
+    def testShallowCloneCopyOnWrite(self):
+        ex2 = self.ex.clone(deep = False)
+        ex2['B1-A'] = [100.0] * len(self.ex)
+        ex2['Y2-A'] = ex2['Y2-A'] * 2
+        
+        self.assertEqual(ex2['B1-A'].at[100], 100.0)
+        self.assertNotEqual(self.ex['B1-A'].at[100], 100.0)
+        self.assertEqual(ex2['Y2-A'].at[100], self.ex['Y2-A'].at[100] * 2)
+        self.assertEqual(list(ex2.data.columns), list(self.ex.data.columns))
+        
+        # the columns we didn't replace are still shared
+        self.assertTrue(np.shares_memory(ex2['V2-A'].values, 
+                                         self.ex['V2-A'].values))
+        self.assertFalse(np.shares_memory(ex2['B1-A'].values, 
+                                          self.ex['B1-A'].values))
+        
+    def testScaled(self):
+        scale = util.scale_factory("logicle", self.ex, channel = 'B1-A')
+
+        scaled = self.ex.scaled('B1-A', scale)
+        self.assertTrue(np.allclose(scaled, scale(self.ex['B1-A']), equal_nan = True))
+        self.assertIs(self.ex.scaled('B1-A', scale), scaled)
+
+        # a scale with the same parameters is the same key
+        scale2 = util.scale_factory("logicle", self.ex, channel = 'B1-A')
+        self.assertIs(self.ex.scaled('B1-A', scale2), scaled)
+
+        # ... and one with different parameters isn't
+        scale2.M = 5.0
+        self.assertIsNot(self.ex.scaled('B1-A', scale2), scaled)
+
+        with self.assertRaises(util.CytoflowError):
+            self.ex.scaled('XYZ', scale)
+
+    def testScaledClone(self):
+        scale = util.scale_factory("log", self.ex, channel = 'B1-A')
+        scaled = self.ex.scaled('B1-A', scale)
+
+        ex2 = self.ex.clone(deep = False)
+        self.assertIs(ex2.scaled('B1-A', scale), scaled)
+
+        # replacing the column invalidates the clone's entry, but not the
+        # original's
+        ex2['B1-A'] = ex2['B1-A'] * 2
+        self.assertIsNot(ex2.scaled('B1-A', scale), scaled)
+        self.assertTrue(np.allclose(ex2.scaled('B1-A', scale),
+                                    scale(self.ex['B1-A'] * 2), equal_nan = True))
+        self.assertIs(self.ex.scaled('B1-A', scale), scaled)
+
+    def testScaledSubset(self):
+        scale = util.scale_factory("log", self.ex, channel = 'B1-A')
+        self.ex.scaled('B1-A', scale)
+
+        ex2 = self.ex.query('Dox == 10.0')
+        scaled = ex2.scaled('B1-A', scale)
+        self.assertTrue(np.allclose(scaled, scale(ex2['B1-A']), equal_nan = True))
+        self.assertTrue(scaled.index.equals(ex2.data.index))
+
+    def testScaledCacheSize(self):
+        log_b = util.scale_factory("log", self.ex, channel = 'B1-A')
+        log_y = util.scale_factory("log", self.ex, channel = 'Y2-A')
+
+        # room for one column
+        self.ex.scaled_cache_size = len(self.ex) * 8 + 1
+        scaled = self.ex.scaled('B1-A', log_b)
+        self.assertIs(self.ex.scaled('B1-A', log_b), scaled)
+
+        self.ex.scaled('Y2-A', log_y)
+        self.assertIsNot(self.ex.scaled('B1-A', log_b), scaled)
+
+        # and none
+        self.ex.scaled_cache_size = 0
+        self.assertIsNot(self.ex.scaled('B1-A', log_b),
+                         self.ex.scaled('B1-A', log_b))
+
+    def testCanMemoizeScaled(self):
+        self.assertTrue(self.ex.can_memoize_scaled(['B1-A', 'Y2-A']))
+        self.assertTrue(self.ex.query('Dox == 10.0').can_memoize_scaled('B1-A'))
+        
+        self.ex.scaled_cache_size = len(self.ex) * 8
+        self.assertTrue(self.ex.can_memoize_scaled('B1-A'))
+        self.assertFalse(self.ex.can_memoize_scaled(['B1-A', 'Y2-A']))
+        
+        # memory-mapped events may not fit in RAM
+        self.ex.scaled_cache_size = 2 ** 30
+        with tempfile.TemporaryDirectory() as directory:
+            self.ex.memory_map(directory)
+            self.assertFalse(self.ex.can_memoize_scaled('B1-A'))
+            self.assertFalse(self.ex.query('Dox == 10.0').can_memoize_scaled('B1-A'))
+        
+    def testSaveLoad(self):
+        ex = flow.ThresholdOp(name = "T", 
+                              channel = "Y2-A", 
+                              threshold = 100).apply(self.ex)
+        ex = flow.ChannelStatisticOp(name = "S",
+                                     channel = "Y2-A",
+                                     by = ["Dox"],
+                                     function = np.mean).apply(ex)
+        ex.metadata["Y2-A"]["fn"] = lambda x: x
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "ex")
+            with self.assertWarns(util.CytoflowWarning):
+                ex.save(path)
+            
+            for mmap in [True, False]:
+                ex2 = flow.Experiment.load(path, mmap = mmap)
+                self.assertTrue(ex2.data.equals(ex.data))
+                self.assertTrue(ex2.data.dtypes.equals(ex.data.dtypes))
+                self.assertEqual(ex2.channels, ex.channels)
+                self.assertEqual(ex2.conditions.keys(), ex.conditions.keys())
+                self.assertEqual(ex2.metadata["Dox"], ex.metadata["Dox"])
+                self.assertNotIn("fn", ex2.metadata["Y2-A"])
+                self.assertTrue(ex2.statistics[("S", "mean")].equals(ex.statistics[("S", "mean")]))
+                self.assertEqual([type(op) for op in ex2.history], 
+                                 [type(op) for op in ex.history])
+                self.assertEqual(isinstance(ex2["B1-A"].values.base, np.memmap), mmap)
+                
+            # save over the directory we're mapped from
+            ex2 = flow.Experiment.load(path)
+            ex2.save(path)
+            self.assertTrue(flow.Experiment.load(path).data.equals(ex.data))
+            
+        with self.assertRaises(util.CytoflowError):
+            flow.Experiment.load(os.path.join(directory, "not_there"))
+            
+    def testSaveDoesntOverwrite(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # a directory that isn't a saved experiment
+            path = os.path.join(directory, "data")
+            os.makedirs(path)
+            with open(os.path.join(path, "keep.txt"), 'w') as f:
+                f.write("keep")
+                
+            with self.assertRaises(util.CytoflowError):
+                self.ex.save(path)
+            self.assertEqual(os.listdir(path), ["keep.txt"])
+            
+            # a file
+            with self.assertRaises(util.CytoflowError):
+                self.ex.save(os.path.join(path, "keep.txt"))
+            self.assertTrue(os.path.isfile(os.path.join(path, "keep.txt")))
+            
+            # an empty directory is fine
+            path = os.path.join(directory, "empty")
+            os.makedirs(path)
+            self.ex.save(path)
+            self.assertEqual(len(flow.Experiment.load(path)), len(self.ex))
+        
+    def testSaveReplaces(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "ex")
+            self.ex.save(path)
+            
+            # the same permissions as a directory we made ourselves
+            os.makedirs(os.path.join(directory, "mine"))
+            self.assertEqual(os.stat(path).st_mode, 
+                             os.stat(os.path.join(directory, "mine")).st_mode)
+            
+            # if the new experiment can't be swapped in, keep the old one
+            ex2 = self.ex.subset("Well", "B")
+            with mock.patch("os.replace", side_effect = OSError):
+                with self.assertRaises(OSError):
+                    ex2.save(path)
+            self.assertEqual(len(flow.Experiment.load(path)), len(self.ex))
+            
+            ex2.save(path)
+            self.assertEqual(len(flow.Experiment.load(path)), len(ex2))
+            
+            # nothing left over
+            self.assertEqual(sorted(os.listdir(directory)), ["ex", "mine"])
+        
+    def testIterChunks(self):
+        chunks = list(self.ex.iter_chunks(["B1-A", "Dox"], chunk_size = 7000))
+        self.assertEqual(len(chunks), int(np.ceil(len(self.ex) / 7000)))
+        self.assertEqual(list(chunks[0][1].columns), ["B1-A", "Dox"])
+        self.assertTrue(pd.concat([c for _, c in chunks]).equals(self.ex.data[["B1-A", "Dox"]]))
+        
+        b1 = np.empty(len(self.ex))
+        for rows, chunk in self.ex.iter_chunks("B1-A", chunk_size = 7000):
+            self.assertEqual(len(chunk), rows.stop - rows.start)
+            b1[rows] = chunk["B1-A"]
+        self.assertTrue((b1 == self.ex["B1-A"]).all())
+        
+        # chunks of a subset
+        ex2 = self.ex.subset("Well", "B")
+        chunks = [c for _, c in ex2.iter_chunks(chunk_size = 7000)]
+        self.assertTrue(pd.concat(chunks).equals(ex2.data))
+        
+        with self.assertRaises(util.CytoflowError):
+            next(self.ex.iter_chunks("B2-A"))
+            
+        with self.assertRaises(util.CytoflowError):
+            next(self.ex.iter_chunks(chunk_size = 0))
+        
+    def testMemoryMap(self):
+        ref = self.ex.clone(deep = True)
+        
+        with tempfile.TemporaryDirectory() as directory:
+            self.ex.memory_map(directory)
+            files = os.listdir(directory)
+            self.assertEqual(len(files), len(self.ex.data.columns))
+            
+            # the data didn't change, and the columns are backed by the files
+            self.assertTrue(self.ex.data.equals(ref.data))
+            self.assertEqual(self.ex.data['Well'].dtype, ref.data['Well'].dtype)
+            self.assertIsInstance(self.ex['B1-A'].values.base, np.memmap)
+            
+            self.assertEqual(len(self.ex.subset('Dox', 10.0)), 
+                             len(ref.subset('Dox', 10.0)))
+            self.assertEqual(len(self.ex.query('Well == "A"')),
+                             len(ref.query('Well == "A"')))
+            
+            # new columns are in memory until we map them
+            ex2 = self.ex.clone(deep = False)
+            ex2.add_condition("B1_pos", "bool", ex2['B1-A'] > 100)
+            self.assertTrue(np.shares_memory(ex2['B1-A'].values, 
+                                             self.ex['B1-A'].values))
+            
+            ex2.memory_map(directory)
+            self.assertEqual(len(os.listdir(directory)), len(files) + 1)
+            self.assertTrue((ex2['B1_pos'] == (ref['B1-A'] > 100)).all())
          
 
 
@@ -55,6 +55,30 @@ class Test(ImportedDataSmallTest):
                              ex_rt.metadata[channel]['range'])
 
 
+    def testWorkers(self):
+        d1 = self.directory / "serial"
+        d2 = self.directory / "parallel"
+        d1.mkdir()
+        d2.mkdir()
+        
+        flow.ExportFCS(path = d1, by = ['Dox', 'Well']).export(self.ex)
+        
+        written = []
+        flow.ExportFCS(path = d2, 
+                       by = ['Dox', 'Well'],
+                       workers = 4).export(self.ex, 
+                                           progress = lambda i, n, path: written.append((i, n, path)))
+        
+        files = sorted(os.listdir(d1))
+        self.assertEqual(files, sorted(os.listdir(d2)))
+        self.assertEqual(sorted(p.name for _, _, p in written), files)
+        self.assertEqual([(i, n) for i, n, _ in written], 
+                         [(i + 1, len(files)) for i in range(len(files))])
+        
+        for f in files:
+            with open(d1 / f, 'rb') as f1, open(d2 / f, 'rb') as f2:
+                self.assertEqual(f1.read(), f2.read())
+
     def testRoundtripWithBeadCalibration(self):
         self.cwd = os.path.dirname(os.path.abspath(__file__))
         self.ex = flow.ImportOp(conditions = {'Dox' : 'float'},
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+import os, shutil, tempfile
+from unittest import mock
+
+import cytoflow.utility as util
+from cytoflow.utility import fcs_cache
+
+class TestFCSMetadataCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.path.dirname(os.path.abspath(__file__))
+        self.file = self.cwd + '/data/Plate01/RFP_Well_A3.fcs'
+        self.cache = util.FCSMetadataCache(maxsize = 2)
+        
+    def testCache(self):
+        with mock.patch.object(fcs_cache.fcsparser, 'parse', 
+                               wraps = fcs_cache.fcsparser.parse) as parse:
+            meta1 = self.cache.get(self.file, reformat_meta = True)
+            meta2 = self.cache.get(self.file, reformat_meta = True)
+            self.assertEqual(parse.call_count, 1)
+            
+            # different options are a different entry
+            self.cache.get(self.file)
+            self.assertEqual(parse.call_count, 2)
+            
+        self.assertEqual(meta1['$TOT'], meta2['$TOT'])
+        
+        # we get copies, so changing them doesn't change the cache
+        meta1['$TOT'] = 'foo'
+        meta1['_channels_'].set_index('$PnN', inplace = True)
+        meta3 = self.cache.get(self.file, reformat_meta = True)
+        self.assertEqual(meta3['$TOT'], meta2['$TOT'])
+        self.assertIn('$PnN', meta3['_channels_'])
+        
+    def testEviction(self):
+        self.cache.get(self.file)
+        self.cache.get(self.file, data_set = 0, reformat_meta = True)
+        self.cache.get(self.file, channel_naming = '$PnN')
+        self.assertEqual(len(self.cache), 2)
+        
+    def testFileChanged(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "tube.fcs")
+            shutil.copy(self.file, filename)
+            self.cache.get(filename)
+            
+            os.utime(filename, ns = (0, 0))
+            with mock.patch.object(fcs_cache.fcsparser, 'parse', 
+                                   wraps = fcs_cache.fcsparser.parse) as parse:
+                self.cache.get(filename)
+                self.assertEqual(parse.call_count, 1)
+                
+    def testPersist(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.pickle")
+            self.cache.persist(path)
+            self.cache.get(self.file)
+            self.cache.save()
+            
+            cache = util.FCSMetadataCache()
+            cache.persist(path)
+            self.assertEqual(len(cache), 1)
+            with mock.patch.object(fcs_cache.fcsparser, 'parse') as parse:
+                cache.get(self.file)
+                parse.assert_not_called()
+                
+            # don't save when the process exits
+            self.cache.path = None
+            cache.path = None
+                
+    def testBadFile(self):
+        with self.assertRaises(Exception):
+            self.cache.get(self.cwd + '/data/Plate01/not_a_file.fcs')
+        self.assertEqual(len(self.cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+import os, warnings
+
+import numpy as np
+from fcsparser import fcsparser
+
+import cytoflow.utility as util
+
+class TestFCSRead(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.path.dirname(os.path.abspath(__file__))
+        self.file = self.cwd + '/data/Plate01/RFP_Well_A3.fcs'
+        
+    def testSameAsFcsparser(self):
+        for filename in [self.file,
+                         self.cwd + '/data/instruments/Accuri - C6.fcs',
+                         self.cwd + '/data/instruments/Cytek xP5.fcs',
+                         self.cwd + '/data/instruments/Cytek DxP10.fcs']:
+            for naming in ["$PnS", "$PnN"]:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    _, expected = fcsparser.parse(filename, channel_naming = naming)
+                    data = util.read_fcs_data(filename, channel_naming = naming)
+                    
+                self.assertEqual(list(data.columns), list(expected.columns))
+                self.assertTrue(data.dtypes.equals(expected.dtypes))
+                np.testing.assert_array_equal(data.values, expected.values)
+            
+    def testChannelNames(self):
+        text = {'$PAR' : '3', 
+                '$P1N' : 'FSC', '$P1S' : 'Forward',
+                '$P2N' : 'SSC', '$P2S' : 'Side',
+                '$P3N' : 'FL1'}
+        
+        # $PnS is all-or-nothing
+        self.assertEqual(util.fcs_channel_names(text, "$PnS"), ['FSC', 'SSC', 'FL1'])
+        
+        text['$P3S'] = 'GFP'
+        self.assertEqual(util.fcs_channel_names(text, "$PnS"), ['Forward', 'Side', 'GFP'])
+        self.assertEqual(util.fcs_channel_names(text, "$PnN"), ['FSC', 'SSC', 'FL1'])
+            
+    def testChannels(self):
+        data = util.read_fcs_data(self.file, channels = ["Y2-A", "B1-A"])
+        all_data = util.read_fcs_data(self.file)
+        
+        self.assertEqual(list(data.columns), ["Y2-A", "B1-A"])
+        self.assertTrue(data.equals(all_data[["Y2-A", "B1-A"]]))
+        
+        with self.assertRaises(util.CytoflowError):
+            util.read_fcs_data(self.file, channels = ["not-a-channel"])
+            
+    def testRows(self):
+        all_data = util.read_fcs_data(self.file)
+        rows = np.array([0, 5, 17, len(all_data) - 1])
+        
+        data = util.read_fcs_data(self.file, rows = rows)
+        np.testing.assert_array_equal(data.values, all_data.values[rows])
+        
+        data = util.read_fcs_data(self.file, rows = [])
+        self.assertEqual(len(data), 0)
+        
+        with self.assertRaises(util.CytoflowError):
+            util.read_fcs_data(self.file, rows = [len(all_data)])
+            
+    def testDataSets(self):
+        filename = self.cwd + '/data/instruments/Beckman Coulter - Cytomics FC500.LMD'
+        
+        # FCS 2.0: 10-bit integers, stored in 16 bits
+        _, _, text = util.read_fcs_text(filename, data_set = 0)
+        self.assertEqual(text['$P1B'], '10')
+        data = util.read_fcs_data(filename, data_set = 0)
+        self.assertEqual(data.values.max(), 1023)
+        
+        # FCS 3.0: 32-bit integers
+        _, expected = fcsparser.parse(filename, data_set = 1)
+        data = util.read_fcs_data(filename, data_set = 1)
+        np.testing.assert_array_equal(data.values, expected.values)
+        
+        with self.assertRaises(util.CytoflowError):
+            util.read_fcs_data(filename, data_set = 2)
+            
+    def testDataSetIndex(self):
+        filename = self.cwd + '/data/instruments/Beckman Coulter - Cytomics FC500.LMD'
+        data_sets = util.fcs_data_sets(filename)
+        
+        self.assertEqual(len(data_sets), 2)
+        for i, data_set in enumerate(data_sets):
+            self.assertEqual(data_set, util.read_fcs_text(filename, data_set = i))
+            
+        self.assertEqual(data_sets[1][0], int(data_sets[0][2]['$NEXTDATA']))
+        self.assertEqual(len(util.fcs_data_sets(self.file)), 1)
+            
+    def testDecodeLog(self):
+        filename = self.cwd + '/data/instruments/Beckman Coulter - Cytomics FC500.LMD'
+        _, _, text = util.read_fcs_text(filename)
+        
+        raw = util.read_fcs_data(filename, dtype = "float64")
+        decoded = util.read_fcs_data(filename, decode_log = True, dtype = "float64")
+        
+        for i, channel in enumerate(raw.columns):
+            f1, f2 = [float(x) for x in text['$P{}E'.format(i + 1)].split(',')]
+            data_range = float(text['$P{}R'.format(i + 1)])
+            if f1 > 0:
+                np.testing.assert_allclose(decoded[channel], 
+                                           10 ** (f1 * raw[channel] / data_range) * (f2 or 1.0))
+            else:
+                np.testing.assert_array_equal(decoded[channel], raw[channel])
+                
+    def testNotFCS(self):
+        with self.assertRaises(util.CytoflowError):
+            util.read_fcs_data(os.path.abspath(__file__))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import unittest
+import os, tempfile, warnings
+
+import numpy as np
+from fcsparser import fcsparser
+
+import cytoflow.utility as util
+
+class TestWriteFCS(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.dir.name, "test.fcs")
+        self.channels = ["A", "B", "C"]
+        self.ranges = {"A" : 1024, "B" : 262144, "C" : 262144}
+        self.data = np.random.RandomState(0).uniform(0, 1000, size = (100000, 3))
+        
+    def tearDown(self):
+        self.dir.cleanup()
+        
+    def read(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            _, data = fcsparser.parse(self.file, channel_naming = "$PnN")
+        return data
+        
+    def testFloat(self):
+        util.write_fcs(self.file, list(self.channels), self.ranges, self.data)
+        data = self.read()
+        
+        self.assertEqual(list(data.columns), self.channels)
+        np.testing.assert_array_equal(data.values, self.data.astype("float32"))
+        
+        _, _, text = util.read_fcs_text(self.file)
+        self.assertEqual(text['$DATATYPE'], "F")
+        self.assertEqual(text['$TOT'], str(len(self.data)))
+        
+    def testDouble(self):
+        util.write_fcs(self.file, list(self.channels), self.ranges, self.data,
+                       datatype = "D")
+        
+        _, _, text = util.read_fcs_text(self.file)
+        self.assertEqual(text['$DATATYPE'], "D")
+        np.testing.assert_array_equal(util.read_fcs_data(self.file, 
+                                                         channel_naming = "$PnN",
+                                                         dtype = "float64").values, 
+                                      self.data)
+        
+    def testInteger(self):
+        data = self.data.copy()
+        data[0, 0] = -5
+        util.write_fcs(self.file, list(self.channels), self.ranges, data,
+                       compat_negative = False, datatype = "I", int_bits = 16)
+        
+        _, _, text = util.read_fcs_text(self.file)
+        self.assertEqual(text['$P1B'], "16")
+        
+        expected = np.clip(np.rint(data), 0, 2 ** 16 - 1)
+        np.testing.assert_array_equal(util.read_fcs_data(self.file, 
+                                                         channel_naming = "$PnN",
+                                                         mask = False, 
+                                                         dtype = "float64").values, 
+                                      expected)
+        
+        with self.assertRaises(ValueError):
+            util.write_fcs(self.file, list(self.channels), self.ranges, data,
+                           datatype = "I", int_bits = 12)
+            
+    def testIntegerRange(self):
+        # values past $PnR are clipped to it, so they don't wrap around when
+        # they're read back
+        data = self.data * 2
+        util.write_fcs(self.file, list(self.channels), self.ranges, data,
+                       compat_negative = False, datatype = "I", int_bits = 16)
+        
+        expected = np.clip(np.rint(data), 0, [1023, 2 ** 16 - 1, 2 ** 16 - 1])
+        np.testing.assert_array_equal(util.read_fcs_data(self.file, 
+                                                         channel_naming = "$PnN",
+                                                         dtype = "float64").values, 
+                                      expected)
+        self.assertEqual(util.read_fcs_data(self.file, channel_naming = "$PnN")["A"].max(), 
+                         1023)
+        
+    def testLargeOffsets(self):
+        # DATA ends past 99,999,999 bytes: the HEADER offsets are 0, and
+        # readers use $BEGINDATA and $ENDDATA instead
+        data = np.zeros((8400000, 3))
+        data[-1] = [1, 2, 3]
+        util.write_fcs(self.file, list(self.channels), self.ranges, data,
+                       compat_negative = False)
+        
+        with open(self.file, 'rb') as f:
+            header = f.read(58).decode("ascii")
+        self.assertEqual(int(header[26:34]), 0)
+        self.assertEqual(int(header[34:42]), 0)
+        
+        read = util.read_fcs_data(self.file, channel_naming = "$PnN")
+        self.assertEqual(len(read), len(data))
+        np.testing.assert_array_equal(read.values[-1], [1, 2, 3])
+        np.testing.assert_array_equal(self.read().values[-1], [1, 2, 3])
+        
+    def testChunks(self):
+        chunks = (self.data[i : i + 30000] for i in range(0, len(self.data), 30000))
+        util.write_fcs(self.file, list(self.channels), self.ranges, chunks,
+                       compat_percent = False, compat_negative = False)
+        np.testing.assert_array_equal(self.read().values, self.data.astype("float32"))
+        
+        # chunks need all the events for the compatibility modes
+        with self.assertRaises(ValueError):
+            util.write_fcs(self.file, list(self.channels), self.ranges, iter([self.data]))
+            
+        # a bad chunk doesn't leave a file behind
+        os.remove(self.file)
+        with self.assertRaises(ValueError):
+            util.write_fcs(self.file, list(self.channels), self.ranges, 
+                           iter([self.data, self.data[:, :2]]),
+                           compat_percent = False, compat_negative = False)
+        self.assertFalse(os.path.exists(self.file))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -54,6 +54,32 @@ class Test(unittest.TestCase):
         x = scale(pd.Series([20]))
         self.assertTrue(isinstance(x, pd.Series))
 
+    def test_hlog_numeric(self):
+        # the table-driven transform matches a root-finder
+        import scipy.optimize
+        from cytoflow.utility.hlog_scale import hlog_inv
+        
+        x = np.r_[-np.logspace(-3, 7, 500)[::-1], 0, np.logspace(-3, 7, 500)]
+        for b in [0.5, 200, 5000]:
+            f = lambda v: scipy.optimize.brentq(lambda y: hlog_inv(y, b, _display_max, _l_mmax) - v,
+                                                -2 * _display_max, 2 * _display_max,
+                                                xtol = 1e-12)
+            expected = np.array([f(v) for v in x])
+            np.testing.assert_allclose(hlog(x, b = b), expected, 
+                                       rtol = 0, atol = 1e-8 * _display_max)
+            
+        # past the end of the table, and the inverse
+        x = np.array([-1e12, 5.0, 3e5, 1e12])
+        np.testing.assert_allclose(hlog_inv(hlog(x), 200, _display_max, _l_mmax), x)
+        
+        # series and arrays keep their shape and index
+        scale = util.scale_factory("hlog", self.ex, channel = "Pacific Blue-A")
+        data = self.ex["Pacific Blue-A"]
+        scaled = scale(data)
+        self.assertTrue(scaled.index.equals(data.index))
+        np.testing.assert_allclose(scale.inverse(scaled), data, rtol = 1e-6, atol = 1e-6)
+        self.assertEqual(scale(data.values.reshape(-1, 2)).shape, (len(data) // 2, 2))
+
     # stolen shamelessly from Eugene Yurtsev's FlowCytometryTools
     # http://gorelab.bitbucket.org/flowcytometrytools/
     # thanks, Eugene!
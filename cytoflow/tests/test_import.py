@@ -24,8 +24,12 @@ Created on Dec 1, 2015
 '''
 
 import unittest
-import os
+import os, tempfile, gc
+from unittest import mock
+import numpy as np
 import cytoflow as flow
+import cytoflow.utility as util
+from cytoflow.operations import import_op
 
 class TestImport(unittest.TestCase):
     
@@ -75,6 +79,174 @@ class TestImport(unittest.TestCase):
                           tubes = [tube1],
                           channels = {'Y2-B' : "Blue"}).apply()
                           
+    def testChannelDtype(self):
+        tube1 = flow.Tube(file = self.cwd + '/data/Plate01/RFP_Well_A3.fcs', conditions = {"Dox" : 10.0})
+        tube2 = flow.Tube(file= self.cwd + '/data/Plate01/CFP_Well_A4.fcs', conditions = {"Dox" : 1.0})
+        ex64 = flow.ImportOp(conditions = {"Dox" : "float"},
+                             tubes = [tube1, tube2]).apply()
+        ex32 = flow.ImportOp(conditions = {"Dox" : "float"},
+                             tubes = [tube1, tube2],
+                             channel_dtype = "float32").apply()
+                             
+        self.assertEqual(ex32.channel_dtype, "float32")
+        for channel in ex32.channels:
+            self.assertEqual(ex32[channel].dtype, "float32")
+            self.assertTrue((ex32[channel] == ex64[channel].astype("float32")).all())
+            
+        ex32.add_channel("FSC_over_2", ex32["FSC-A"] / 2.0)
+        self.assertEqual(ex32["FSC_over_2"].dtype, "float32")
+        self.assertEqual(ex32.clone()["FSC_over_2"].dtype, "float32")
+        
+    def testScratchDir(self):
+        tube1 = flow.Tube(file = self.cwd + '/data/Plate01/RFP_Well_A3.fcs', conditions = {"Dox" : 10.0})
+        tube2 = flow.Tube(file= self.cwd + '/data/Plate01/CFP_Well_A4.fcs', conditions = {"Dox" : 1.0})
+        ex = flow.ImportOp(conditions = {"Dox" : "float"},
+                           tubes = [tube1, tube2]).apply()
+        
+        with tempfile.TemporaryDirectory() as directory:
+            ex_mm = flow.ImportOp(conditions = {"Dox" : "float"},
+                                  tubes = [tube1, tube2],
+                                  scratch_dir = directory).apply()
+                                  
+            self.assertEqual(len(os.listdir(directory)), len(ex.data.columns))
+            self.assertTrue(ex_mm.data.equals(ex.data))
+            
+    def testWorkers(self):
+        tube1 = flow.Tube(file = self.cwd + '/data/Plate01/RFP_Well_A3.fcs', conditions = {"Dox" : 10.0})
+        tube2 = flow.Tube(file= self.cwd + '/data/Plate01/CFP_Well_A4.fcs', conditions = {"Dox" : 1.0})
+        tube3 = flow.Tube(file= self.cwd + '/data/Plate01/YFP_Well_A7.fcs', conditions = {"Dox" : 100.0})
+        
+        for events in [0, 1000]:
+            kwargs = {"events" : events} if events else {}
+            
+            np.random.seed(0)
+            ex1 = flow.ImportOp(conditions = {"Dox" : "float"},
+                                tubes = [tube1, tube2, tube3],
+                                workers = 1,
+                                **kwargs).apply()
+                                
+            np.random.seed(0)
+            ex2 = flow.ImportOp(conditions = {"Dox" : "float"},
+                                tubes = [tube1, tube2, tube3],
+                                workers = 2,
+                                **kwargs).apply()
+                                
+            self.assertTrue(ex1.data.equals(ex2.data))
+            self.assertEqual(ex1.metadata.keys(), ex2.metadata.keys())
+            
+        tube4 = flow.Tube(file = self.cwd + '/data/Plate01/not_a_file.fcs', conditions = {"Dox" : 1000.0})
+        with self.assertRaises(util.CytoflowOpError):
+            flow.ImportOp(conditions = {"Dox" : "float"},
+                          tubes = [tube1, tube4, tube2],
+                          workers = 2).apply()
+        
+    def testEvents(self):
+        tube1 = flow.Tube(file = self.cwd + '/data/Plate01/RFP_Well_A3.fcs', conditions = {"Dox" : 10.0})
+        tube2 = flow.Tube(file= self.cwd + '/data/Plate01/CFP_Well_A4.fcs', conditions = {"Dox" : 1.0})
+        
+        ex = flow.ImportOp(conditions = {"Dox" : "float"},
+                           tubes = [tube1, tube2],
+                           events = 1000,
+                           random_state = 1).apply()
+        self.assertEqual(len(ex), 2000)
+        
+        # the same seed chooses the same events
+        ex2 = flow.ImportOp(conditions = {"Dox" : "float"},
+                            tubes = [tube1, tube2],
+                            events = 1000,
+                            random_state = 1).apply()
+        self.assertTrue(ex.data.equals(ex2.data))
+        
+        # ... which are a subset of all the events, in order
+        ex_all = flow.ImportOp(conditions = {"Dox" : "float"},
+                               tubes = [tube1]).apply()
+        tube1_data = ex.data[ex.data["Dox"] == 10.0]
+        merged = ex_all.data.reset_index().merge(tube1_data)
+        self.assertEqual(len(merged), 1000)
+        self.assertTrue(merged["index"].is_monotonic_increasing)
+        
+        with self.assertWarns(util.CytoflowWarning):
+            ex = flow.ImportOp(conditions = {"Dox" : "float"},
+                               tubes = [tube1],
+                               events = len(ex_all) + 1).apply()
+        self.assertEqual(len(ex), len(ex_all))
+        
+    def testDecode(self):
+        # log-scaled integer channels are converted to linear as each tube
+        # is read
+        fcs_file = self.cwd + '/data/instruments/Stratedigm - S1400.fcs'
+        
+        with self.assertWarnsRegex(util.CytoflowWarning, "from logarithmic to linear"):
+            ex = flow.ImportOp(tubes = [flow.Tube(file = fcs_file)]).apply()
+            
+        channels = [ex.metadata[c]["fcs_name"] for c in ex.channels]
+        data = util.read_fcs_data(fcs_file, 
+                                  channels = channels, 
+                                  decode_log = True, 
+                                  dtype = "float64")
+        for c in ex.channels:
+            np.testing.assert_array_equal(ex[c].values, 
+                                          data[ex.metadata[c]["fcs_name"]].values)
+            
+        self.assertGreater(ex.data.max().max(), 1000)
+        
+        # the same, in parallel
+        ex2 = flow.ImportOp(tubes = [flow.Tube(file = fcs_file, conditions = {"T" : 1}),
+                                     flow.Tube(file = fcs_file, conditions = {"T" : 2})],
+                            conditions = {"T" : "int"},
+                            workers = 2).apply()
+        for c in ex.channels:
+            np.testing.assert_array_equal(ex2[c].values[:len(ex)], ex[c].values)
+        
+    def testIncremental(self):
+        tube1 = flow.Tube(file = self.cwd + '/data/Plate01/RFP_Well_A3.fcs', conditions = {"Dox" : 10.0})
+        tube2 = flow.Tube(file= self.cwd + '/data/Plate01/CFP_Well_A4.fcs', conditions = {"Dox" : 1.0})
+        tube3 = flow.Tube(file= self.cwd + '/data/Plate01/YFP_Well_A7.fcs', conditions = {"Dox" : 100.0})
+        
+        for kwargs in [{}, {"events" : 1000, "random_state" : 1}]:
+            op = flow.ImportOp(conditions = {"Dox" : "float"},
+                               tubes = [tube1, tube2],
+                               incremental = True,
+                               workers = 1,
+                               **kwargs)
+            
+            with mock.patch.object(import_op, 'parse_tube', 
+                                   wraps = import_op.parse_tube) as parse:
+                ex = op.apply()
+                self.assertEqual(parse.call_count, 2)
+                
+                # only the new tube is parsed
+                op.tubes = [tube3, tube1, tube2]
+                ex = op.apply()
+                self.assertEqual(parse.call_count, 3)
+                
+                op.tubes = [tube2, tube3]
+                ex2 = op.apply()
+                self.assertEqual(parse.call_count, 3)
+                
+                # the events are re-used from the last result, not kept by 
+                # the operation -- so if it's gone, the tubes are parsed again
+                ex3 = op.apply()
+                self.assertEqual(parse.call_count, 3)
+                del ex3
+                gc.collect()
+                ex3 = op.apply()
+                self.assertEqual(parse.call_count, 5)
+                
+                # ... and so are they if its events changed
+                ex3['B1-A'] = ex3['B1-A'] * 2
+                op.apply()
+                self.assertEqual(parse.call_count, 7)
+                
+            # ... and the results are the same as importing them all
+            for tubes, result in [([tube3, tube1, tube2], ex), ([tube2, tube3], ex2)]:
+                expected = flow.ImportOp(conditions = {"Dox" : "float"},
+                                         tubes = tubes,
+                                         **kwargs).apply()
+                self.assertTrue(result.data.equals(expected.data))
+                self.assertEqual(result.metadata['fcs_metadata'].keys(),
+                                 expected.metadata['fcs_metadata'].keys())
+        
     def testManufacturers(self):
         files = ['Accuri - C6.fcs',
                  'Applied Biosystems - Attune.fcs',
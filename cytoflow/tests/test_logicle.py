@@ -19,6 +19,7 @@
 
 import unittest
 
+import numpy as np
 import pandas as pd
 
 import cytoflow as flow
@@ -64,6 +65,48 @@ class TestLogicle(unittest.TestCase):
         x = scale(pd.Series([20]))
         self.assertTrue(isinstance(x, pd.Series))
         
+    def test_logicle_array(self):
+        """
+        The array entry points give the same answers as the scalar ones
+        """
+        
+        scale = util.scale_factory("logicle", self.ex, channel = "Y2-A")
+        logicle = scale.get_mpl_params(None)["logicle"]
+        
+        data = self.ex["Y2-A"]
+        expected = np.array([scale(float(x)) for x in data])
+        
+        x = scale(data)
+        self.assertTrue(isinstance(x, pd.Series))
+        self.assertTrue(x.index.equals(data.index))
+        np.testing.assert_array_equal(x.values, expected)
+        
+        x = scale(data.values.reshape(-1, 2))
+        self.assertEqual(x.shape, (len(data) // 2, 2))
+        np.testing.assert_array_equal(x.ravel(), expected)
+        
+        # big enough to split across threads
+        values = np.tile(np.clip(data.values.astype(np.float64), 
+                                 logicle.inverse(0.0), 
+                                 logicle.inverse(1.0 - 1e-15)), 
+                         20)
+        out = np.empty(len(values))
+        logicle.scaleArray(values, out, 4)
+        np.testing.assert_array_equal(out, np.tile(expected, 20))
+        
+        y = scale.inverse(x)
+        np.testing.assert_array_equal(y.ravel(), 
+                                      [scale.inverse(float(v)) for v in x.ravel()])
+        np.testing.assert_allclose(scale.inverse(scale(data)), 
+                                   scale.clip(data), 
+                                   rtol = 1e-6)
+        
+        with self.assertRaises(ValueError):
+            logicle.inverseArray(np.array([0.5, 2.0]), np.empty(2), 1)
+            
+        with self.assertRaises(TypeError):
+            logicle.scaleArray(np.array([1, 2]), np.empty(2), 1)
+        
     ### TODO - test the apply function error checking
     
 if __name__ == "__main__":
@@ -22,7 +22,7 @@ Created on Dec 1, 2015
 
 @author: brian
 '''
-import unittest
+import unittest, tempfile
 import cytoflow as flow
 import pandas as pd
 from .test_base import ImportedDataSmallTest
@@ -48,6 +48,18 @@ class Test(ImportedDataSmallTest):
         
         self.assertIsInstance(ex2.data.index, pd.RangeIndex)
         
+    def testGateChunked(self):
+        self.gate.xscale = "logicle"
+        self.gate.yscale = "log"
+        expected = self.gate.apply(self.ex)["Polygon"]
+        
+        # memory-mapped experiments are scaled a chunk at a time
+        with tempfile.TemporaryDirectory() as directory:
+            self.ex.memory_map(directory)
+            self.assertFalse(self.ex.can_memoize_scaled(["V2-A", "Y2-A"]))
+            pd.testing.assert_series_equal(self.gate.apply(self.ex)["Polygon"], 
+                                           expected)
+        
     def testInclusive(self):
         # make a polygon with a segment that goes through the origin
         self.gate = flow.PolygonOp(name = "Polygon",
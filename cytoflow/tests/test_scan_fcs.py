@@ -0,0 +1,62 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import unittest
+import os, io, csv, json
+
+import cytoflow.utility as util
+from cytoflow.scripts.scan_fcs import scan_fcs, write_table
+
+class TestScanFCS(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.path.dirname(os.path.abspath(__file__))
+        self.dir = self.cwd + '/data/Plate01'
+        
+    def testScan(self):
+        rows = scan_fcs(self.dir, keywords = ['$fil'], jobs = 1)
+        files = sorted(f for f in os.listdir(self.dir) if f.endswith('.fcs'))
+        
+        self.assertEqual(sorted(set(os.path.basename(r['file']) for r in rows)), files)
+        
+        _, _, text = util.read_fcs_text(self.dir + '/RFP_Well_A3.fcs')
+        rfp = [r for r in rows if r['file'].endswith('RFP_Well_A3.fcs')]
+        self.assertEqual(len(rfp), int(text['$PAR']))
+        self.assertEqual([r['$PnN'] for r in rfp], 
+                         [text['$P{}N'.format(i + 1)] for i in range(len(rfp))])
+        self.assertEqual(rfp[0]['$TOT'], text['$TOT'])
+        self.assertEqual(rfp[0]['$FIL'], text['$FIL'])
+        
+        # the same in parallel
+        self.assertEqual(scan_fcs(self.dir, keywords = ['$fil'], jobs = 2), rows)
+        
+    def testWriteTable(self):
+        rows = scan_fcs(self.dir, jobs = 1)
+        
+        f = io.StringIO()
+        write_table(rows, f, 'csv')
+        f.seek(0)
+        self.assertEqual(len(list(csv.DictReader(f))), len(rows))
+        
+        f = io.StringIO()
+        write_table(rows, f, 'json')
+        self.assertEqual(json.loads(f.getvalue()), rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import unittest
+import os, tempfile
+
+import cytoflow.utility as util
+from cytoflow.scripts.split_fcs import split_fcs
+
+class TestSplitFCS(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.path.dirname(os.path.abspath(__file__))
+        self.file = self.cwd + '/data/instruments/Beckman Coulter - Cytomics FC500.LMD'
+        self.dir = tempfile.TemporaryDirectory()
+        
+    def tearDown(self):
+        self.dir.cleanup()
+        
+    def testSplit(self):
+        paths = split_fcs(self.file, path = self.dir.name, jobs = 2)
+        self.assertEqual(len(paths), 2)
+        
+        for i, path in enumerate(paths):
+            # each data set is on its own now...
+            self.assertEqual(len(util.fcs_data_sets(str(path))), 1)
+            _, _, text = util.read_fcs_text(str(path))
+            self.assertEqual(int(text['$NEXTDATA']), 0)
+            
+            # ... with the same events
+            self.assertTrue(util.read_fcs_data(str(path))
+                            .equals(util.read_fcs_data(self.file, data_set = i)))
+            
+    def testNames(self):
+        paths = split_fcs(self.file, path = self.dir.name, name_metadata = "$FIL", dry = True)
+        self.assertEqual(paths[0].name, "2C CD3-CD4 002.LMD.fcs")
+        self.assertEqual(paths[1].name, "Beckman Coulter - Cytomics FC500_1.fcs")
+        self.assertEqual(os.listdir(self.dir.name), [])
+        
+    def testReencode(self):
+        paths = split_fcs(self.file, path = self.dir.name, reencode = True)
+        for path in paths:
+            _, _, text = util.read_fcs_text(str(path))
+            self.assertEqual(text['$DATATYPE'], 'F')
+
+
+if __name__ == "__main__":
+    unittest.main()
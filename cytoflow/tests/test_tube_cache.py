@@ -0,0 +1,138 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import unittest
+import os, tempfile, time
+from unittest import mock
+
+import numpy as np
+
+import cytoflow as flow
+import cytoflow.utility as util
+from cytoflow.utility import tube_cache
+
+class TestTubeCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.path.dirname(os.path.abspath(__file__))
+        self.file = self.cwd + '/data/Plate01/RFP_Well_A3.fcs'
+        self.file2 = self.cwd + '/data/Plate01/CFP_Well_A4.fcs'
+        self.dir = tempfile.TemporaryDirectory()
+        self.cache = util.TubeCache(self.dir.name)
+        
+    def tearDown(self):
+        self.dir.cleanup()
+        
+    def testCache(self):
+        expected = util.read_fcs_data(self.file)
+        
+        with mock.patch.object(tube_cache, 'read_fcs_data', 
+                               wraps = tube_cache.read_fcs_data) as read:
+            data = self.cache.read(self.file, channels = ["Y2-A", "B1-A"])
+            self.assertEqual(read.call_count, 1)
+            self.assertTrue(data.equals(expected[["Y2-A", "B1-A"]]))
+            
+            # cached
+            data = self.cache.read(self.file, channels = ["B1-A"])
+            self.assertEqual(read.call_count, 1)
+            self.assertTrue(data.equals(expected[["B1-A"]]))
+            
+            # only the new channels are read
+            data = self.cache.read(self.file)
+            self.assertEqual(read.call_count, 2)
+            self.assertEqual(read.call_args[1]['channels'], 
+                             [c for c in expected.columns if c not in ["Y2-A", "B1-A"]])
+            self.assertTrue(data.equals(expected))
+            
+            # the channels are cached by position, not by name
+            data = self.cache.read(self.file, channel_naming = "$PnN")
+            self.assertEqual(read.call_count, 2)
+            np.testing.assert_array_equal(data.values, expected.values)
+            
+            # and a subset of the events comes from the cache too
+            rows = [0, 10, 100]
+            data = self.cache.read(self.file, rows = rows)
+            self.assertEqual(read.call_count, 2)
+            np.testing.assert_array_equal(data.values, expected.values[rows])
+            
+            # different decoding parameters are a different entry
+            self.cache.read(self.file, dtype = "float64")
+            self.assertEqual(read.call_count, 3)
+            
+        with self.assertRaises(util.CytoflowError):
+            self.cache.read(self.file, channels = ["not-a-channel"])
+            
+        with self.assertRaises(util.CytoflowError):
+            self.cache.read(self.file, rows = [len(expected)])
+            
+    def testEviction(self):
+        self.cache.read(self.file)
+        self.cache.read(self.file2)
+        self.assertEqual(len(os.listdir(self.dir.name)), 2)
+        
+        # keeps the most recently used one
+        self.cache.max_bytes = self.cache.size() - 1
+        time.sleep(0.1)
+        self.cache.read(self.file)
+        self.cache.evict()
+        self.assertEqual(len(os.listdir(self.dir.name)), 1)
+        
+        with mock.patch.object(tube_cache, 'read_fcs_data', 
+                               wraps = tube_cache.read_fcs_data) as read:
+            self.cache.read(self.file)
+            self.assertEqual(read.call_count, 0)
+            
+        self.cache.clear()
+        self.assertEqual(self.cache.size(), 0)
+        
+    def testForeignFiles(self):
+        # files and directories the cache didn't make are never removed
+        os.makedirs(os.path.join(self.dir.name, "data"))
+        with open(os.path.join(self.dir.name, "data", "keep.fcs"), 'w') as f:
+            f.write("keep")
+        with open(os.path.join(self.dir.name, "keep.txt"), 'w') as f:
+            f.write("keep")
+            
+        self.cache.read(self.file)
+        self.cache.max_bytes = 0
+        self.cache.evict()
+        self.assertEqual(self.cache.size(), 0)
+        
+        self.cache.read(self.file)
+        self.cache.clear()
+        self.assertEqual(sorted(os.listdir(self.dir.name)), ["data", "keep.txt"])
+        self.assertTrue(os.path.isfile(os.path.join(self.dir.name, "data", "keep.fcs")))
+        
+    def testImport(self):
+        tube1 = flow.Tube(file = self.file, conditions = {"Dox" : 10.0})
+        tube2 = flow.Tube(file = self.file2, conditions = {"Dox" : 1.0})
+        
+        ex = flow.ImportOp(conditions = {"Dox" : "float"},
+                           tubes = [tube1, tube2]).apply()
+        
+        for _ in range(2):
+            ex_cached = flow.ImportOp(conditions = {"Dox" : "float"},
+                                      tubes = [tube1, tube2],
+                                      cache_dir = self.dir.name).apply()
+            self.assertTrue(ex_cached.data.equals(ex.data))
+        
+        self.assertEqual(len(os.listdir(self.dir.name)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -32,6 +32,7 @@ from .util_functions import (cartesian, iqr, geom_mean, geom_sd, geom_sd_range,
                              random_string, is_numeric, cov2corr)
 
 from .algorithms import ci, polygon_contains
+from .subset_expression import compile_subset, SubsetExpression, UnsupportedSubset
 from .cytoflow_errors import CytoflowError, CytoflowOpError, CytoflowViewError
 from .cytoflow_errors import CytoflowWarning, CytoflowOpWarning, CytoflowViewWarning
 
@@ -42,4 +43,7 @@ from .custom_traits import (PositiveInt, PositiveCInt, PositiveFloat,
 
 from .docstring import expand_class_attributes, expand_method_parameters
 
-from .fcswrite import write_fcs
\ No newline at end of file
+from .fcswrite import write_fcs
+from .fcs_cache import FCSMetadataCache, fcs_metadata_cache, parse_fcs_metadata
+from .fcsread import read_fcs_text, read_fcs_data, fcs_channel_names, fcs_data_sets
+from .tube_cache import TubeCache
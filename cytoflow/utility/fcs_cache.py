@@ -0,0 +1,198 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+cytoflow.utility.fcs_cache
+--------------------------
+
+A process-wide cache of FCS file metadata (the HEADER and TEXT segments).
+Importing an experiment (and estimating the calibration operations, and
+browsing files in the GUI) reads each file's metadata several times; the
+cache makes every read after the first one free.
+
+`FCSMetadataCache` -- a size-bounded LRU cache of FCS metadata, keyed by
+the file's path, size and modification time.
+
+`fcs_metadata_cache` -- the process-wide `FCSMetadataCache`.
+
+`parse_fcs_metadata` -- parse an FCS file's metadata, using
+`fcs_metadata_cache`.
+"""
+
+import os, copy, pickle, atexit, threading
+from collections import OrderedDict
+from warnings import warn
+
+from fcsparser import fcsparser
+
+from .cytoflow_errors import CytoflowWarning
+
+class FCSMetadataCache(object):
+    """
+    A size-bounded, least-recently-used cache of FCS file metadata.
+
+    Entries are keyed by the file's (real) path, size and modification
+    time, the data set and the parsing options -- so if a file changes,
+    it is parsed again.  `get` returns a deep copy of the cached metadata,
+    so callers can modify it.
+
+    The cache can optionally be persisted to disk with `persist`, so
+    metadata survives from one session to the next.
+
+    Attributes
+    ----------
+    maxsize : Int
+        The maximum number of entries to keep.
+
+    path : Str
+        If not ``None``, the file the cache is saved to (see `persist`.)
+    """
+
+    def __init__(self, maxsize = 1024):
+        self.maxsize = maxsize
+        self.path = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._atexit = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, filename, data_set = 0, **options):
+        """
+        Get the metadata for data set ``data_set`` in FCS file ``filename``,
+        parsing it with `fcsparser.parse` if it isn't cached.
+
+        Parameters
+        ----------
+        filename : Str
+            The FCS file.
+
+        data_set : Int (default = 0)
+            Which data set in the file?
+
+        options : Dict
+            Other keyword arguments for `fcsparser.parse`, such as
+            ``channel_naming`` or ``reformat_meta``.
+
+        Returns
+        -------
+        Dict
+            A (deep) copy of the file's metadata.
+
+        Raises
+        ------
+        Exception
+            Whatever `fcsparser.parse` raises if it can't parse the file.
+            Failures aren't cached.
+        """
+
+        stat = os.stat(filename)
+        key = (os.path.realpath(filename), stat.st_size, stat.st_mtime_ns,
+               data_set, tuple(sorted(options.items())))
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return copy.deepcopy(self._entries[key])
+
+        metadata = fcsparser.parse(filename,
+                                   meta_data_only = True,
+                                   data_set = data_set,
+                                   **options)
+
+        with self._lock:
+            self._entries[key] = metadata
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last = False)
+
+        return copy.deepcopy(metadata)
+
+    def clear(self):
+        """Remove all the entries from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+    def persist(self, path):
+        """
+        Persist the cache to ``path``: load the entries saved there (if
+        it exists), and save the cache there when the process exits
+        (or when `save` is called.)  Entries for files that have since
+        changed are never used, because their size or modification time
+        won't match.
+
+        Parameters
+        ----------
+        path : Str
+            The file to persist the cache to.
+        """
+
+        self.path = path
+
+        if os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    entries = pickle.load(f)
+            except Exception as e:
+                warn("Couldn't load the FCS metadata cache from {}: {}"
+                     .format(path, str(e)),
+                     CytoflowWarning)
+            else:
+                with self._lock:
+                    for key, metadata in entries.items():
+                        self._entries.setdefault(key, metadata)
+                    while len(self._entries) > self.maxsize:
+                        self._entries.popitem(last = False)
+
+        if not self._atexit:
+            atexit.register(self.save)
+            self._atexit = True
+
+    def save(self, path = None):
+        """
+        Save the cache to ``path`` (or to `path`, if ``path`` is ``None``.)
+        """
+
+        path = path or self.path
+        if not path:
+            return
+
+        with self._lock:
+            entries = OrderedDict(self._entries)
+
+        try:
+            with open(path + ".tmp", 'wb') as f:
+                pickle.dump(entries, f, protocol = pickle.HIGHEST_PROTOCOL)
+            os.replace(path + ".tmp", path)
+        except Exception as e:
+            warn("Couldn't save the FCS metadata cache to {}: {}"
+                 .format(path, str(e)),
+                 CytoflowWarning)
+
+
+# the process-wide cache
+fcs_metadata_cache = FCSMetadataCache()
+
+def parse_fcs_metadata(filename, data_set = 0, **options):
+    """
+    Parse the metadata from an FCS file, using (and filling) the
+    process-wide `fcs_metadata_cache`.  Takes the same parameters as
+    `FCSMetadataCache.get`.
+    """
+    return fcs_metadata_cache.get(filename, data_set = data_set, **options)
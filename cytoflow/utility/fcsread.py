@@ -0,0 +1,449 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+cytoflow.utility.fcsread
+------------------------
+
+Read the events from .fcs files.
+
+The DATA segment is memory-mapped, and each channel is decoded with a
+(strided) `numpy` view of it -- so only the channels you ask for are
+converted, and no intermediate copies of the whole segment are made.
+Handles list-mode data with ``$DATATYPE`` ``F``, ``D`` and ``I``, any
+integer ``$PnB`` (stored in whole bytes) and either ``$BYTEORD``.  Integer
+data can be masked to ``$PnR`` and decoded from log to linear using ``$PnE``.
+
+`read_fcs_text` -- read the HEADER and TEXT segments of a data set.
+
+`fcs_data_sets` -- index all the data sets in a file.
+
+`fcs_channel_names` -- the names of the channels in a data set.
+
+`read_fcs_data` -- read (some of) the channels from a data set.
+"""
+
+import os, math, warnings
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .cytoflow_errors import CytoflowError, CytoflowWarning
+
+_header_fields = ("text start", "text end",
+                  "data start", "data end",
+                  "analysis start", "analysis end")
+
+def read_fcs_text(filename, data_set = 0, encoding = "utf-8"):
+    """
+    Read the HEADER and TEXT segments of a data set in an FCS file.
+
+    Parameters
+    ----------
+    filename : Str
+        The FCS file.
+
+    data_set : Int (default = 0)
+        Which data set to read.  Data sets are found by following the
+        ``$NEXTDATA`` keyword from one data set to the next.
+
+    encoding : Str (default = "utf-8")
+        The TEXT segment's encoding.
+
+    Returns
+    -------
+    offset : Int
+        The byte offset of the data set in the file.  (The other offsets
+        are relative to this one.)
+
+    header : Dict(Str : Int)
+        The offsets of the TEXT, DATA and ANALYSIS segments.
+
+    text : Dict(Str : Str)
+        The keywords and values in the TEXT segment, as strings.
+
+    Raises
+    ------
+    CytoflowError
+        If the file can't be read, or doesn't have ``data_set``.
+    """
+
+    data_sets = fcs_data_sets(filename, encoding = encoding)
+    if data_set < 0 or data_set >= len(data_sets):
+        raise CytoflowError("FCS file {} doesn't have data set {}"
+                            .format(filename, data_set))
+        
+    return data_sets[data_set]
+
+
+def fcs_data_sets(filename, encoding = "utf-8"):
+    """
+    Index the data sets in an FCS file, following the ``$NEXTDATA`` chain
+    from one data set to the next exactly once.  The index is cached (until
+    the file changes), so calling `fcs_data_sets` or `read_fcs_text` again
+    is free.
+
+    Parameters
+    ----------
+    filename : Str
+        The FCS file.
+
+    encoding : Str (default = "utf-8")
+        The TEXT segments' encoding.
+
+    Returns
+    -------
+    List((Int, Dict, Dict))
+        One ``(offset, header, text)`` tuple per data set, as returned by
+        `read_fcs_text`.  If a data set after the first one can't be read,
+        the index stops before it.
+
+    Raises
+    ------
+    CytoflowError
+        If the file (or its first data set) can't be read.
+    """
+
+    stat = os.stat(filename)
+    return list(_read_index(os.path.realpath(filename), stat.st_size,
+                            stat.st_mtime_ns, encoding))
+
+
+# the file's size and modification time are part of the cache key, so
+# if the file changes, we read it again.
+@lru_cache(maxsize = 256)
+def _read_index(filename, size, mtime, encoding):
+    data_sets = []
+    offset = 0
+    with open(filename, "rb") as f:
+        while True:
+            try:
+                header = _read_header(f, offset, filename)
+
+                f.seek(offset + header["text start"])
+                raw = f.read(header["text end"] - header["text start"] + 1)
+                text = _parse_text(raw.decode(encoding, errors = "ignore"))
+            except (CytoflowError, IndexError, UnicodeError):
+                if not data_sets:
+                    raise
+                break
+
+            # FCS 3.0+ puts large offsets in TEXT instead of HEADER
+            if header["data start"] == 0 and header["data end"] == 0:
+                header["data start"] = int(text.get("$BEGINDATA", "0").strip() or 0)
+                header["data end"] = int(text.get("$ENDDATA", "0").strip() or 0)
+
+            data_sets.append((offset, header, text))
+
+            try:
+                nextdata = int(text.get("$NEXTDATA", "0").strip() or 0)
+            except ValueError:
+                break
+            
+            if nextdata <= 0 or offset + nextdata >= size:
+                break
+            offset += nextdata
+
+    return tuple(data_sets)
+
+
+def _read_header(f, offset, filename):
+    f.seek(offset)
+    raw = f.read(58)
+
+    if len(raw) < 58 or not raw.startswith(b"FCS"):
+        raise CytoflowError("{} doesn't look like an FCS file"
+                            .format(filename))
+
+    header = {"FCS format" : raw[0:6].decode("ascii", errors = "ignore")}
+    for i, field in enumerate(_header_fields):
+        try:
+            header[field] = int(raw[10 + i * 8 : 18 + i * 8])
+        except ValueError:
+            header[field] = 0
+
+    # some files have overlapping TEXT and DATA segments
+    if header["text end"] == header["data start"]:
+        header["text end"] -= 1
+
+    if header["text start"] == 0 or header["text end"] == 0:
+        raise CytoflowError("Can't find the TEXT segment in {}"
+                            .format(filename))
+
+    return header
+
+
+def _parse_text(raw):
+    """Parse a TEXT segment into a dict.  Delimiters are escaped by doubling."""
+
+    delimiter = raw[0]
+    raw = raw[1:]
+    if raw.endswith(delimiter):
+        raw = raw[:-1]
+    elif delimiter.strip() and raw.rstrip().endswith(delimiter):
+        raw = raw.rstrip()[:-1]
+
+    elements = []
+    for i, part in enumerate(raw.split(delimiter * 2)):
+        words = part.split(delimiter)
+        if i > 0:
+            elements[-1] += delimiter + words.pop(0)
+        elements.extend(words)
+
+    keys = [k.strip().upper() for k in elements[0::2]]
+    return dict(zip(keys, elements[1::2]))
+
+
+def fcs_channel_names(text, channel_naming = "$PnS"):
+    """
+    The names of the channels in a data set, from either ``$PnS`` or
+    ``$PnN``.  ``$PnS`` is all-or-nothing: if any channel doesn't have
+    one, every channel is named by its ``$PnN``.  If the names aren't
+    unique, use the other keyword.  (This matches ``fcsparser``.)
+
+    Parameters
+    ----------
+    text : Dict(Str : Str)
+        The TEXT segment, from `read_fcs_text`.
+
+    channel_naming : {"$PnS", "$PnN"} (default = "$PnS")
+        Which keyword to name channels with.
+
+    Returns
+    -------
+    List(Str)
+        The channel names, in the order they appear in each event.
+    """
+
+    num_pars = int(text["$PAR"])
+    names_n = [text.get("$P{}N".format(i), "") for i in range(1, num_pars + 1)]
+    names_s = [text.get("$P{}S".format(i), "") for i in range(1, num_pars + 1)]
+    if not all(names_s):
+        names_s = names_n
+
+    names, alternate = (names_s, names_n) if channel_naming == "$PnS" \
+                       else (names_n, names_s)
+
+    if len(set(names)) != len(names):
+        warnings.warn("The channel names in {} weren't unique; using {} instead"
+                      .format(channel_naming,
+                              "$PnN" if channel_naming == "$PnS" else "$PnS"),
+                      CytoflowWarning)
+        names = alternate
+
+    return names
+
+
+def read_fcs_data(filename,
+                  data_set = 0,
+                  channels = None,
+                  rows = None,
+                  channel_naming = "$PnS",
+                  mask = True,
+                  decode_log = False,
+                  dtype = "float32"):
+    """
+    Read events from an FCS file.
+
+    Parameters
+    ----------
+    filename : Str
+        The FCS file.
+
+    data_set : Int (default = 0)
+        Which data set to read.
+
+    channels : List(Str) (default = None)
+        The channels to read.  If ``None``, read them all.
+
+    rows : array of Int (default = None)
+        The (0-based) positions of the events to read, in the order to 
+        return them.  If ``None``, read them all.  Only the selected events
+        are read from the file, so reading a small sorted subset of a large
+        file is fast.
+
+    channel_naming : {"$PnS", "$PnN"} (default = "$PnS")
+        Which keyword the channels are named by.  See `fcs_channel_names`.
+
+    mask : Bool (default = True)
+        For integer data (``$DATATYPE`` ``I``), clear the bits that are
+        beyond the channel's range ``$PnR``.  Some instruments store other
+        information there.
+
+    decode_log : Bool (default = False)
+        For integer data, convert channels whose ``$PnE`` is ``f1,f2``
+        with ``f1 > 0`` from log to linear: ``10 ** (f1 * x / $PnR) * f2``.
+        (If ``f2`` is ``0``, it is taken to be ``1``.)
+
+    dtype : Str (default = "float32")
+        The ``dtype`` of the returned channels.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The events.  Each row is an event; each column is one of
+        ``channels``.
+
+    Raises
+    ------
+    CytoflowError
+        If the file can't be read or decoded, a channel isn't in the file,
+        or one of ``rows`` is out of range.
+    """
+
+    offset, header, text = read_fcs_text(filename, data_set = data_set)
+
+    if text.get("$MODE", "L").strip() != "L":
+        raise CytoflowError("Only list-mode FCS files are supported; {} is mode {}"
+                            .format(filename, text["$MODE"]))
+
+    num_events = int(text["$TOT"])
+    num_pars = int(text["$PAR"])
+    names = fcs_channel_names(text, channel_naming)
+
+    if channels is None:
+        channels = names
+
+    for channel in channels:
+        if channel not in names:
+            raise CytoflowError("Channel {} isn't in {}"
+                                .format(channel, filename))
+
+    byteord = text.get("$BYTEORD", "").strip()
+    if byteord in ("1,2,3,4", "1,2", "1", "1,2,3,4,5,6,7,8"):
+        endian = "<"
+    elif byteord in ("4,3,2,1", "2,1", "8,7,6,5,4,3,2,1"):
+        endian = ">"
+    else:
+        raise CytoflowError("Unsupported $BYTEORD {} in {}"
+                            .format(byteord, filename))
+
+    datatype = text.get("$DATATYPE", "").strip().upper()
+    if datatype not in ("F", "D", "I"):
+        raise CytoflowError("Unsupported $DATATYPE {} in {}"
+                            .format(datatype, filename))
+
+    # the layout of one event
+    widths = []
+    for i in range(1, num_pars + 1):
+        bits = int(text["$P{}B".format(i)].strip())
+        if (datatype == "F" and bits != 32) or \
+            (datatype == "D" and bits != 64):
+            raise CytoflowError("Unsupported $P{}B = {} for $DATATYPE {} in {}"
+                                .format(i, bits, datatype, filename))
+            
+        # integers that aren't a whole number of bytes (eg 10 bits) are 
+        # stored in the next largest whole number of bytes
+        widths.append(int(math.ceil(bits / 8)))
+
+    offsets = np.concatenate(([0], np.cumsum(widths)[:-1]))
+    event_size = sum(widths)
+
+    start = offset + header["data start"]
+    if num_events > 0 and \
+        header["data end"] - header["data start"] + 1 < num_events * event_size:
+        raise CytoflowError("The DATA segment in {} is too short for {} events"
+                            .format(filename, num_events))
+
+    if num_events > 0:
+        raw = np.memmap(filename,
+                        dtype = np.uint8,
+                        mode = "r",
+                        offset = start,
+                        shape = (num_events, event_size))
+    else:
+        raw = np.zeros((0, event_size), dtype = np.uint8)
+        
+    if rows is not None:
+        rows = np.asarray(rows, dtype = np.int64).ravel()
+        if len(rows) > 0 and (rows.min() < 0 or rows.max() >= num_events):
+            raise CytoflowError("Rows to read must be between 0 and {} in {}"
+                                .format(num_events - 1, filename))
+            
+        # only touch the pages that hold the selected events
+        raw = raw[rows]
+        num_events = len(rows)
+
+    # one (channel-major) block, so the DataFrame doesn't copy it
+    out = np.empty((len(channels), num_events), dtype = dtype)
+    for j, channel in enumerate(channels):
+        i = names.index(channel)
+        values = _decode(raw, offsets[i], widths[i], datatype, endian)
+
+        if datatype == "I":
+            values = _decode_int(values, text, i + 1, mask, decode_log,
+                                 filename, channel)
+
+        out[j] = values
+
+    del raw
+
+    return pd.DataFrame(out.T, columns = list(channels), copy = False)
+
+
+def _decode(raw, offset, width, datatype, endian):
+    """Decode one channel from the (num_events, event_size) bytes in ``raw``"""
+
+    # a strided view of this channel's bytes
+    column = raw[:, offset : offset + width]
+
+    if width in (1, 2, 4, 8):
+        kind = "u" if datatype == "I" else "f"
+        view = np.ndarray(shape = (raw.shape[0],),
+                          dtype = np.dtype(kind + str(width)).newbyteorder(endian),
+                          buffer = raw,
+                          offset = offset,
+                          strides = (raw.strides[0],)) \
+               if raw.shape[0] > 0 else np.zeros(0, dtype = kind + str(width))
+        return view.astype(view.dtype.newbyteorder("="))
+
+    # odd integer widths (eg 24 bits): assemble the bytes ourselves
+    values = np.zeros(raw.shape[0], dtype = np.uint64)
+    byte_order = range(width) if endian == ">" else reversed(range(width))
+    for b in byte_order:
+        values <<= np.uint64(8)
+        values |= column[:, b]
+    return values
+
+
+def _decode_int(values, text, n, mask, decode_log, filename, channel):
+    data_range = float(text.get("$P{}R".format(n), "0").strip() or 0)
+
+    if mask and data_range > 0:
+        bits = int(math.ceil(math.log2(data_range)))
+        if bits < values.dtype.itemsize * 8:
+            values &= values.dtype.type((1 << bits) - 1)
+
+    if decode_log and data_range > 0:
+        try:
+            f1, f2 = [float(x) for x in text.get("$P{}E".format(n), "0,0").split(",")]
+        except ValueError:
+            f1, f2 = 0.0, 0.0
+
+        if f1 > 0.0 and f2 == 0.0:
+            warnings.warn('Invalid $PnE = {},{} for channel {} in {}, changing it to {},1.0'
+                          .format(f1, f2, channel, filename, f1),
+                          CytoflowWarning)
+            f2 = 1.0
+
+        if f1 > 0.0 and f2 > 0.0:
+            values = 10 ** (f1 * values.astype("float64") / data_range) * f2
+
+    return values
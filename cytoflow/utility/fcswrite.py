@@ -28,14 +28,20 @@ Adapted from https://github.com/ZELLMECHANIK-DRESDEN/fcswrite
 """
 from __future__ import print_function, unicode_literals, division
 
+import os
+
 import numpy as np
-import struct
+
+# write (and convert) this many events at a time
+_CHUNK_EVENTS = 2 ** 16
 
 def write_fcs(filename, chn_names, chn_ranges, data,
               compat_chn_names=True,
               compat_percent=True,
               compat_negative=True,
               compat_copy=True,
+              datatype="F",
+              int_bits=32,
               verbose=0,
               **kws):
     """
@@ -53,8 +59,12 @@ def write_fcs(filename, chn_names, chn_ranges, data,
     chn_ranges : dictionary
         Keys: channel names.  Values: ranges
         
-    data : 2d ndarray of shape (N,C)
-        The numpy array data to store as .fcs file format. 
+    data : 2d ndarray of shape (N,C), or an iterable of them
+        The numpy array data to store as .fcs file format.  If ``data`` is
+        an iterable of 2d arrays (or `pandas.DataFrame`), they are written
+        one after another, so the events never have to all be in memory 
+        at once.  (``compat_percent`` and ``compat_negative`` need all the 
+        events, so they must be ``False``.)
         
     compat_chn_names : bool
         Compatibility mode for 3rd party flow analysis software:
@@ -73,6 +83,15 @@ def write_fcs(filename, chn_names, chn_ranges, data,
     compat_copy : bool
         Do not override the input array ``data`` when modified in
         compatibility mode.
+        
+    datatype : {"F", "D", "I"}
+        The ``$DATATYPE`` to write: 32-bit floats (``F``), 64-bit floats 
+        (``D``), or unsigned integers (``I``).  Integers are rounded, and
+        clipped to between 0 and the largest value that fits in 
+        ``int_bits`` bits.
+        
+    int_bits : {8, 16, 32, 64}
+        How many bits to write each integer in, if ``datatype`` is ``I``.
 
     kwargs : Str
         Additional keyword arguments are written as keyword/value pairs in
@@ -83,11 +102,31 @@ def write_fcs(filename, chn_names, chn_ranges, data,
     These commonly used unicode characters are replaced: "µ", "²"
 
     """
-    if not isinstance(data, np.ndarray):
-        data = np.array(data)
     
-    msg="length of `chn_names` must match length of 2nd axis of `data`"
-    assert len(chn_names) == data.shape[1], msg
+    datatype = datatype.upper()
+    if datatype == "F":
+        dtype, bits = np.dtype('>f4'), 32
+    elif datatype == "D":
+        dtype, bits = np.dtype('>f8'), 64
+    elif datatype == "I":
+        if int_bits not in (8, 16, 32, 64):
+            raise ValueError("int_bits must be 8, 16, 32 or 64")
+        dtype, bits = np.dtype('>u{}'.format(int_bits // 8)), int_bits
+    else:
+        raise ValueError("datatype must be 'F', 'D' or 'I'")
+    
+    if hasattr(data, 'shape') or isinstance(data, (list, tuple)):
+        data = np.asarray(data)
+        chunks = None
+    else:
+        chunks = data
+        if compat_percent or compat_negative:
+            raise ValueError("compat_percent and compat_negative need all the "
+                             "data at once, so they can't be used with chunks")
+    
+    if chunks is None:
+        msg="length of `chn_names` must match length of 2nd axis of `data`"
+        assert len(chn_names) == data.shape[1], msg
 
     rpl = [["µ", "u"],
            ["²", "2"],
@@ -128,64 +167,100 @@ def write_fcs(filename, chn_names, chn_ranges, data,
                 data = data.copy()
             for ch in toflip:
                 data[:,ch] *= -1
+                
+    if chunks is None:
+        chunks = (data[start : start + _CHUNK_EVENTS]
+                  for start in range(0, data.shape[0], _CHUNK_EVENTS))
         
-
-    # DATA segment
-    data1 = data.flatten().tolist()
-    DATA = struct.pack('>%sf' % len(data1), *data1)
-
-    # TEXT segment
     # fix length of TEXT to 8 kilo bytes
     ltxt = 8192
-    ver='FCS3.0'
-    textfirst= '{0: >8}'.format(256)
-    datafirst= '{0: >8}'.format(256+ltxt)
-    datalast = '{0: >8}'.format(256+ltxt+len(DATA)-1)
-    anafirst = '{0: >8}'.format(0)
-    analast  = '{0: >8}'.format(0)
-    # use little endian
-    #byteord = '1,2,3,4'
-    # use big endian
-    byteord = '4,3,2,1'
-    TEXT ='/$BEGINANALYSIS/0/$ENDANALYSIS/0'
-    TEXT+='/$BEGINSTEXT/0/$ENDSTEXT/0'
-    TEXT+='/$BEGINDATA/{0}/$ENDDATA/{1}'.format(256+ltxt, 256+ltxt+len(DATA)-1)
-    TEXT+='/$BYTEORD/{0}/$DATATYPE/F'.format(byteord)
-    TEXT+='/$MODE/L/$NEXTDATA/0/$TOT/{0}'.format(data.shape[0])
-    TEXT+='/$PAR/{0}'.format(data.shape[1])
-
-    for i in range(data.shape[1]):
-        pnrange = chn_ranges[chn_names[i]]
-        # TODO:
-        # - Set log/lin 
-        TEXT+='/$P{0}B/32/$P{0}E/0,0/$P{0}N/{1}/$P{0}R/{2}/$P{0}D/Linear'.format(i+1, chn_names[i], pnrange)
-
-    for kw, val in kws.items():
-        kw = kw.replace('/', '//')
-        val = val.replace('/', '//')
-        TEXT+='/{0}/{1}'.format(kw, val)
-
-    TEXT += '/'
     
-    if len(TEXT) > ltxt:
-        raise RuntimeError("TEXT segment is too long; specify fewer keywords")
-
-    textlast = '{0: >8}'.format(len(TEXT)+256-1)
-    TEXT = TEXT.ljust(ltxt, ' ')
-
-    # HEADER segment
-    HEADER = '{0: <256}'.format(ver+'    '+
-                                textfirst +
-                                textlast  +
-                                datafirst +
-                                datalast  +
-                                anafirst  +
-                                analast)
-
-    # Write data
-    with open(filename, "wb") as fd:
-        fd.write(HEADER.encode("ascii"))
-        fd.write(TEXT.encode("ascii"))
-        fd.write(DATA)
-        fd.write(b'00000000')
+    if datatype == "I":
+        # readers mask integers to the bits in $PnR, so values must be 
+        # less than $PnR (as well as fit in $PnB)
+        int_max = np.array([min(int(float(chn_ranges[name])), 2 ** bits) - 1 
+                            for name in chn_names])
 
+    try:
+        with open(filename, "wb") as fd:
+            # we don't know how long the DATA segment is until we've written it,
+            # so write the HEADER and TEXT segments last.
+            fd.write(b' ' * (256 + ltxt))
+        
+            # DATA segment
+            num_events = 0
+            for chunk in chunks:
+                chunk = np.asarray(chunk)
+                if chunk.ndim != 2 or chunk.shape[1] != len(chn_names):
+                    raise ValueError("length of `chn_names` must match length of "
+                                     "2nd axis of each chunk of `data`")
+                
+                if datatype == "I":
+                    chunk = np.clip(np.rint(chunk), 0, int_max)
+                
+                fd.write(np.ascontiguousarray(chunk, dtype = dtype).tobytes())
+                num_events += chunk.shape[0]
+            
+            data_len = num_events * len(chn_names) * bits // 8
+            fd.write(b'00000000')
+    
+            # TEXT segment
+            ver='FCS3.0'
+            textfirst= '{0: >8}'.format(256)
+            # the HEADER only has room for offsets up to 99,999,999; past
+            # that, FCS 3.0 says to write 0 and use $BEGINDATA / $ENDDATA
+            if 256+ltxt+data_len-1 <= 99999999:
+                datafirst= '{0: >8}'.format(256+ltxt)
+                datalast = '{0: >8}'.format(256+ltxt+data_len-1)
+            else:
+                datafirst= '{0: >8}'.format(0)
+                datalast = '{0: >8}'.format(0)
+            anafirst = '{0: >8}'.format(0)
+            analast  = '{0: >8}'.format(0)
+            # use little endian
+            #byteord = '1,2,3,4'
+            # use big endian
+            byteord = '4,3,2,1'
+            TEXT ='/$BEGINANALYSIS/0/$ENDANALYSIS/0'
+            TEXT+='/$BEGINSTEXT/0/$ENDSTEXT/0'
+            TEXT+='/$BEGINDATA/{0}/$ENDDATA/{1}'.format(256+ltxt, 256+ltxt+data_len-1)
+            TEXT+='/$BYTEORD/{0}/$DATATYPE/{1}'.format(byteord, datatype)
+            TEXT+='/$MODE/L/$NEXTDATA/0/$TOT/{0}'.format(num_events)
+            TEXT+='/$PAR/{0}'.format(len(chn_names))
+    
+            for i in range(len(chn_names)):
+                pnrange = chn_ranges[chn_names[i]]
+                # TODO:
+                # - Set log/lin 
+                TEXT+='/$P{0}B/{3}/$P{0}E/0,0/$P{0}N/{1}/$P{0}R/{2}/$P{0}D/Linear'.format(i+1, chn_names[i], pnrange, bits)
+    
+            for kw, val in kws.items():
+                kw = kw.replace('/', '//')
+                val = val.replace('/', '//')
+                TEXT+='/{0}/{1}'.format(kw, val)
+    
+            TEXT += '/'
+        
+            if len(TEXT) > ltxt:
+                raise RuntimeError("TEXT segment is too long; specify fewer keywords")
+    
+            textlast = '{0: >8}'.format(len(TEXT)+256-1)
+            TEXT = TEXT.ljust(ltxt, ' ')
+    
+            # HEADER segment
+            HEADER = '{0: <256}'.format(ver+'    '+
+                                        textfirst +
+                                        textlast  +
+                                        datafirst +
+                                        datalast  +
+                                        anafirst  +
+                                        analast)
+    
+            fd.seek(0)
+            fd.write(HEADER.encode("ascii"))
+            fd.write(TEXT.encode("ascii"))
+    except BaseException:
+        # don't leave half a file behind
+        if os.path.exists(filename):
+            os.remove(filename)
+        raise
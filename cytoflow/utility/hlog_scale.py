@@ -38,6 +38,8 @@ tics are along a plot axis
 `hlog`, `hlog_inv` -- the actual functions that perform the scale and inverse
 """
 
+import functools
+
 from traits.api import (HasTraits, Float, Property, Instance, Str,
                         Undefined, provides, Constant,
                         Tuple, Array)
@@ -108,7 +110,7 @@ class HlogScale(ScaleMixin):
         f = _make_hlog_numeric(self.b, 1.0, np.log10(self.range))
 
         if isinstance(data, pd.Series):            
-            return data.apply(f)
+            return pd.Series(f(data.values), index = data.index, name = data.name)
         elif isinstance(data, np.ndarray):
             return f(data)
         elif isinstance(data, (int, float)):
@@ -129,10 +131,11 @@ class HlogScale(ScaleMixin):
         f_inv = lambda y, b = self.b, d = np.log10(self.range): hlog_inv(y, b, 1.0, d)
         
         if isinstance(data, pd.Series):            
-            return data.apply(f_inv)
+            return pd.Series(f_inv(data.values.astype(np.float64)), 
+                             index = data.index, 
+                             name = data.name)
         elif isinstance(data, np.ndarray):
-            inverse = np.vectorize(f_inv)
-            return inverse(data)
+            return f_inv(data.astype(np.float64))
         elif isinstance(data, float):
             return f_inv(data)
         else:
@@ -216,6 +219,10 @@ class HlogScale(ScaleMixin):
         
         return {"b" : self.b,
                 "range" : self.range}
+        
+    def transform_params(self):
+        """The parameters that determine how data is transformed"""
+        return (self.b, self.range)
     
 register_scale(HlogScale)
         
@@ -289,7 +296,7 @@ class MatplotlibHlogScale(HasTraits, matplotlib.scale.ScaleBase):
             f = _make_hlog_numeric(self.b, 1.0, np.log10(self.range))
 
             if isinstance(values, pd.Series):            
-                return values.apply(f)
+                return pd.Series(f(values.values), index = values.index, name = values.name)
             elif isinstance(values, np.ndarray):
                 return f(values)
             elif isinstance(values, float):
@@ -301,7 +308,7 @@ class MatplotlibHlogScale(HasTraits, matplotlib.scale.ScaleBase):
         def inverted(self):
             return MatplotlibHlogScale.InvertedHlogTransform(b = self.b, range = self.range)
         
-    class InvertedLogicleTransform(HasTraits, transforms.Transform):
+    class InvertedHlogTransform(HasTraits, transforms.Transform):
         """
         A class that implements the inverse transformation
         """
@@ -324,14 +331,15 @@ class MatplotlibHlogScale(HasTraits, matplotlib.scale.ScaleBase):
             f_inv = lambda y, b = self.b, d = np.log10(self.range): hlog_inv(y, b, 1.0, d)
             
             if isinstance(values, pd.Series):            
-                return values.apply(f_inv)
+                return pd.Series(f_inv(values.values.astype(np.float64)), 
+                                 index = values.index, 
+                                 name = values.name)
             elif isinstance(values, np.ndarray):
-                inverse = np.vectorize(f_inv)
-                return inverse(values)
+                return f_inv(values.astype(np.float64))
             elif isinstance(values, float):
                 return f_inv(values)
             else:
-                raise CytoflowError("Unknown data type in MatplotlibHlogScale.InvertedLogicleTransform.transform_non_affine")
+                raise CytoflowError("Unknown data type in MatplotlibHlogScale.InvertedHlogTransform.transform_non_affine")
         
         
         def inverted(self):
@@ -445,8 +453,6 @@ matplotlib.scale.register_scale(MatplotlibHlogScale)
 # http://gorelab.bitbucket.org/flowcytometrytools/
 # thanks, Eugene!
 
-import scipy.optimize
-
 def hlog_inv(y, b, r, d):
     '''
     Inverse of base 10 hyperlog transform.
@@ -459,14 +465,120 @@ def hlog_inv(y, b, r, d):
         s = 1
     return s*10**(s*aux) + b*aux - s
 
+@functools.lru_cache(maxsize = 8)
 def _make_hlog_numeric(b, r, d):
     '''
     Return a function that numerically computes the hlog transformation for given parameter values.
     '''
-    hlog_obj = lambda y, x, b, r, d: hlog_inv(y, b, r, d) - x
-    find_inv = np.vectorize(lambda x: scipy.optimize.brentq(hlog_obj, -2*r, 2*r, 
-                                        args=(x, b, r, d)))
-    return find_inv 
+    return _HlogTable(b, r, d)
+
+
+class _HlogTable(object):
+    '''
+    A fast, vectorized hlog transform for one set of parameters.
+    
+    ``hlog_inv`` is odd and monotone, so ``hlog(x) = sign(x) * r * u``, where
+    ``g(u) = 10 ** (d * u) + b * d * u - 1 = |x|``.  We tabulate ``g`` on a 
+    dense grid of ``u`` (up to a decade past ``10 ** d``) and interpolate 
+    linearly between the nodes.  For each interval, the interpolation error is
+    at most ``h ** 2 / 8 * max|u''(x)|``, where ``h`` is the interval's width
+    in ``x``; values that fall in an interval where that bound is larger than
+    ``tol``, or beyond the end of the table, are refined with Newton's method
+    instead.
+    
+    Rather than binary-searching the table for each value, we find its 
+    interval from a second, uniform table over ``w = log10(1 + |x| / k)`` --
+    which, with the right ``k``, is nearly proportional to ``u`` -- and step
+    forward to the right interval from there.
+    '''
+    
+    # the number of intervals in the table
+    size = 2 ** 16
+    
+    # the largest error (in units of r) we accept from interpolation
+    tol = 1e-9
+    
+    # when to stop refining with Newton's method
+    newton_tol = 1e-13
+    newton_iter = 100
+    
+    def __init__(self, b, r, d):
+        self.b = float(b)
+        self.r = float(r)
+        self.d = float(d)
+        
+        b, d = self.b, self.d
+        
+        u = np.linspace(0.0, 1.0 + 1.0 / d, self.size + 1)
+        e = 10 ** (d * u)
+        x = e + b * d * u - 1
+        
+        # u''(x) = -g''(u) / g'(u) ** 3 = -c2 * e / (c1 * e + c0) ** 3, whose
+        # magnitude peaks at e = c0 / (2 * c1)
+        c0, c1, c2 = b * d, d * np.log(10), (d * np.log(10)) ** 2
+        e_peak = np.clip(c0 / (2 * c1), e[:-1], e[1:])
+        bound = np.diff(x) ** 2 / 8 * c2 * e_peak / (c1 * e_peak + c0) ** 3
+        
+        self._u = u
+        self._x = x
+        self._exact = bound <= self.tol
+        
+        # the index table: the first interval of each cell in w (less one, 
+        # in case of round-off)
+        self._k = (np.log(10) + max(b, 0.0)) / np.log(10)
+        self._dw = np.log10(1 + x[-1] / self._k) / (2 * self.size)
+        w = np.arange(2 * self.size + 1) * self._dw
+        start = np.searchsorted(x, self._k * (10 ** w - 1), side = 'right') - 2
+        self._start = np.clip(start, 0, self.size - 1)
+        
+    def __call__(self, x):
+        x = np.asarray(x, dtype = np.float64)
+        ax = np.abs(x).ravel()
+        
+        w = np.log10(1 + ax / self._k)
+        cell = np.minimum(w / self._dw, len(self._start) - 1)
+        cell[~np.isfinite(cell)] = len(self._start) - 1
+        i = self._start[cell.astype(np.intp)]
+        
+        while True:
+            step = (i < self.size - 1) & (self._x[np.minimum(i + 1, self.size)] <= ax)
+            if not step.any():
+                break
+            i += step
+            
+        x_lo = self._x[i]
+        u = self._u[i] + (ax - x_lo) / (self._x[i + 1] - x_lo) * (self._u[1] - self._u[0])
+        
+        inside = ax < self._x[-1]
+        refine = np.isfinite(ax) & ~(inside & self._exact[i])
+        
+        if refine.any():
+            ax_r = ax[refine]
+            
+            # past the end of the table, start from (just above) the log
+            u_r = np.where(inside[refine], u[refine], np.log10(ax_r + 1) / self.d)
+            u[refine] = self._newton(ax_r, u_r)
+            
+        return (np.copysign(u, x.ravel()) * self.r).reshape(x.shape)
+    
+    def _newton(self, ax, u):
+        '''
+        Solve ``g(u) = ax`` from ``u``.  ``g`` is convex and increasing, so 
+        after the first step Newton's method converges from above.
+        '''
+        b, d = self.b, self.d
+        active = np.arange(len(ax))
+        
+        for _ in range(self.newton_iter):
+            ua = u[active]
+            e = 10 ** (d * ua)
+            step = (e + b * d * ua - 1 - ax[active]) / (d * np.log(10) * e + b * d)
+            u[active] = np.maximum(ua - step, 0.0)
+            active = active[np.abs(step) > self.newton_tol]
+            if len(active) == 0:
+                break
+            
+        return u
 
 def hlog(x, b, r, d):
     '''
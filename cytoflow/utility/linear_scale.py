@@ -96,6 +96,9 @@ class LinearScale(ScaleMixin):
     
     def get_mpl_params(self, ax):
         return dict()
+    
+    def transform_params(self):
+        return ()
         
             
 
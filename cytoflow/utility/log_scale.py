@@ -61,6 +61,10 @@ class LogScale(ScaleMixin):
         `matplotlib.scale.ScaleBase`
         """
         return {"nonpositive" : self.mode}
+    
+    def transform_params(self):
+        """The parameters that determine how data is transformed"""
+        return (self.mode, self.threshold)
         
     def _set_threshold(self, threshold):
         self._channel_threshold = threshold
@@ -1,6 +1,11 @@
 #include "logicle.h"
 #include <memory.h>
 #include <cmath>
+#include <algorithm>
+#include <limits>
+#include <stdexcept>
+#include <thread>
+#include <vector>
 
 const int FastLogicle::DEFAULT_BINS = 1 << 12;
 
@@ -120,3 +125,105 @@ double FastLogicle::inverse (int index) const
 
     return p->lookup[index];
 }
+
+// the array entry points transform each of the n values into out (which may
+// be the same buffer), splitting the work across up to "threads" threads.
+// they don't use the Python API, so they can be called without the GIL.
+// values that can't be transformed are set to NaN, and the first one is
+// reported with an IllegalArgument once all the threads are done.
+
+template <typename F>
+static bool transformArray (F transform, const double * values, long n,
+		double * out, int threads, double & bad)
+{
+	const long MIN_CHUNK = 1 << 16;
+
+	if (threads > n / MIN_CHUNK)
+		threads = (int)(n / MIN_CHUNK);
+	if (threads < 1)
+		threads = 1;
+
+	long chunk = (n + threads - 1) / threads;
+	std::vector<char> failed(threads, false);
+	std::vector<double> first(threads, 0);
+
+	auto work = [&] (int t)
+	{
+		long end = std::min(n, (t + 1) * chunk);
+		for (long i = t * chunk; i < end; ++i)
+		{
+			double value = values[i];
+			if (!transform(value, out[i]))
+			{
+				out[i] = std::numeric_limits<double>::quiet_NaN();
+				if (!failed[t])
+				{
+					failed[t] = true;
+					first[t] = value;
+				}
+			}
+		}
+	};
+
+	std::vector<std::thread> pool;
+	for (int t = 1; t < threads; ++t)
+		pool.emplace_back(work, t);
+	work(0);
+	for (auto & thread : pool)
+		thread.join();
+
+	for (int t = 0; t < threads; ++t)
+		if (failed[t])
+		{
+			bad = first[t];
+			return false;
+		}
+
+	return true;
+}
+
+void FastLogicle::scaleArray (const double * values, long n, double * out, long m, int threads) const
+{
+	if (n != m)
+		throw std::length_error("Input and output arrays must be the same length");
+
+	double bad;
+	bool ok = transformArray([this] (double value, double & result)
+		{
+			try
+			{
+				result = scale(value);
+				return true;
+			}
+			catch (IllegalArgument &)
+			{
+				return false;
+			}
+		}, values, n, out, threads, bad);
+
+	if (!ok)
+		throw IllegalArgument(bad);
+}
+
+void FastLogicle::inverseArray (const double * values, long n, double * out, long m, int threads) const
+{
+	if (n != m)
+		throw std::length_error("Input and output arrays must be the same length");
+
+	double bad;
+	bool ok = transformArray([this] (double scale, double & result)
+		{
+			// the same as inverse(double), without the exception
+			double x = scale * p->bins;
+			if (!(x >= 0 && x < p->bins))
+				return false;
+
+			int index = (int)floor(x);
+			double delta = x - index;
+			result = (1 - delta) * p->lookup[index] + delta * p->lookup[index + 1];
+			return true;
+		}, values, n, out, threads, bad);
+
+	if (!ok)
+		throw IllegalArgument(bad);
+}
@@ -34,6 +34,69 @@ except:
    }
 }
 
+// the array entry points take any object that supports the buffer protocol
+// and holds a C-contiguous array of doubles (ie, a float64 numpy array), and
+// release the GIL while they work.
+
+%typemap(in) (const double * values, long n) (Py_buffer view) {
+   if (PyObject_GetBuffer($input, &view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) != 0) {
+      SWIG_fail;
+   }
+   if (view.itemsize != sizeof(double) || strcmp(view.format, "d") != 0) {
+      PyBuffer_Release(&view);
+      PyErr_SetString(PyExc_TypeError, "Expected a contiguous buffer of doubles");
+      SWIG_fail;
+   }
+   $1 = (double *) view.buf;
+   $2 = (long) (view.len / sizeof(double));
+}
+
+%typemap(freearg) (const double * values, long n) {
+   if ($1) {
+      PyBuffer_Release(&view$argnum);
+   }
+}
+
+%typemap(in) (double * out, long m) (Py_buffer view) {
+   if (PyObject_GetBuffer($input, &view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT | PyBUF_WRITABLE) != 0) {
+      SWIG_fail;
+   }
+   if (view.itemsize != sizeof(double) || strcmp(view.format, "d") != 0) {
+      PyBuffer_Release(&view);
+      PyErr_SetString(PyExc_TypeError, "Expected a writable, contiguous buffer of doubles");
+      SWIG_fail;
+   }
+   $1 = (double *) view.buf;
+   $2 = (long) (view.len / sizeof(double));
+}
+
+%typemap(freearg) (double * out, long m) {
+   if ($1) {
+      PyBuffer_Release(&view$argnum);
+   }
+}
+
+%define ARRAY_EXCEPTION(method)
+%exception method {
+   PyThreadState * _save = PyEval_SaveThread();
+   try {
+      $action
+   } catch (Logicle::IllegalArgument &e) {
+      PyEval_RestoreThread(_save);
+      PyErr_SetString(PyExc_ValueError, const_cast<char*>(e.message()));
+      SWIG_fail;
+   } catch (std::exception &e) {
+      PyEval_RestoreThread(_save);
+      PyErr_SetString(PyExc_ValueError, e.what());
+      SWIG_fail;
+   }
+   PyEval_RestoreThread(_save);
+}
+%enddef
+
+ARRAY_EXCEPTION(scaleArray)
+ARRAY_EXCEPTION(inverseArray)
+
 class Logicle
 {
 public:
@@ -160,6 +223,9 @@ public:
         int intScale (double value) const;
         double inverse (int scale) const;
 
+        void scaleArray (const double * values, long n, double * out, long m, int threads) const;
+        void inverseArray (const double * values, long n, double * out, long m, int threads) const;
+
 private:
         void initialize (int bins);
 
@@ -181,6 +181,9 @@ public:
         int intScale (double value) const;
         double inverse (int scale) const;
 
+        void scaleArray (const double * values, long n, double * out, long m, int threads) const;
+        void inverseArray (const double * values, long n, double * out, long m, int threads) const;
+
 private:
         void initialize (int bins);
 
@@ -35,7 +35,7 @@ tics are along a plot axis
 
 """
 
-import math, sys
+import math, sys, os
 from warnings import warn
 
 from traits.api import (HasStrictTraits, HasTraits, Float, Property, Instance, Str,
@@ -161,12 +161,12 @@ class LogicleScale(HasStrictTraits):
             logicle_min = self._logicle.inverse(0.0)
             logicle_max = self._logicle.inverse(1.0 - sys.float_info.epsilon)
             if isinstance(data, pd.Series):            
-                data = data.clip(logicle_min, logicle_max)
-                return data.apply(self._logicle.scale)
+                return pd.Series(_scale_array(self._logicle, data.values, 
+                                              logicle_min, logicle_max),
+                                 index = data.index,
+                                 name = data.name)
             elif isinstance(data, np.ndarray):
-                data = np.clip(data, logicle_min, logicle_max)
-                scale = np.vectorize(self._logicle.scale)
-                return scale(data)
+                return _scale_array(self._logicle, data, logicle_min, logicle_max)
             elif isinstance(data, float):
                 data = max(min(data, logicle_max), logicle_min)
                 return self._logicle.scale(data)
@@ -180,7 +180,7 @@ class LogicleScale(HasStrictTraits):
                 except TypeError as e:
                     raise CytoflowError("Unknown data type") from e
         except ValueError as e:
-            raise CytoflowError(e.strerror)
+            raise CytoflowError(str(e))
 
         
     def inverse(self, data):
@@ -189,12 +189,11 @@ class LogicleScale(HasStrictTraits):
         """
         try:
             if isinstance(data, pd.Series):            
-                data = data.clip(0, 1.0 - sys.float_info.epsilon)
-                return data.apply(self._logicle.inverse)
+                return pd.Series(_inverse_array(self._logicle, data.values),
+                                 index = data.index,
+                                 name = data.name)
             elif isinstance(data, np.ndarray):
-                data = np.clip(data, 0, 1.0 - sys.float_info.epsilon)
-                inverse = np.vectorize(self._logicle.inverse)
-                return inverse(data)
+                return _inverse_array(self._logicle, data)
             elif isinstance(data, float):
                 data = max(min(data, 1.0 - sys.float_info.epsilon), 0.0)
                 return self._logicle.inverse(data)
@@ -363,7 +362,36 @@ class LogicleScale(HasStrictTraits):
     def get_mpl_params(self, ax):
         return {"logicle" : self._logicle} 
     
+    def transform_params(self):
+        """The parameters that determine how data is transformed"""
+        return (self._T, self.W, self.M, self.A)
+    
 register_scale(LogicleScale)
+
+
+# big arrays are scaled in several threads, each with at least this many values
+_MIN_VALUES_PER_THREAD = 2 ** 18
+
+def _scale_array(logicle, data, logicle_min, logicle_max):
+    """
+    Clip ``data`` to the scale's domain and transform it with the array entry
+    point of ``logicle``, which does the whole array in C++ without holding 
+    the GIL.  Returns a new float64 array with the same shape as ``data``.
+    """
+    values = np.array(data, dtype = np.float64, order = 'C')
+    np.clip(values, logicle_min, logicle_max, out = values)
+    logicle.scaleArray(values, values, _threads(values.size))
+    return values
+
+def _inverse_array(logicle, data):
+    """The inverse of `_scale_array`"""
+    values = np.array(data, dtype = np.float64, order = 'C')
+    np.clip(values, 0, 1.0 - sys.float_info.epsilon, out = values)
+    logicle.inverseArray(values, values, _threads(values.size))
+    return values
+
+def _threads(n):
+    return max(1, min(os.cpu_count() or 1, n // _MIN_VALUES_PER_THREAD))
         
 class MatplotlibLogicleScale(HasTraits, matplotlib.scale.ScaleBase):   
     """
@@ -431,12 +459,12 @@ class MatplotlibLogicleScale(HasTraits, matplotlib.scale.ScaleBase):
                 logicle_min = self.logicle.inverse(0.0)
                 logicle_max = self.logicle.inverse(1.0 - sys.float_info.epsilon)
                 if isinstance(values, pd.Series):            
-                    values = values.clip(logicle_min, logicle_max)
-                    return values.apply(self.logicle.scale)
+                    return pd.Series(_scale_array(self.logicle, values.values,
+                                                  logicle_min, logicle_max),
+                                     index = values.index,
+                                     name = values.name)
                 elif isinstance(values, np.ndarray):
-                    values = np.clip(values, logicle_min, logicle_max)
-                    scale = np.vectorize(self.logicle.scale)
-                    return scale(values)
+                    return _scale_array(self.logicle, values, logicle_min, logicle_max)
                 elif isinstance(values, float):
                     data = max(min(values, logicle_max), logicle_min)
                     return self.logicle.scale(data)
@@ -470,12 +498,11 @@ class MatplotlibLogicleScale(HasTraits, matplotlib.scale.ScaleBase):
         def transform_non_affine(self, values):
             try:
                 if isinstance(values, pd.Series):            
-                    values = values.clip(0, 1.0 - sys.float_info.epsilon)
-                    return values.apply(self.logicle.inverse)
+                    return pd.Series(_inverse_array(self.logicle, values.values),
+                                     index = values.index,
+                                     name = values.name)
                 elif isinstance(values, np.ndarray):
-                    values = np.clip(values, 0, 1.0 - sys.float_info.epsilon)
-                    inverse = np.vectorize(self.logicle.inverse)
-                    return inverse(values)
+                    return _inverse_array(self.logicle, values)
                 elif isinstance(values, float):
                     values = max(min(values, 1.0 - sys.float_info.epsilon), 0.0)
                     return self.logicle.inverse(values)
@@ -115,6 +115,14 @@ class IScale(Interface):
         scale a color bar.
         """
         
+    def transform_params(self):
+        """
+        Return a (hashable) tuple of the parameters that determine how this 
+        scale transforms data.  Two scales of the same class with the same
+        parameters must transform data the same way; 
+        `Experiment.scaled` uses this to memoize scaled columns.
+        """
+        
         
 class ScaleMixin(HasStrictTraits):
     """
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+cytoflow.utility.subset_expression
+----------------------------------
+
+A small compiler for the subset expressions that `cytoflow` (and especially
+the GUI) generates, such as ``(Dox == 10.0) and (Well == "A" or Well == "B")``.
+Compiled expressions evaluate directly to `numpy` boolean masks, comparing
+the codes of categorical conditions instead of their values.
+
+`compile_subset` -- compile a subset expression, or return ``None`` if it
+uses anything besides comparisons, ``in``, ``and``, ``or`` and ``not``.
+
+`SubsetExpression` -- a compiled subset expression.
+
+`UnsupportedSubset` -- raised when a compiled expression can't be evaluated
+the same way `pandas.eval` would evaluate it.
+"""
+
+import ast, operator
+from functools import lru_cache
+from numbers import Number
+
+import numpy as np
+from pandas.api.types import is_categorical_dtype
+
+_compare_ops = {ast.Eq : operator.eq,
+                ast.NotEq : operator.ne,
+                ast.Lt : operator.lt,
+                ast.LtE : operator.le,
+                ast.Gt : operator.gt,
+                ast.GtE : operator.ge}
+
+# if we swap the sides of a comparison, what's the new operator?
+_flipped_ops = {ast.Eq : ast.Eq,
+                ast.NotEq : ast.NotEq,
+                ast.Lt : ast.Gt,
+                ast.LtE : ast.GtE,
+                ast.Gt : ast.Lt,
+                ast.GtE : ast.LtE}
+
+class UnsupportedSubset(Exception):
+    """
+    Raised when a compiled subset expression can't be evaluated the same way
+    `pandas.eval` would evaluate it -- for example, an ordered comparison on
+    an unordered categorical.  Callers should fall back to `pandas.eval`.
+    """
+    pass
+
+
+class SubsetExpression(object):
+    """
+    A compiled subset expression.
+
+    Attributes
+    ----------
+    expr : Str
+        The expression that was compiled.
+
+    names : Set(Str)
+        The (sanitized) column names that the expression uses.
+    """
+
+    def __init__(self, expr, root, names):
+        self.expr = expr
+        self.names = names
+        self._root = root
+
+    def evaluate(self, lookup, length):
+        """
+        Evaluate the expression.
+
+        Parameters
+        ----------
+        lookup : Callable
+            Called with a (sanitized) column name, returns that column as a
+            `pandas.Series`.  Should raise `KeyError` if there's no such column.
+
+        length : Int
+            The number of events.
+
+        Returns
+        -------
+        numpy.ndarray
+            A boolean mask, ``True`` where the expression is true.
+
+        Raises
+        ------
+        UnsupportedSubset
+            If the expression can't be evaluated exactly the way `pandas.eval`
+            would evaluate it.
+        """
+        mask = self._root(lookup)
+        return np.broadcast_to(mask, (length,))
+
+
+@lru_cache(maxsize = 256)
+def compile_subset(expr):
+    """
+    Compile a subset expression.  The expression may contain comparisons
+    (``==``, ``!=``, ``<``, ``<=``, ``>``, ``>=``, including chained
+    comparisons like ``1 < x <= 3``) between a column name and a number,
+    string or boolean; ``in`` and ``not in`` with a list of literals;
+    ``and``, ``or`` and ``not``; and ``True`` and ``False``.
+
+    Compiled expressions are cached, so compiling the same expression again
+    is free.
+
+    Parameters
+    ----------
+    expr : Str
+        The expression to compile.
+
+    Returns
+    -------
+    SubsetExpression or None
+        The compiled expression, or ``None`` if ``expr`` uses anything else.
+    """
+
+    try:
+        tree = ast.parse(expr.strip(), mode = 'eval')
+    except (SyntaxError, ValueError):
+        return None
+
+    names = set()
+
+    try:
+        root = _compile_node(tree.body, names)
+    except UnsupportedSubset:
+        return None
+
+    return SubsetExpression(expr, root, names)
+
+
+def _compile_node(node, names):
+
+    if isinstance(node, ast.BoolOp):
+        parts = [_compile_node(v, names) for v in node.values]
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+
+        def bool_op(lookup):
+            mask = parts[0](lookup)
+            for part in parts[1:]:
+                mask = combine(mask, part(lookup))
+            return mask
+
+        return bool_op
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        operand = _compile_node(node.operand, names)
+        return lambda lookup: np.logical_not(operand(lookup))
+
+    if isinstance(node, ast.Constant) and isinstance(node.value, bool):
+        value = node.value
+        return lambda _: np.bool_(value)
+
+    if isinstance(node, ast.Compare):
+        parts = []
+        left = node.left
+        for op, right in zip(node.ops, node.comparators):
+            parts.append(_compile_compare(left, op, right, names))
+            left = right
+
+        def compare(lookup):
+            mask = parts[0](lookup)
+            for part in parts[1:]:
+                mask = np.logical_and(mask, part(lookup))
+            return mask
+
+        return compare
+
+    raise UnsupportedSubset()
+
+
+def _compile_compare(left, op, right, names):
+
+    if isinstance(op, (ast.In, ast.NotIn)):
+        if not isinstance(left, ast.Name):
+            raise UnsupportedSubset()
+
+        name = left.id
+        values = _literal_list(right)
+        names.add(name)
+        negate = isinstance(op, ast.NotIn)
+        return lambda lookup: _isin(lookup(name), values, negate)
+
+    if type(op) not in _compare_ops:
+        raise UnsupportedSubset()
+
+    if isinstance(left, ast.Name):
+        name = left.id
+        value = _literal(right)
+    elif isinstance(right, ast.Name):
+        name = right.id
+        value = _literal(left)
+        op = _flipped_ops[type(op)]()
+    else:
+        raise UnsupportedSubset()
+
+    names.add(name)
+    return lambda lookup: _compare(lookup(name), type(op), value)
+
+
+def _literal(node):
+    if isinstance(node, ast.Constant) and isinstance(node.value, (Number, str)):
+        return node.value
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        value = _literal(node.operand)
+        if isinstance(value, Number) and not isinstance(value, bool):
+            return -value if isinstance(node.op, ast.USub) else value
+
+    raise UnsupportedSubset()
+
+
+def _literal_list(node):
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        return [_literal(elt) for elt in node.elts]
+
+    raise UnsupportedSubset()
+
+
+def _check_types(column, values):
+    """Make sure comparing ``column`` to ``values`` is unambiguous"""
+    kind = column.dtype.kind
+    for value in values:
+        if isinstance(value, str) and kind != 'O':
+            raise UnsupportedSubset()
+        if not isinstance(value, str) and kind not in 'biuf':
+            raise UnsupportedSubset()
+
+
+def _compare(column, op, value):
+    if is_categorical_dtype(column.dtype):
+        if op not in (ast.Eq, ast.NotEq):
+            raise UnsupportedSubset()
+
+        categories = column.cat.categories
+        _check_types(categories, [value])
+
+        # compare the codes, not the values
+        code = categories.get_indexer([value])[0]
+        codes = column.cat.codes.values
+        if code < 0:
+            mask = np.zeros(len(codes), dtype = bool)
+        else:
+            mask = codes == code
+
+        return mask if op is ast.Eq else np.logical_not(mask)
+
+    _check_types(column, [value])
+    return np.asarray(_compare_ops[op](column.values, value), dtype = bool)
+
+
+def _isin(column, values, negate):
+    if is_categorical_dtype(column.dtype):
+        categories = column.cat.categories
+        _check_types(categories, values)
+
+        codes = categories.get_indexer(values)
+        mask = np.isin(column.cat.codes.values, codes[codes >= 0])
+    else:
+        _check_types(column, values)
+        mask = np.isin(column.values, values)
+
+    return np.logical_not(mask) if negate else mask
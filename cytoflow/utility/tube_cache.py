@@ -0,0 +1,247 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+cytoflow.utility.tube_cache
+---------------------------
+
+An on-disk cache of decoded FCS events.  Re-importing a set of files after
+a cosmetic change (renaming a channel, adding a condition) then only has to
+load the cached arrays, instead of reading and decoding every file again.
+
+`TubeCache` -- a size-bounded, least-recently-used cache of decoded
+channels, stored as one ``.npy`` file per channel.
+"""
+
+import os, re, hashlib, shutil
+from warnings import warn
+
+import numpy as np
+import pandas as pd
+
+from .cytoflow_errors import CytoflowError, CytoflowWarning
+from .fcsread import read_fcs_text, read_fcs_data, fcs_channel_names
+
+# the names of the data sets' subdirectories (sha1 hashes)
+_ENTRY_NAME = re.compile(r"^[0-9a-f]{40}$")
+
+class TubeCache(object):
+    """
+    A size-bounded, least-recently-used, on-disk cache of decoded FCS
+    events.
+
+    Each data set gets its own subdirectory of `directory`, named by a
+    hash of the file's (real) path, size and modification time and the
+    decoding parameters -- so if a file changes, it is read again.  Each
+    channel is stored in its own ``.npy`` file, so reading a different
+    subset of the channels only decodes the channels that aren't cached
+    yet.  When the cache is larger than `max_bytes`, the data sets that
+    were used longest ago are removed.
+
+    Several processes can share a cache directory.  Failing to write to
+    the cache isn't an error; the events are just not cached.  Files and
+    directories in `directory` that the cache didn't create are never
+    removed.
+
+    Attributes
+    ----------
+    directory : Str
+        The directory to keep the cache in.  It is created if it doesn't
+        exist.
+
+    max_bytes : Int
+        The maximum size of the cache, in bytes.
+    """
+
+    def __init__(self, directory, max_bytes = 2 ** 32):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def read(self,
+             filename,
+             data_set = 0,
+             channels = None,
+             rows = None,
+             channel_naming = "$PnS",
+             mask = True,
+             decode_log = False,
+             dtype = "float32"):
+        """
+        Read events from an FCS file, using (and filling) the cache.  Takes
+        the same parameters, and returns the same thing, as
+        `read_fcs_data`.
+
+        If ``rows`` is set and the channels aren't cached yet, the events
+        are read directly from the file (which is fast), and not cached.
+        """
+
+        _, _, text = read_fcs_text(filename, data_set = data_set)
+        names = fcs_channel_names(text, channel_naming)
+
+        if channels is None:
+            channels = names
+
+        for channel in channels:
+            if channel not in names:
+                raise CytoflowError("Channel {} isn't in {}"
+                                    .format(channel, filename))
+
+        stat = os.stat(filename)
+        key = repr((os.path.realpath(filename), stat.st_size, stat.st_mtime_ns,
+                    data_set, bool(mask), bool(decode_log), np.dtype(dtype).str))
+        entry = os.path.join(self.directory,
+                             hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+        # channels are cached by their position, not their name, so the
+        # cache doesn't depend on channel_naming
+        paths = {channel : os.path.join(entry, "P{}.npy".format(names.index(channel) + 1))
+                 for channel in channels}
+
+        missing = [channel for channel in channels if not os.path.exists(paths[channel])]
+
+        if missing and rows is not None:
+            # reading a subset of the events is faster than caching them all
+            return read_fcs_data(filename,
+                                 data_set = data_set,
+                                 channels = channels,
+                                 rows = rows,
+                                 channel_naming = channel_naming,
+                                 mask = mask,
+                                 decode_log = decode_log,
+                                 dtype = dtype)
+
+        if missing:
+            data = read_fcs_data(filename,
+                                 data_set = data_set,
+                                 channels = missing,
+                                 channel_naming = channel_naming,
+                                 mask = mask,
+                                 decode_log = decode_log,
+                                 dtype = dtype)
+            self._store(entry, {paths[channel] : data[channel].values
+                                for channel in missing})
+
+        num_events = int(text["$TOT"])
+        if rows is not None:
+            rows = np.asarray(rows, dtype = np.int64).ravel()
+            if len(rows) > 0 and (rows.min() < 0 or rows.max() >= num_events):
+                raise CytoflowError("Rows to read must be between 0 and {} in {}"
+                                    .format(num_events - 1, filename))
+
+        out = np.empty((len(channels), num_events if rows is None else len(rows)),
+                       dtype = dtype)
+
+        try:
+            for j, channel in enumerate(channels):
+                if channel in missing:
+                    out[j] = data[channel].values
+                else:
+                    values = np.load(paths[channel], mmap_mode = "r")
+                    out[j] = values if rows is None else values[rows]
+                    del values
+        except (OSError, ValueError):
+            # someone else evicted (or is writing) this entry
+            return read_fcs_data(filename,
+                                 data_set = data_set,
+                                 channels = channels,
+                                 rows = rows,
+                                 channel_naming = channel_naming,
+                                 mask = mask,
+                                 decode_log = decode_log,
+                                 dtype = dtype)
+
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+
+        if missing:
+            self.evict(keep = entry)
+
+        return pd.DataFrame(out.T, columns = list(channels), copy = False)
+
+    def _store(self, entry, arrays):
+        """Save each of ``arrays`` (a dict of path --> array) into ``entry``"""
+        try:
+            os.makedirs(entry, exist_ok = True)
+            for path, values in arrays.items():
+                # write, then rename, so readers never see a partial file
+                tmp = "{}.{}.tmp".format(path, os.getpid())
+                with open(tmp, 'wb') as f:
+                    np.save(f, values)
+                os.replace(tmp, path)
+        except OSError as e:
+            warn("Couldn't write to the tube cache in {}: {}"
+                 .format(self.directory, str(e)),
+                 CytoflowWarning)
+
+    def size(self):
+        """The size of the cache, in bytes."""
+        return sum(size for _, _, size in self._entries())
+
+    def evict(self, keep = None):
+        """
+        Remove the least-recently-used data sets until the cache is no larger
+        than `max_bytes`.  Never removes ``keep``, the data set that was
+        just added.
+        """
+
+        entries = sorted(self._entries(), key = lambda e: e[1])
+        total = sum(size for _, _, size in entries)
+
+        for path, _, size in entries:
+            if total <= self.max_bytes:
+                break
+
+            if keep is not None and os.path.abspath(path) == os.path.abspath(keep):
+                continue
+
+            shutil.rmtree(path, ignore_errors = True)
+            total -= size
+
+    def clear(self):
+        """Remove all the data sets from the cache."""
+        for path, _, _ in self._entries():
+            shutil.rmtree(path, ignore_errors = True)
+
+    def _entries(self):
+        """(path, last-used time, size) for each data set in the cache"""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+
+        entries = []
+        for name in names:
+            # only touch the directories we made
+            if not _ENTRY_NAME.match(name):
+                continue
+            
+            path = os.path.join(self.directory, name)
+            if not os.path.isdir(path):
+                continue
+
+            try:
+                mtime = os.stat(path).st_mtime_ns
+                size = sum(f.stat().st_size for f in os.scandir(path) if f.is_file())
+            except OSError:
+                continue
+            entries.append((path, mtime, size))
+
+        return entries
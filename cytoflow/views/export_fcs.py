@@ -29,6 +29,9 @@ A "view" that exports events as FCS files.
 import re
 from pathlib import Path
 from copy import copy
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
 
 from traits.api import (Constant, List, Str, Bool, Dict, Directory, 
                         HasStrictTraits)
@@ -65,6 +68,12 @@ class ExportFCS(HasStrictTraits):
         
     subset : str
         A Python expression used to select a subset of the data
+        
+    workers : Int (default = 1)
+        How many files to write at once, in a pool of threads.  Writing a
+        file is mostly I/O and converting numbers to bytes, both of which 
+        run in parallel.  The files are the same, and have the same names,
+        however many workers there are.
     
     Examples
     --------
@@ -100,6 +109,8 @@ class ExportFCS(HasStrictTraits):
     
     subset = Str
     
+    workers = util.PositiveInt(1)
+    
     _include_by = Bool(True)
     
     def enum_files(self, experiment):
@@ -151,14 +162,14 @@ class ExportFCS(HasStrictTraits):
                 self._include_by = _include_by
                 
                 if by:
-                    self._iter = experiment.data.groupby(by).__iter__()
+                    self._iter = iter(experiment.group_index(by).indices)
                 
             def __iter__(self):
                 return self
             
             def __next__(self):
                 if self._iter:
-                    values = next(self._iter)[0]
+                    values = next(self._iter)
                     
                     if len(self.by) == 1:
                         values = [values]
@@ -184,7 +195,7 @@ class ExportFCS(HasStrictTraits):
             
         return file_enum(self.by, self.base, self._include_by, experiment)
     
-    def export(self, experiment):
+    def export(self, experiment, progress = None):
         """
         Export FCS files from an experiment.
         
@@ -192,6 +203,11 @@ class ExportFCS(HasStrictTraits):
         ----------
         experiment : Experiment
             The `Experiment` to export
+            
+        progress : Callable (default = None)
+            If set, called after each file is written with three arguments:
+            the number of files written so far, the total number of files,
+            and the path of the file that was just written.
         """
         
         if experiment is None:
@@ -260,16 +276,25 @@ class ExportFCS(HasStrictTraits):
                 common_metadata['$P{}V'.format(i + 1)] = experiment.metadata[channel]['voltage']
             
         
-        for group, data_subset in experiment.data.groupby(self.by):
-            data_subset = data_subset[experiment.channels]
+        channels = experiment.channels
+        ranges = {c: experiment.metadata[c]['range'] for c in channels}
+        
+        # look the columns up once, here, instead of in each worker
+        columns = [experiment[c].values for c in channels]
+        
+        common_kws = copy(self.keywords)
+        common_kws.update(common_metadata)
+        common_kws = {k : str(v) for k, v in common_kws.items()}
+        
+        # figure out all the files (in order) before we write any of them
+        files = []
+        for group, idx in experiment.group_index(self.by).indices.items():
             
             if len(self.by) == 1:
                 group = [group]
             
             parts = []
-            kws = copy(self.keywords)
-            kws.update(common_metadata)
-            kws = {k : str(v) for k, v in kws.items()}
+            kws = copy(common_kws)
             
             for i, name in enumerate(self.by):
                 if self._include_by:
@@ -284,14 +309,66 @@ class ExportFCS(HasStrictTraits):
                 filename = '_'.join(parts) + '.fcs'
                 
         
-            full_path = d / filename
+            files.append((d / filename, idx, kws))
+            
+        def write(full_path, idx, kws):
+            # write the events a chunk at a time, instead of gathering a
+            # copy of all of them first
             util.write_fcs(str(full_path), 
-                           experiment.channels, 
-                           {c: experiment.metadata[c]['range'] for c in experiment.channels},
-                           data_subset.values,
+                           list(channels), 
+                           ranges,
+                           _iter_events(columns, idx),
                            compat_chn_names = False,
+                           compat_percent = False,
                            compat_negative = False,
                            **kws)
+            return full_path
+        
+        if self.workers > 1 and len(files) > 1:
+            with ThreadPoolExecutor(max_workers = min(self.workers, len(files))) as executor:
+                futures = [executor.submit(write, *f) for f in files]
+                
+                try:
+                    for i, future in enumerate(as_completed(futures)):
+                        full_path = future.result()
+                        if progress:
+                            progress(i + 1, len(files), full_path)
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+        else:
+            for i, f in enumerate(files):
+                full_path = write(*f)
+                if progress:
+                    progress(i + 1, len(files), full_path)
+            
+            
+# how many events to write at once
+_CHUNK_EVENTS = 2 ** 16
+            
+def _iter_events(columns, idx):
+    """
+    Yield the events at positions ``idx`` in ``columns`` (a list of arrays,
+    one per channel), a chunk at a time, as 2D arrays.
+    """
+    
+    # this is write_fcs's compat_percent: scale channels whose values are
+    # all between 0 and 1 to percent
+    scale = np.array([100.0 if len(idx) > 0 and col[idx].min() > 0 and col[idx].max() < 1
+                      else 1.0 for col in columns])
+    
+    for start in range(0, len(idx), _CHUNK_EVENTS):
+        rows = idx[start : start + _CHUNK_EVENTS]
+        chunk = np.empty((len(rows), len(columns)), 
+                         dtype = np.result_type(*[col.dtype for col in columns]))
+        for j, col in enumerate(columns):
+            chunk[:, j] = col[rows]
+            
+        if (scale != 1.0).any():
+            chunk *= scale
+            
+        yield chunk
             
             
     
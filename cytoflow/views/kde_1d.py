@@ -136,7 +136,12 @@ class Kde1DView(Base1DView):
         scale = kwargs.pop('scale')[self.channel]
         lim = kwargs.pop('lim')[self.channel]
                   
-        grid.map(_univariate_kdeplot, self.channel, scale = scale, **kwargs)
+        # the experiment memoizes the scaled channel, so re-plotting (say,
+        # with a different bandwidth) doesn't scale it again
+        scaled = experiment.scaled(self.channel, scale) \
+                 if experiment.can_memoize_scaled(self.channel) else None
+                  
+        grid.map(_univariate_kdeplot, self.channel, scale = scale, scaled = scaled, **kwargs)
         
         ret = {}
         if kwargs['orientation'] == 'vertical':
@@ -151,7 +156,7 @@ class Kde1DView(Base1DView):
 
 # yoinked from seaborn/distributions.py, with modifications for scaling.
 
-def _univariate_kdeplot(data, scale=None, shade=False, kernel="gaussian",
+def _univariate_kdeplot(data, scale=None, scaled=None, shade=False, kernel="gaussian",
         bw="scott", gridsize=100, cut=3, clip=None, legend=True,
         ax=None, orientation = "vertical", **kwargs):
     
@@ -161,7 +166,8 @@ def _univariate_kdeplot(data, scale=None, shade=False, kernel="gaussian",
     if clip is None:
         clip = (-np.inf, np.inf)
 
-    scaled_data = scale(data)
+    # if we have the whole scaled channel, look up this facet's events
+    scaled_data = scaled.loc[data.index] if scaled is not None else scale(data)
     
     # mask out the data that's not in the scale domain
     scaled_data = scaled_data[~np.isnan(scaled_data)]  
@@ -133,12 +133,22 @@ class Kde2DView(Base2DView):
         yscale = scale[self.ychannel]
 
         legend_data = {}
+        
+        # the experiment memoizes the scaled channels, so re-plotting (say,
+        # with different contours) doesn't scale them again
+        if experiment.can_memoize_scaled([self.xchannel, self.ychannel]):
+            xscaled = experiment.scaled(self.xchannel, xscale)
+            yscaled = experiment.scaled(self.ychannel, yscale)
+        else:
+            xscaled = yscaled = None
 
         grid.map(_bivariate_kdeplot, 
                  self.xchannel, 
                  self.ychannel, 
                  xscale = xscale, 
                  yscale = yscale, 
+                 xscaled = xscaled,
+                 yscaled = yscaled,
                  legend_data = legend_data,
                  **kwargs)
                 
@@ -153,7 +163,7 @@ class Kde2DView(Base2DView):
             lh.set_alpha(0.5)
         
 # yoinked from seaborn/distributions.py, with modifications for scaling.
-def _bivariate_kdeplot(x, y, xscale=None, yscale=None, shade=False,
+def _bivariate_kdeplot(x, y, xscale=None, yscale=None, xscaled=None, yscaled=None, shade=False,
                        bw="scott", gridsize=50, cut=3, clip=None, legend=True, 
                        legend_data = None, **kwargs):
     
@@ -163,8 +173,9 @@ def _bivariate_kdeplot(x, y, xscale=None, yscale=None, shade=False,
     # Determine the clipping
     clip = [(-np.inf, np.inf), (-np.inf, np.inf)]
         
-    x = xscale(x)
-    y = yscale(y)
+    # if we have the whole scaled channels, look up this facet's events
+    x = xscaled.loc[x.index] if xscaled is not None else xscale(x)
+    y = yscaled.loc[y.index] if yscaled is not None else yscale(y)
 
     x_nan = np.isnan(x)
     y_nan = np.isnan(y)
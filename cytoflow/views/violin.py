@@ -159,11 +159,17 @@ class ViolinPlotView(Base1DView):
         if self.huefacet:
             violin_args.append(self.huefacet)
             
+        # the experiment memoizes the scaled channel, so re-plotting doesn't
+        # scale it again
+        scaled = experiment.scaled(self.channel, scale) \
+                 if experiment.can_memoize_scaled(self.channel) else None
+            
         grid.map(_violinplot,   
                  *violin_args,      
                  order = np.sort(experiment[self.variable].unique()),
                  hue_order = (np.sort(experiment[self.huefacet].unique()) if self.huefacet else None),
                  data_scale = scale,
+                 data_scaled = scaled,
                  **kwargs)
         
         if kwargs['orientation'] == 'horizontal':
@@ -179,14 +185,15 @@ def _violinplot(x=None, y=None, hue=None, data=None, order=None, hue_order=None,
                 bw="scott", cut=2, scale_plot="area", scale_hue=True, gridsize=100,
                 width=.8, inner="box", split=False, dodge=True, orientation=None, linewidth=None,
                 color=None, palette=None, saturation=.75, ax=None, data_scale = None,
-                **kwargs):
+                data_scaled = None, **kwargs):
     
     # discards kwargs
     
+    # if we have the whole scaled channel, look up this facet's events
     if orientation and orientation == 'horizontal':
-        x = data_scale(x)
+        x = data_scaled.loc[x.index] if data_scaled is not None else data_scale(x)
     else:
-        y = data_scale(y)
+        y = data_scaled.loc[y.index] if data_scaled is not None else data_scale(y)
             
     plotter = _ViolinPlotter(x, y, hue, data, order, hue_order,
                              bw, cut, scale_plot, scale_hue, gridsize,
@@ -42,6 +42,16 @@ Import FCS files and associate them with experimental conditions (metadata.)
     set **Events per sample** to empty or 0 and *Cytoflow* will re-run your
     workflow with the entire data set.
     
+.. object:: Cache directory
+
+    If set, keep the decoded events in this directory, so re-importing the
+    same files doesn't parse them again.  Off by default.
+    
+.. object:: Cache size (bytes)
+
+    The largest the cache can get.  When it grows past this, the files that
+    were used longest ago are removed.
+    
 .. object:: Set up experiment....
 
     Open the sample editor dialog box.
@@ -99,7 +109,7 @@ Import FCS files and associate them with experimental conditions (metadata.)
 from traits.api import (Button, Property, cached_property, List,
                         Instance, provides, observe, Event)
 from traitsui.api import (View, Item, Controller, TextEditor, ButtonEditor, 
-                          HGroup, VGroup, Label)
+                          HGroup, VGroup, Label, DirectoryEditor)
 
 from envisage.api import Plugin
                        
@@ -145,6 +155,13 @@ class ImportHandler(OpHandler):
                                       placeholder = "None",
                                       format_func = lambda x: "" if x is None else str(x)),
                   label="Events per\nsample"),
+             Item('object.cache_dir',
+                  editor = DirectoryEditor(),
+                  label = "Cache\ndirectory"),
+             Item('object.cache_size',
+                  editor = TextEditor(auto_set = False),
+                  label = "Cache size\n(bytes)",
+                  visible_when = 'object.cache_dir'),
              Item('handler.samples', label='Samples', style='readonly'),
              Item('ret_events', label='Events', style='readonly'),
              Item('handler.setup_event',
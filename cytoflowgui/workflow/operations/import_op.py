@@ -25,12 +25,13 @@ cytoflowgui.workflow.operations.import_op
 from textwrap import dedent 
 
 from traits.api import (HasTraits, String, List, Dict, Str, Enum, Instance, 
-                        provides, BaseCStr, observe)
+                        provides, BaseCStr, Bool, Int, observe)
 
 import cytoflow.utility as util
 from cytoflow import Tube, ImportOp
                        
 from cytoflowgui.workflow.serialization import camel_registry, traits_repr
+from .. import Changed
 from .operation_base import IWorkflowOperation, WorkflowOperation
 
 ImportOp.__repr__ = Tube.__repr__ = traits_repr
@@ -63,6 +64,15 @@ class ImportWorkflowOp(WorkflowOperation, ImportOp):
     channels = Dict(Str, Str, transient = True)
     name_metadata =  Enum(None, "$PnN", "$PnS", estimate = True)
     
+    # adding a tube shouldn't re-read the others.  their events are copied
+    # from ret_experiment, so this doesn't keep another copy of them.
+    incremental = Bool(True, transient = True)
+    
+    # the on-disk tube cache is off unless the user picks a directory.  it's
+    # not saved with the workflow, since it's specific to this machine.
+    cache_dir = Str("", estimate = True)
+    cache_size = Int(2 ** 32, estimate = True)
+    
     # how many events did we load?
     ret_events = util.PositiveInt(0, allow_zero = True, status = True, estimate_result = True, transient = True)
     
@@ -92,6 +102,13 @@ class ImportWorkflowOp(WorkflowOperation, ImportOp):
         else:
             raise util.CytoflowOpError(None, 'Click "Import!"')
         
+    def should_clear_estimate(self, changed, payload):
+        # where the events are cached doesn't change what they are
+        if changed == Changed.ESTIMATE and payload.name in ['cache_dir', 'cache_size']:
+            return False
+        
+        return True
+        
     def clear_estimate(self):
         self.ret_experiment = None
         self.ret_events = 0
@@ -100,6 +117,7 @@ class ImportWorkflowOp(WorkflowOperation, ImportOp):
         op = ImportOp()
         op.copy_traits(self, op.copyable_trait_names())
         op.channels = {c.channel : c.name for c in self.channels_list}
+        op.cache_dir = self.cache_dir or None
         
         return dedent("""
             op_{idx} = {repr}
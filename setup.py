@@ -135,6 +135,7 @@ setup(
     
     entry_points={'console_scripts' : ['cf-channel_voltages = cytoflow.scripts.channel_voltages:main',
                                        'cf-fcs_metadata = cytoflow.scripts.fcs_metadata:main',
-                                       'cf-split_fcs = cytoflow.scripts.split_fcs:main'],
+                                       'cf-split_fcs = cytoflow.scripts.split_fcs:main',
+                                       'cf-scan_fcs = cytoflow.scripts.scan_fcs:main'],
                   'gui_scripts' : ['cytoflow = cytoflowgui.run:run_gui']}
 )